@@ -4,8 +4,10 @@ This object is instantiated by the Campaign. The user would never instantiate it
 manually. The user does interact with it to track the progress of execution.
 """
 import concurrent
+import time
 from concurrent.futures import ThreadPoolExecutor
 from dask.distributed import Client
+from dask.distributed import as_completed as dask_as_completed
 from tqdm import tqdm
 import copy
 
@@ -33,6 +35,9 @@ __copyright__ = """
 """
 __license__ = "LGPL"
 
+COLLATE_BATCH_SIZE = 1000
+COLLATE_FLUSH_INTERVAL = 10.0
+
 
 class ActionPool:
     """A class that handles the execution of Actions.
@@ -46,7 +51,8 @@ class ActionPool:
     inits: iterable
         Initial inputs to be passed to each `Actions` representing a sample. Will usually contain
         dictionaries with the following information: {'run_id': ..., 'campaign_dir': ...,
-        'run_info': ...}.
+        'run_info': ..., 'sample_index': ...}, where 'sample_index' is the position of
+        the run in the samples drawn from its sampler.
     sequential: bool
         Will run the actions sequentially.
     """
@@ -121,35 +127,132 @@ class ActionPool:
         """
         self._collate_callback = fn
 
-    def collate(self, progress_bar=False):
+    def cancel(self):
+        """Cancels the `Actions` that have not started executing yet. Useful when
+        stopping a streaming collation early.
+        """
+        for future in self.futures:
+            future.cancel()
+
+    def collate(self, progress_bar=False, batch_size=COLLATE_BATCH_SIZE,
+                flush_interval=COLLATE_FLUSH_INTERVAL):
         """A command that will block until all Futures in the pool have finished.
         It will also store the results gather from `Actions` in the database.
 
+        The results are buffered and written to the database in batches, each in a
+        single transaction. If the collation is interrupted at most one batch of
+        results is lost.
+
+        Parameters
+        ----------
+        progress_bar: bool
+           Whether to show progress bar
+        batch_size: int
+           Maximum number of results to be buffered before they are written to the
+           database.
+        flush_interval: float or None
+           Maximum time (in seconds) since the last write after which the buffered
+           results are written to the database once the next result arrives,
+           regardless of `batch_size`. If None only `batch_size` is taken into account.
+        """
+        for _ in self.stream(progress_bar=progress_bar, batch_size=batch_size,
+                             flush_interval=flush_interval):
+            pass
+        self.campaign.campaign_db.session.commit()
+
+    def stream(self, subscribers=None, progress_bar=False, batch_size=1, flush_interval=None):
+        """A generator that yields the results of `Actions` as they complete. Each
+        result is stored in the database before it is yielded (by default each one
+        in its own transaction, see `batch_size`).
+
+        Analysis elements implementing `update` can be passed as `subscribers` in
+        order to compute statistics incrementally. Breaking out of the loop stores
+        the results received so far, the remaining `Actions` can then be stopped
+        using `cancel`.
+
         Parameters
         ----------
+        subscribers: list or None
+           Objects whose `update` method will be called with each result.
         progress_bar: bool
            Whether to show progress bar
+        batch_size: int
+           Maximum number of results to be buffered before they are written to the
+           database.
+        flush_interval: float or None
+           Maximum time (in seconds) since the last write after which the buffered
+           results are written to the database once the next result arrives.
+
+        Yields
+        ------
+        dict
+            The output of `Actions` for a single run. The decoded output is under the
+            'result' key and the run information under 'run_info'.
+
+        Examples
+        --------
+        >>> analysis = QMCAnalysis(sampler, qoi_cols=['f'])
+        >>> action_pool = campaign.execute()
+        >>> for result in action_pool.stream(subscribers=[analysis]):
+        ...     if analysis.running_statistics()['statistical_moments']['f']['sem'] < 1e-3:
+        ...         action_pool.cancel()
+        ...         break
         """
         if not progress_bar:
             def tqdm_(x, total=None): return x
         else:
             tqdm_ = tqdm
-        if isinstance(self.pool, Client):
-            self.results = self.pool.gather(self.futures)
-        if self.sequential or isinstance(self.pool, Client):
-            for result in tqdm_(self.results, total=len(self.results)):
-                result = self._collate_callback(result)
-                self.campaign.campaign_db.store_result(
-                    result['run_id'], result, change_status=result['collated'])
+        if subscribers is None:
+            subscribers = []
+        self._batch = []
+        self._last_flush = time.monotonic()
+        if self.sequential:
+            completed = iter(self.results)
+            total = len(self.results)
+        elif isinstance(self.pool, Client):
+            completed = (future.result() for future in dask_as_completed(self.futures))
+            total = len(self.futures)
         else:
             if isinstance(self.pool, QCGPJPool):
                 as_completed_fn = self.pool.as_completed
                 self.add_collate_callback(self.pool.convert_results)
             else:
                 as_completed_fn = concurrent.futures.as_completed
+            completed = (future.result() for future in as_completed_fn(self.futures))
+            total = len(self.futures)
+        try:
+            for result in tqdm_(completed, total=total):
+                result = self._collate_callback(result)
+                self._store_result(result, batch_size, flush_interval)
+                for subscriber in subscribers:
+                    subscriber.update(result)
+                yield result
+        finally:
+            self._flush()
 
-            for future in tqdm_(as_completed_fn(self.futures), total=len(self.futures)):
-                result = self._collate_callback(future.result())
-                self.campaign.campaign_db.store_result(
-                    result['run_id'], result, change_status=result['collated'])
-        self.campaign.campaign_db.session.commit()
+    def _store_result(self, result, batch_size, flush_interval):
+        """Adds a result to the batch and writes the batch to the database if
+        the flush policy requires it.
+
+        Parameters
+        ----------
+        result: dict
+            The output of `Actions` for a single run.
+        batch_size: int
+            Maximum number of buffered results.
+        flush_interval: float or None
+            Maximum time (in seconds) since the last write.
+        """
+        self._batch.append((result['run_id'], result, result['collated']))
+        if len(self._batch) >= batch_size:
+            self._flush()
+        elif flush_interval is not None and time.monotonic() - self._last_flush >= flush_interval:
+            self._flush()
+
+    def _flush(self):
+        """Writes the buffered results to the database.
+        """
+        if self._batch:
+            self.campaign.campaign_db.store_result_batch(self._batch)
+        self._batch = []
+        self._last_flush = time.monotonic()
@@ -1,5 +1,9 @@
 """Provides a base class for all analysis elements.
 """
+import copy
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
 from .. import BaseElement
 
 __copyright__ = """
@@ -47,6 +51,98 @@ class BaseAnalysisElement(BaseElement):
         """
         raise NotImplementedError
 
+    def update(self, result):
+        """Incrementally update the analysis with the result of a single run. Used
+        when the analysis is subscribed to `ActionPool.stream`.
+
+        Parameters
+        ----------
+        result : dict
+            The output of `Actions` for a single run.
+        """
+        raise NotImplementedError
+
+    def extract_samples(self, data_frame, qoi_cols=None):
+        """Extract the output values for each quantity of interest from a
+        collation data frame. The rows are grouped by run, in the order in
+        which the runs first appear in the data frame.
+
+        Parameters
+        ----------
+        data_frame : pandas DataFrame
+            The EasyVVUQ data frame from collation.
+        qoi_cols : list or None
+            Names of the quantities of interest, default is `self.qoi_cols`.
+
+        Returns
+        -------
+        dict
+            A dictionary with the QoI names as keys. Each value is an array of
+            shape (number of runs, size of the QoI), with the values of all rows
+            of a run concatenated.
+        """
+        if qoi_cols is None:
+            qoi_cols = self.qoi_cols
+        run_ids = data_frame['run_id']
+        if isinstance(run_ids, pd.DataFrame):
+            run_ids = run_ids.iloc[:, 0]
+        codes, uniques = pd.factorize(run_ids)
+        n_runs = len(uniques)
+        # one row per run is the usual case, nothing to group then
+        order = None
+        if n_runs != len(codes):
+            counts = np.bincount(codes)
+            if np.any(counts != counts[0]):
+                raise RuntimeError("all runs must have the same number of rows")
+            order = np.argsort(codes, kind='stable')
+        samples = {}
+        for k in qoi_cols:
+            values = data_frame[k].to_numpy(copy=True).reshape([len(codes), -1])
+            if order is not None:
+                values = values[order]
+            samples[k] = values.reshape([n_runs, -1])
+        return samples
+
+    def map_qois(self, method, qoi_args, **worker_attrs):
+        """Call a method of this element once for each quantity of interest. The
+        calls must be independent of each other. If the element has an `executor`
+        (e.g. a ProcessPoolExecutor) or `n_jobs` other than None or 1 they are
+        distributed over the executor, or over a pool of `n_jobs` processes (all
+        available cores if `n_jobs` is -1).
+
+        In the parallel case the method is called on a shallow copy of the element,
+        which must be picklable. Attributes the method does not need, e.g. data of
+        all quantities of interest, can be replaced in the copy using `worker_attrs`
+        so that they are not sent to the workers.
+
+        Parameters
+        ----------
+        method : str
+            Name of the method.
+        qoi_args : dict
+            The arguments (a tuple) of the method for each QoI name.
+        worker_attrs
+            Attributes to be replaced in the copy of the element.
+
+        Returns
+        -------
+        dict
+            The value returned by the method for each QoI name.
+        """
+        executor = getattr(self, 'executor', None)
+        n_jobs = getattr(self, 'n_jobs', None)
+        if (executor is None and n_jobs in (None, 1)) or len(qoi_args) < 2:
+            return {k: getattr(self, method)(*args) for k, args in qoi_args.items()}
+        worker = copy.copy(self)
+        worker.executor = None
+        worker.n_jobs = None
+        for name, value in worker_attrs.items():
+            setattr(worker, name, value)
+        if executor is None:
+            with ProcessPoolExecutor(None if n_jobs == -1 else n_jobs) as executor:
+                return _map_submit(executor, getattr(worker, method), qoi_args)
+        return _map_submit(executor, getattr(worker, method), qoi_args)
+
     def element_category(self):
         """Element type for logging and verification.
 
@@ -76,3 +172,9 @@ class BaseAnalysisElement(BaseElement):
             Element version.
         """
         raise NotImplementedError
+
+
+def _map_submit(executor, fn, qoi_args):
+    """Submit `fn` with the arguments of each QoI and wait for the results."""
+    futures = {k: executor.submit(fn, *args) for k, args in qoi_args.items()}
+    return {k: future.result() for k, future in futures.items()}
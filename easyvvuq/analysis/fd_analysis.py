@@ -182,7 +182,7 @@ class PCEAnalysisResults(QMCAnalysisResults):
 
 class FDAnalysis(BaseAnalysisElement):
 
-    def __init__(self, sampler=None, qoi_cols=None):
+    def __init__(self, sampler=None, qoi_cols=None, executor=None, n_jobs=None):
         """Analysis element for polynomial chaos expansion (PCE).
 
         Parameters
@@ -192,6 +192,12 @@ class FDAnalysis(BaseAnalysisElement):
         qoi_cols : list or None
             Column names for quantities of interest (for which analysis is
             performed).
+        executor : An Executor instance (e.g. ProcessPoolExecutor) or None
+            If given, the quantities of interest are analysed in parallel in this
+            executor, see `map_qois`.
+        n_jobs : int or None
+            Number of processes used to analyse the quantities of interest in
+            parallel if no executor is given, -1 to use all cores.
         """
 
         if sampler is None:
@@ -208,6 +214,8 @@ class FDAnalysis(BaseAnalysisElement):
         self.qoi_cols = qoi_cols
         self.output_type = OutputType.SUMMARY
         self.sampler = sampler
+        self.executor = executor
+        self.n_jobs = n_jobs
 
     def element_name(self):
         """Name for this element for logging purposes.
@@ -271,14 +279,7 @@ class FDAnalysis(BaseAnalysisElement):
                    'derivatives_first': {k: {p: np.zeros(T) for p in self.sampler.vary.vary_dict} for k in qoi_cols},
                    }
 
-        # Get sampler informations
-        nodes = self.sampler._nodes
-        perturbations = self.sampler._perturbations
-        if self.sampler._is_dependent:
-            nodes_dep = self.sampler._nodes_dep
-            #perturbations_dep = self.sampler._perturbations_dep
-            
-
+        qoi_args = {}
         for k in qoi_cols:
 
             base = data_frame[k].values[0]
@@ -290,41 +291,69 @@ class FDAnalysis(BaseAnalysisElement):
                     warnings.warn(f"Removing QoI {k} from the analysis, contains some zeros", RuntimeWarning)
                     continue
 
-            results['statistical_moments'][k] = {'mean': np.mean(data_frame[k].values, axis=0),
-                                                     'var': np.var(data_frame[k].values, axis=0),
-                                                     'std': np.std(data_frame[k].values, axis=0)}
-
-            # Get the QoI value for the base value of the parameters
-            y_base = data_frame[k].values[0]
-
-            # Compute FD approximation
-            offset = 1
-            for pi, p in enumerate(self.sampler.vary.vary_dict):
-                
-                # assumes ordering of the nodes [0, ..., +delta, -delta, ...]
-                y_pos = data_frame[k].values[offset]
-                y_neg = data_frame[k].values[offset+1]
-                
-                if self.relative_analysis:
-                    d_pos = perturbations[pi][offset]
-                    d_neg = perturbations[pi][offset+1]
-                    #d_pos = nodes[pi][offset]/nodes[pi][0] - 1
-                    #d_neg = nodes[pi][offset+1]/nodes[pi][0] - 1
-
-                    results["derivatives_first"][k][p] = 0.5*(y_pos/y_base-1)/(d_pos) + 0.5*(y_neg/y_base - 1)/(d_neg)
-
-                    # scale the derivatives to the absolute values
-                    x_base = nodes[pi][0] # base value of the parameter
-                    scaling_factor = y_base/x_base
-                    results["derivatives_first"][k][p] *= scaling_factor
-                else:
-                    d_pos = nodes[pi][offset] - nodes[pi][0]
-                    d_neg = nodes[pi][offset+1] - nodes[pi][0]
-
-                    # norm([dg, 0, 0]) = delta_g
-                    results["derivatives_first"][k][p] = 0.5*(y_pos - y_base)/(d_pos) + 0.5*(y_neg - y_base)/(d_neg)
+            qoi_args[k] = (data_frame[k].values,)
 
-                offset = offset + 2
+        qoi_results = self.map_qois('_analyse_qoi', qoi_args)
+        for k, qoi_result in qoi_results.items():
+            for name, value in qoi_result.items():
+                results[name][k] = value
 
         return PCEAnalysisResults(raw_data=results, samples=data_frame,
                                   qois=self.qoi_cols, inputs=list(self.sampler.vary.get_keys()))
+
+    def _analyse_qoi(self, values):
+        """Statistics and finite difference derivatives of a single quantity of
+        interest.
+
+        Parameters
+        ----------
+        values : NumPy array
+            The code evaluations for this quantity of interest.
+
+        Returns
+        -------
+        dict
+            The entries of the analysis results for this quantity of interest.
+        """
+        # Get sampler informations
+        nodes = self.sampler._nodes
+        perturbations = self.sampler._perturbations
+
+        results = {'statistical_moments': {'mean': np.mean(values, axis=0),
+                                           'var': np.var(values, axis=0),
+                                           'std': np.std(values, axis=0)},
+                   'derivatives_first': {}}
+
+        # Get the QoI value for the base value of the parameters
+        y_base = values[0]
+
+        # Compute FD approximation
+        offset = 1
+        for pi, p in enumerate(self.sampler.vary.vary_dict):
+
+            # assumes ordering of the nodes [0, ..., +delta, -delta, ...]
+            y_pos = values[offset]
+            y_neg = values[offset+1]
+
+            if self.relative_analysis:
+                d_pos = perturbations[pi][offset]
+                d_neg = perturbations[pi][offset+1]
+                #d_pos = nodes[pi][offset]/nodes[pi][0] - 1
+                #d_neg = nodes[pi][offset+1]/nodes[pi][0] - 1
+
+                results["derivatives_first"][p] = 0.5*(y_pos/y_base-1)/(d_pos) + 0.5*(y_neg/y_base - 1)/(d_neg)
+
+                # scale the derivatives to the absolute values
+                x_base = nodes[pi][0] # base value of the parameter
+                scaling_factor = y_base/x_base
+                results["derivatives_first"][p] *= scaling_factor
+            else:
+                d_pos = nodes[pi][offset] - nodes[pi][0]
+                d_neg = nodes[pi][offset+1] - nodes[pi][0]
+
+                # norm([dg, 0, 0]) = delta_g
+                results["derivatives_first"][p] = 0.5*(y_pos - y_base)/(d_pos) + 0.5*(y_neg - y_base)/(d_neg)
+
+            offset = offset + 2
+
+        return results
@@ -2,9 +2,12 @@
 under the hood for this functionality.
 """
 import logging
+import re
+from collections.abc import MutableMapping
 import chaospy as cp
 import numpy as np
 import numpoly
+import scipy.sparse
 import warnings
 from easyvvuq import OutputType
 from .base import BaseAnalysisElement
@@ -19,7 +22,9 @@ logger = logging.getLogger(__name__)
 
 
 class PCEAnalysisResults(QMCAnalysisResults):
-    """Analysis results for the PCEAnalysis class.
+    """Analysis results for the PCEAnalysis class. The percentiles, correlation
+    matrices, output distributions and derivatives of each quantity of interest
+    are computed when they are first accessed.
     """
 
     def _get_derivatives_first(self, qoi, input_):
@@ -37,8 +42,13 @@ class PCEAnalysisResults(QMCAnalysisResults):
         float
             First order derivative-based index.
         """
-        raw_dict = AnalysisResults._keys_to_tuples(self.raw_data['derivatives_first'])
-        return raw_dict[AnalysisResults._to_tuple(qoi)][input_]
+        # look up the QoI directly, the derivatives of the other QoIs are
+        # computed only when they are accessed
+        derivatives = self.raw_data['derivatives_first']
+        key = AnalysisResults._to_tuple(qoi)
+        if key not in derivatives:
+            key = key[0]
+        return derivatives[key][input_]
 
     def _get_sobols_first(self, qoi, input_):
         """Returns the first order sobol index for a given qoi wrt input variable.
@@ -160,23 +170,31 @@ class PCEAnalysisResults(QMCAnalysisResults):
                 raise NotImplementedError
 
     def surrogate(self):
-        """Return a PCE surrogate model.
+        """Return a PCE surrogate model. The fitted expansions are compiled
+        into a `PCESurrogate` the first time this is called.
 
         Returns
         -------
         A function that takes a dictionary of parameter - value pairs and returns
-        a dictionary with the results (same output as decoder).
+        a dictionary with the results (same output as decoder). If the values are
+        arrays of length n_points the surrogate is evaluated at all n_points
+        points at once and the results are arrays of shape (n_points, size of the QoI).
         """
+        if getattr(self, '_compiled_surrogate', None) is None:
+            self._compiled_surrogate = PCESurrogate(
+                {qoi: self.raw_data['fit'][qoi] for qoi in self.qois}, len(self.inputs))
+
         def surrogate_fn(inputs):
             def swap(x):
                 if len(x) > 1:
                     return list(x)
                 else:
                     return x[0]
-            values = np.array([inputs[key] for key in self.inputs])
-            results = dict([(qoi, swap((self.raw_data['fit'][qoi](*values)).T))
-                           for qoi in self.qois])
-            return results
+            values = np.array([inputs[key] for key in self.inputs], dtype=float)
+            results = self._compiled_surrogate(np.atleast_2d(values.T))
+            if values.ndim > 1:
+                return results
+            return dict([(qoi, swap(np.atleast_1d(results[qoi][0]))) for qoi in self.qois])
         return surrogate_fn
 
     def get_distribution(self, qoi):
@@ -196,9 +214,367 @@ class PCEAnalysisResults(QMCAnalysisResults):
         return self.raw_data['output_distributions'][qoi]
 
 
+def _variable_indices(names, n_params):
+    """The parameter index of each numpoly variable name. numpoly passes positional
+    arguments to the variables `q0, ..., q<n_params - 1>` in lexicographic order of
+    their names (q0, q1, q10, q11, q2, ...), and that is how the expansions are
+    evaluated at the nodes, so this is the parameter each variable stands for.
+    """
+    ranks = {str(i): rank for rank, i in enumerate(sorted(range(n_params), key=str))}
+    return [ranks[re.search(r'(\d+)$', name).group(1)] for name in names]
+
+
+class PCESurrogate:
+    """Fitted PCE expansions compiled into a dense matrix of exponents and a
+    matrix of coefficients, for fast evaluation at many points. The expansions of
+    all quantities of interest share the matrix of monomials evaluated at the
+    points.
+
+    Parameters
+    ----------
+    fits : dict
+        The fitted expansion (numpoly polynomial) of each quantity of interest.
+    n_params : int
+        Number of parameters, see `_variable_indices` for how they are matched
+        to the variables of the expansions.
+    batch_size : int or None
+        Number of points evaluated at once, by default such that the monomial
+        matrix of a batch takes about 64MB.
+    """
+
+    def __init__(self, fits, n_params, batch_size=None):
+        self.qois = list(fits)
+        self.n_params = n_params
+        exponents = []
+        coefficients = []
+        self._shapes = {}
+        for qoi, fit in fits.items():
+            fit = numpoly.aspolynomial(fit)
+            params = _variable_indices(fit.names, n_params)
+            exponents_k = np.zeros((len(fit.exponents), n_params), dtype=int)
+            exponents_k[:, params] = fit.exponents
+            exponents.append(exponents_k)
+            coefficients.append(np.array(fit.coefficients, dtype=float).reshape(
+                len(exponents_k), -1))
+            self._shapes[qoi] = fit.shape
+        # one row for each monomial used by any of the expansions
+        self.exponents, terms = np.unique(np.concatenate(exponents), axis=0, return_inverse=True)
+        terms = terms.reshape(-1)
+        self.coefficients = np.zeros((len(self.exponents), sum(c.shape[1] for c in coefficients)))
+        self._columns = {}
+        row = 0
+        column = 0
+        for qoi, coefficients_k in zip(self.qois, coefficients):
+            n_terms, n_columns = coefficients_k.shape
+            np.add.at(self.coefficients[:, column:column + n_columns],
+                      terms[row:row + n_terms], coefficients_k)
+            self._columns[qoi] = slice(column, column + n_columns)
+            row += n_terms
+            column += n_columns
+        self.max_degree = self.exponents.max(axis=0)
+        if batch_size is None:
+            batch_size = max(1, 2**23 // len(self.exponents))
+        self.batch_size = batch_size
+
+    def monomials(self, X, exponents=None):
+        """The monomials of the expansions evaluated at the points `X`.
+
+        Parameters
+        ----------
+        X : NumPy array
+            The points, of shape (n_points, n_params).
+        exponents : NumPy array or None
+            The exponents of the monomials, `self.exponents` by default.
+
+        Returns
+        -------
+        NumPy array of shape (n_points, number of monomials).
+        """
+        if exponents is None:
+            exponents = self.exponents
+        M = np.ones((X.shape[0], len(exponents)))
+        for j in range(self.n_params):
+            if self.max_degree[j] == 0:
+                continue
+            # powers 0, ..., max_degree of parameter j at each point
+            powers = np.cumprod(np.column_stack(
+                [np.ones(X.shape[0])] + [X[:, j]] * self.max_degree[j]), axis=1)
+            M *= powers[:, exponents[:, j]]
+        return M
+
+    def __call__(self, X):
+        """Evaluate the expansions.
+
+        Parameters
+        ----------
+        X : array-like
+            The points, of shape (n_points, n_params).
+
+        Returns
+        -------
+        dict
+            The values of each quantity of interest, of shape (n_points, size of the QoI).
+        """
+        return self._evaluate(X, self.exponents, self.coefficients)
+
+    def derivative(self, X, param):
+        """Evaluate the derivatives of the expansions with respect to a parameter.
+
+        Parameters
+        ----------
+        X : array-like
+            The points, of shape (n_points, n_params).
+        param : int
+            Index of the parameter.
+
+        Returns
+        -------
+        dict
+            The derivatives of each quantity of interest, of shape (n_points, size of the QoI).
+        """
+        # d/dx x^n = n x^(n - 1), the terms with n = 0 vanish
+        exponents = self.exponents.copy()
+        exponents[:, param] = np.maximum(exponents[:, param] - 1, 0)
+        coefficients = self.coefficients * self.exponents[:, param, np.newaxis]
+        return self._evaluate(X, exponents, coefficients)
+
+    def _evaluate(self, X, exponents, coefficients):
+        X = np.atleast_2d(np.asarray(X, dtype=float))
+        if X.shape[1] != self.n_params:
+            raise RuntimeError(f"expected points with {self.n_params} parameters, "
+                               f"got an array of shape {X.shape}")
+        values = np.empty((X.shape[0], coefficients.shape[1]))
+        for start in range(0, X.shape[0], self.batch_size):
+            stop = start + self.batch_size
+            values[start:stop] = self.monomials(X[start:stop], exponents) @ coefficients
+        return {qoi: values[:, self._columns[qoi]].reshape((X.shape[0],) + self._shapes[qoi])
+                for qoi in self.qois}
+
+
+class _LazyStatistic(MutableMapping):
+    """A statistic of each quantity of interest that is computed the first time
+    it is accessed and then kept. Behaves like the dict from QoI name to the
+    value of the statistic that it replaces in the raw analysis data.
+
+    Parameters
+    ----------
+    compute : callable
+        Computes the statistic of a quantity of interest from its arguments.
+    args : dict
+        The arguments of `compute` for each quantity of interest.
+    values : dict or None
+        Values that are known already, e.g. for quantities of interest that
+        were not analysed.
+    seed : list of int or None
+        If given, `compute` is called with the global NumPy random state seeded
+        from this and the position of the quantity of interest, so that sampling
+        based statistics do not depend on the order in which they are accessed.
+        The random state of the caller is restored afterwards.
+    """
+
+    def __init__(self, compute, args, values=None, seed=None):
+        self._compute = compute
+        self._args = dict(args)
+        self._values = dict(values or {})
+        self._keys = list(dict.fromkeys(list(self._values) + list(self._args)))
+        self._seed = seed
+
+    def __getitem__(self, qoi):
+        if qoi not in self._values:
+            if qoi not in self._args:
+                raise KeyError(qoi)
+            if self._seed is None:
+                self._values[qoi] = self._compute(*self._args[qoi])
+            else:
+                state = np.random.get_state()
+                np.random.seed(np.random.SeedSequence(
+                    list(self._seed) + [self._keys.index(qoi)]).generate_state(1))
+                try:
+                    self._values[qoi] = self._compute(*self._args[qoi])
+                finally:
+                    np.random.set_state(state)
+            del self._args[qoi]
+        return self._values[qoi]
+
+    def __setitem__(self, qoi, value):
+        if qoi not in self._keys:
+            self._keys.append(qoi)
+        self._args.pop(qoi, None)
+        self._values[qoi] = value
+
+    def __delitem__(self, qoi):
+        self._keys.remove(qoi)
+        self._args.pop(qoi, None)
+        self._values.pop(qoi, None)
+
+    def __iter__(self):
+        return iter(list(self._keys))
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self._keys})"
+
+
+def _percentiles(fit, distribution, base=None):
+    """The 1%, 10%, 50%, 90% and 99% percentiles of a PCE expansion, transformed
+    back to absolute values if `base` is given (relative analysis).
+    """
+    P01, P10, P50, P90, P99 = cp.Perc(fit, [1, 10, 50, 90, 99], distribution).squeeze()
+    percentiles = {'p01': P01, 'p10': P10, 'p50': P50, 'p90': P90, 'p99': P99}
+    if base is not None:
+        percentiles = {p: (1.0 + value) * base for p, value in percentiles.items()}
+    return percentiles
+
+
+def _correlation_matrix(fit, distribution, k):
+    """The correlation matrix of the components of a PCE expansion, None if it
+    can not be computed.
+    """
+    try:
+        return cp.Corr(fit, distribution)
+    except Exception as e:
+        print('Error %s for %s when computing cp.Corr()' % (e.__class__.__name__, k))
+        return None
+
+
+def _output_distribution(fit, distribution, k):
+    """The distribution of the components of a PCE expansion, None if it can
+    not be computed.
+    """
+    try:
+        return cp.QoI_Dist(fit, distribution)
+    except Exception as e:
+        print('Error %s for %s when computing cp.QoI_Dist()' % (e.__class__.__name__, k))
+        return None
+
+
+def _derivatives_first(fit, point, params):
+    """The derivatives of a PCE expansion with respect to each parameter at `point`.
+    """
+    try:
+        surrogate = PCESurrogate({'fit': fit}, len(params))
+        return {param: surrogate.derivative(point, i)['fit'][0] for i, param in enumerate(params)}
+    except Exception:
+        traceback.print_exc()
+        return {param: np.zeros(fit.shape) for param in params}
+
+
+def _expansion(P, coefficients):
+    """The PCE expansion `sum(P * coefficients.T, -1)`, built directly from the
+    coefficients of the monomials of the orthogonal polynomials.
+
+    Parameters
+    ----------
+    P : numpoly.ndpoly
+        The orthogonal polynomials.
+    coefficients : NumPy array
+        The PCE coefficients, of shape (len(P), shape of the QoI).
+
+    Returns
+    -------
+    numpoly.ndpoly of the shape of the QoI.
+    """
+    shape = coefficients.shape[1:]
+    monomial_coefficients = np.array(P.coefficients) @ coefficients.reshape(len(P), -1)
+    return numpoly.polynomial_from_attributes(
+        exponents=P.exponents,
+        coefficients=monomial_coefficients.reshape((len(monomial_coefficients),) + shape),
+        names=P.names)
+
+
+def _fit_regression(P, design_matrix, samples):
+    """Fit the PCE expansion using linear regression, same as `cp.fit_regression`
+    but using the expansion evaluated at the nodes.
+
+    Parameters
+    ----------
+    P : numpoly.ndpoly
+        The orthogonal polynomials.
+    design_matrix : NumPy array
+        `P` evaluated at the nodes, of shape (len(P), number of nodes).
+    samples : NumPy array
+        The code evaluations at the nodes.
+
+    Returns
+    -------
+    The fitted polynomial and the PCE coefficients.
+    """
+    samples = np.asarray(samples)
+    shape = samples.shape[1:]
+    if shape:
+        samples = samples.reshape(len(samples), -1)
+    coefficients = np.linalg.lstsq(design_matrix.T, samples, rcond=None)[0]
+    fit = _expansion(P, coefficients.reshape((len(P),) + shape))
+    return fit, coefficients
+
+
+def _fit_quadrature(P, design_matrix, weights, samples):
+    """Fit the PCE expansion using spectral projection, same as `cp.fit_quadrature`
+    but using the expansion evaluated at the nodes.
+
+    Parameters
+    ----------
+    P : numpoly.ndpoly
+        The orthogonal polynomials.
+    design_matrix : NumPy array
+        `P` evaluated at the quadrature nodes, of shape (len(P), number of nodes).
+    weights : NumPy array
+        The quadrature weights.
+    samples : NumPy array
+        The code evaluations at the nodes.
+
+    Returns
+    -------
+    The fitted polynomial and the PCE coefficients.
+    """
+    samples = np.asarray(samples, dtype=float)
+    shape = samples.shape[1:]
+    samples = samples.reshape(len(samples), -1)
+    weighted = design_matrix * weights
+    norms = np.sum(weighted * design_matrix, axis=-1)
+    coefficients = (weighted @ samples) / norms[:, np.newaxis]
+    coefficients = coefficients.reshape(len(coefficients), *shape)
+    fit = _expansion(P, coefficients)
+    return fit, coefficients
+
+
+def _sobol_matrix(P, n_params):
+    """The matrix that sums the squared PCE coefficients into the (unnormalized)
+    first, second and total order Sobol indices. Coefficient i belongs to the Sobol
+    index of the set of parameters that polynomial i of the expansion depends on.
+
+    Parameters
+    ----------
+    P : numpoly.ndpoly
+        The orthogonal polynomials.
+    n_params : int
+        Number of parameters.
+
+    Returns
+    -------
+    scipy.sparse.csr_matrix
+        Of shape (2 * n_params + n_params**2, len(P)). Row j gives the first order
+        index of parameter j, row n_params + j * n_params + k the second order index
+        of parameters j and k and row n_params + n_params**2 + j the total index of
+        parameter j.
+    """
+    uses = np.array(P.coefficients).T != 0
+    depends = np.zeros((len(uses), n_params), dtype=bool)
+    depends[:, _variable_indices(P.names, n_params)] = (uses.astype(int) @ P.exponents) != 0
+    order = depends.sum(axis=1)
+    first = depends & (order == 1)[:, np.newaxis]
+    second = depends[:, :, np.newaxis] & depends[:, np.newaxis, :] & (order == 2)[:, np.newaxis, np.newaxis]
+    second[:, np.arange(n_params), np.arange(n_params)] = False
+    return scipy.sparse.csr_matrix(np.concatenate(
+        [first.T, second.reshape(len(uses), -1).T, depends.T]).astype(float))
+
+
 class PCEAnalysis(BaseAnalysisElement):
 
-    def __init__(self, sampler=None, qoi_cols=None, sampling=False, CorrelationMatrices=True, OutputDistributions=True):
+    def __init__(self, sampler=None, qoi_cols=None, sampling=False, CorrelationMatrices=True,
+                 OutputDistributions=True, executor=None, n_jobs=None):
         """Analysis element for polynomial chaos expansion (PCE).
 
         Parameters
@@ -211,11 +587,17 @@ class PCEAnalysis(BaseAnalysisElement):
         sampling : True if chaospy sampling method to be used for calculating
             statistical quantities; otherwise [default] the pce coefficients are used
         CorrelationMatrices : boolean
-            if False then disable the calculation of the Correlation Matrices, otherwise 
-            [default] calculate them
+            if False then disable the calculation of the Correlation Matrices, otherwise
+            [default] calculate them (when they are first accessed)
         OutputDistributions : boolean
             if False then disable the calculation of the Output Distributions, otherwise
-            [default] calculate them
+            [default] calculate them (when they are first accessed)
+        executor : An Executor instance (e.g. ProcessPoolExecutor) or None
+            If given, the quantities of interest are analysed in parallel in this
+            executor, see `map_qois`.
+        n_jobs : int or None
+            Number of processes used to analyse the quantities of interest in
+            parallel if no executor is given, -1 to use all cores.
         """
 
         if sampler is None:
@@ -235,6 +617,10 @@ class PCEAnalysis(BaseAnalysisElement):
         self.sampler = sampler
         self.CorrelationMatrices = CorrelationMatrices
         self.OutputDistributions = OutputDistributions
+        self.executor = executor
+        self.n_jobs = n_jobs
+        # the orthogonal polynomials and the Sobol index matrix computed from them
+        self._sobol_matrix = (None, None)
 
     def element_name(self):
         """Name for this element for logging purposes.
@@ -270,105 +656,6 @@ class PCEAnalysis(BaseAnalysisElement):
             Use it to get the sobol indices and other information.
         """
 
-        def sobols(P, coefficients):
-            """ Utility routine to calculate sobols based on coefficients
-            """
-            A = np.array(P.coefficients) != 0
-            multi_indices = np.array([P.exponents[A[:, i]].sum(axis=0) for i in range(A.shape[1])])
-            sobol_mask = multi_indices != 0
-            _, index = np.unique(sobol_mask, axis=0, return_index=True)
-            index = np.sort(index)
-            sobol_idx_bool = sobol_mask[index]
-            sobol_idx_bool = np.delete(sobol_idx_bool, [0], axis=0)
-            n_sobol_available = sobol_idx_bool.shape[0]
-            if len(coefficients.shape) == 1:
-                n_out = 1
-            else:
-                n_out = coefficients.shape[1]
-            n_coeffs = coefficients.shape[0]
-            sobol_poly_idx = np.zeros([n_coeffs, n_sobol_available])
-            for i_sobol in range(n_sobol_available):
-                sobol_poly_idx[:, i_sobol] = np.all(sobol_mask == sobol_idx_bool[i_sobol], axis=1)
-            sobol = np.zeros([n_sobol_available, n_out])
-            for i_sobol in range(n_sobol_available):
-                sobol[i_sobol] = np.sum(
-                    np.square(coefficients[sobol_poly_idx[:, i_sobol] == 1]), axis=0)
-            idx_sort_descend_1st = np.argsort(sobol[:, 0], axis=0)[::-1]
-            sobol = sobol[idx_sort_descend_1st, :]
-            sobol_idx_bool = sobol_idx_bool[idx_sort_descend_1st]
-            sobol_idx = [0 for _ in range(sobol_idx_bool.shape[0])]
-            for i_sobol in range(sobol_idx_bool.shape[0]):
-                sobol_idx[i_sobol] = np.array(
-                    [i for i, x in enumerate(sobol_idx_bool[i_sobol, :]) if x])
-            var = ((coefficients[1:]**2).sum(axis=0))
-            sobol = sobol / (var + np.finfo(float).tiny)
-            return sobol, sobol_idx, sobol_idx_bool
-
-        def build_surrogate_der(Y_hat, verbose=False):
-            '''Computes derivative of the polynomial Y_hat w.r.t. Vars
-            Parameter T specifies the time dimension
-            '''
-
-            # Build derivative with respect to all variables
-            dim = len(self.sampler.vary.vary_dict)
-            if dim < 1:
-                return 0
-            elif dim == 1:
-                Vars = [cp.variable(dim).names[0]]
-            else:
-                Vars = [v.names[0] for v in cp.variable(dim)]
-
-            T = len(Y_hat)
-
-            assert(len(Vars) == len(self.sampler.vary.vary_dict))
-
-            # derivative of the PCE expansion
-            # {dYhat_dx1: [t0, t1, ...],
-            #  dYhat_dx2: [t0, t1, ...],
-            #  ...,
-            #  dYhat_dxN: [t0, t1, ...] }
-            dY_hat = {v:[cp.polynomial(0) for t in range(T)] for v in self.sampler.vary.vary_dict}
-
-            for t in range(T):
-
-                for n1, n2 in zip(Y_hat[t].names, Vars):
-                    assert(n1 == n2)
-
-                for d_var_idx, (d_var, d_var_app) in enumerate(zip(Vars, self.sampler.vary.vary_dict)):
-
-                    if verbose:
-                        print(f'Computing derivative d(Y_hat)/d({d_var})')
-                        print('='*40)
-
-                    # Some variables are missing in the expression,
-                    # then they must be constant terms only i.e. sum(exp==0)
-                    if Y_hat[t].exponents.shape[1] < dim:
-                        #exponents.shape: (n_summands, n_variables)
-                        assert(sum(sum(np.array(Y_hat[t].exponents))) == 0)
-                        continue
-
-                    # Consider only polynomial components var^exp where exp > 0 (since the derivative decreases exp by -1)
-                    components_mask = np.array(Y_hat[t].exponents[:,d_var_idx] > 0)
-                    dY_hat_dvar_exp = Y_hat[t].exponents[components_mask]
-                    dY_hat_dvar_coeff = np.array(Y_hat[t].coefficients)[components_mask]
-
-                    # Iterate over all polynomial components (summands)
-                    for i, (coeff, exp) in enumerate(zip(dY_hat_dvar_coeff, dY_hat_dvar_exp)):
-                        assert(exp[d_var_idx] > 0)
-
-                        # derivative = coeff*exp * var^(exp-1)
-                        dY_hat_dvar_coeff[i] = coeff * exp[d_var_idx]
-                        dY_hat_dvar_exp[i][d_var_idx] = exp[d_var_idx] - 1
-
-                    dY_hat[d_var_app][t] = numpoly.construct.polynomial_from_attributes(
-                                exponents=dY_hat_dvar_exp,
-                                coefficients=dY_hat_dvar_coeff,
-                                names=Y_hat[t].names,
-                                retain_coefficients=True,
-                                retain_names=True)
-
-            return dY_hat
-
         if data_frame is None:
             raise RuntimeError("Analysis element needs a data frame to "
                                "analyse")
@@ -397,14 +684,13 @@ class PCEAnalysis(BaseAnalysisElement):
                    'derivatives_first': {k: {p: np.zeros(T) for p in self.sampler.vary.vary_dict} for k in qoi_cols},
                    }
 
-        # Get sampler informations
-        P = self.sampler.P
-        nodes = self.sampler._nodes
-        weights = self.sampler._weights
-        regression = self.sampler.regression
+        # the orthogonal polynomials at the nodes, computed once and sent to
+        # the workers with the samples if the QoIs are analysed in parallel
+        design_matrix = self.sampler.design_matrix[:, :self.sampler.n_samples]
 
-        samples = {k: [] for k in qoi_cols}
+        qoi_args = {}
         for k in qoi_cols:
+            base = None
             if self.relative_analysis:
                 base = data_frame[k].values[self.sampler.n_samples]
                 if np.all(np.array(base) == 0):
@@ -414,156 +700,158 @@ class PCEAnalysis(BaseAnalysisElement):
                     warnings.warn(f"Removing QoI {k} from the analysis, contains some zeros", RuntimeWarning)
                     continue
 
-            samples[k] = data_frame[k].values[:self.sampler.n_samples]
-
-            # Compute descriptive statistics for each quantity of interest
-            if regression:
-                fit, fc = cp.fit_regression(P, [n[:self.sampler.n_samples] for n in nodes], samples[k], retall=1)
+            qoi_args[k] = (k, data_frame[k].values[:self.sampler.n_samples], base,
+                           design_matrix)
+
+        if not self.sampling and self._sobol_matrix[0] is not self.sampler.P:
+            self._sobol_matrix = (self.sampler.P,
+                                  _sobol_matrix(self.sampler.P, len(self.sampler.vary.vary_dict)))
+
+        qoi_results = self.map_qois('_analyse_qoi', qoi_args)
+        for k, qoi_result in qoi_results.items():
+            for name, value in qoi_result.items():
+                results[name][k] = value
+
+        # The statistics below are computed when they are first accessed, the
+        # ones estimated by sampling are seeded from the current global random
+        # state, which is not advanced
+        state = np.random.get_state()
+        seed = [int(state[2])] + state[1].tolist()
+        distribution = self.sampler.distribution
+        results['percentiles'] = _LazyStatistic(
+            _percentiles, {k: (results['fit'][k], distribution, qoi_args[k][2]) for k in qoi_args},
+            {k: results['percentiles'][k] for k in qoi_cols if k not in qoi_args}, seed + [0])
+        params = list(self.sampler.vary.vary_dict)
+        point = self._derivative_point()
+        results['derivatives_first'] = _LazyStatistic(
+            _derivatives_first, {k: (results['fit'][k], point, params) for k in qoi_args},
+            {k: results['derivatives_first'][k] for k in qoi_cols if k not in qoi_args})
+        for name, compute, flag, method, stat_seed in [
+                ('correlation_matrices', _correlation_matrix, self.CorrelationMatrices, 'cp.Corr', None),
+                ('output_distributions', _output_distribution, self.OutputDistributions,
+                 'cp.QoI_Dist', seed + [1])]:
+            if self.sampler._is_dependent or not flag:
+                warnings.warn(f"Skipping computation of {method}", RuntimeWarning)
+                results[name].update({k: None for k in qoi_args})
             else:
-                fit, fc = cp.fit_quadrature(P, nodes, weights, samples[k], retall=1)
-            results['fit'][k] = fit
-            results['Fourier_coefficients'][k] = fc
-
-            # Percentiles: 1%, 10%, 50%, 90% and 99%
-            P01, P10, P50, P90, P99 = cp.Perc(
-                fit, [1, 10, 50, 90, 99], self.sampler.distribution).squeeze()
-            results['percentiles'][k] = {'p01': P01, 'p10': P10, 'p50': P50, 'p90': P90, 'p99': P99}
-
-            if self.sampling:  # use Chaospy's sampling method
-
-                # Statistical moments
-                mean = cp.E(fit, self.sampler.distribution)
-                var = cp.Var(fit, self.sampler.distribution)
-                std = cp.Std(fit, self.sampler.distribution)
-                results['statistical_moments'][k] = {'mean': mean,
-                                                     'var': var,
-                                                     'std': std}
-
-                sobols_first_narr = cp.Sens_m(fit, self.sampler.distribution)
-                sobols_second_narr = cp.Sens_m2(fit, self.sampler.distribution)
-                sobols_total_narr = cp.Sens_t(fit, self.sampler.distribution)
-                sobols_first_dict = {}
-                sobols_second_dict = {}
-                sobols_total_dict = {}
-                for i, param_name in enumerate(self.sampler.vary.vary_dict):
-                    sobols_first_dict[param_name] = sobols_first_narr[i]
-                    sobols_second_dict[param_name] = sobols_second_narr[i]
-                    sobols_total_dict[param_name] = sobols_total_narr[i]
-
-                results['sobols_first'][k] = sobols_first_dict
-                results['sobols_second'][k] = sobols_second_dict
-                results['sobols_total'][k] = sobols_total_dict
-
-            else:  # use PCE coefficients
-
-                # Statistical moments
-                mean = fc[0]
-                var = np.sum(fc[1:]**2, axis=0)
-                std = np.sqrt(var)
-                results['statistical_moments'][k] = {'mean': mean,
-                                                     'var': var,
-                                                     'std': std}
-
-                # Sensitivity Analysis: First, Second and Total Sobol indices
-                sobol, sobol_idx, _ = sobols(P, fc)
-                varied = [_ for _ in self.sampler.vary.get_keys()]
-                S1 = {_: np.zeros(sobol.shape[-1]) for _ in varied}
-                ST = {_: np.zeros(sobol.shape[-1]) for _ in varied}
-                # S2 = {_ : {__: np.zeros(sobol.shape[-1]) for __ in varied} for _ in varied}
-                # for v in varied: del S2[v][v]
-                S2 = {_: np.zeros((len(varied), sobol.shape[-1])) for _ in varied}
-                for n, si in enumerate(sobol_idx):
-                    if len(si) == 1:
-                        v = varied[si[0]]
-                        S1[v] = sobol[n]
-                    elif len(si) == 2:
-                        v1 = varied[si[0]]
-                        v2 = varied[si[1]]
-                        # S2[v1][v2] = sobol[n]
-                        # S2[v2][v1] = sobol[n]
-                        S2[v1][si[1]] = sobol[n]
-                        S2[v2][si[0]] = sobol[n]
-                    for i in si:
-                        ST[varied[i]] += sobol[n]
-
-                results['sobols_first'][k] = S1
-                results['sobols_second'][k] = S2
-                results['sobols_total'][k] = ST
-
-            # Sensitivity Analysis: Derivative based
-            try:
-                dY_hat = build_surrogate_der(fit, verbose=False)
-                derivatives_first_dict = {}
-                Ndimensions = len(self.sampler.vary.vary_dict)
-                for i, param_name in enumerate(self.sampler.vary.vary_dict):
-                    if self.sampler.nominal_value:
-                        # Evaluate dY_hat['param'] at the nominal value of the parameters
-                        values = self.sampler.nominal_value
-                        logging.info(f"Using nominal value of the parameters to evaluate the derivative ")
-                        derivatives_first_dict[param_name] = cp.polynomial(dY_hat[param_name])(*[v for v in values.values()])
-                    elif all([type(v) == type(cp.Normal()) for v in self.sampler.vary.vary_dict.values()]):
-                        # Evaluate dY_hat['param'] at the mean of the parameters
-                        logging.info(f"Using mean value of the parameters to evaluate the derivative ")
-                        derivatives_first_dict[param_name] = cp.polynomial(dY_hat[param_name])(*[v.get_mom_parameters()["shift"][0] for v in self.sampler.vary.vary_dict.values()])
-                    elif all([type(v) == type(cp.Uniform()) for v in self.sampler.vary.vary_dict.values()]):
-                        logging.info(f"Using mean value of the parameters to evaluate the derivative ")
-                        # Evaluate dY_hat['param'] at the mean of the parameters
-                        derivatives_first_dict[param_name] = cp.polynomial(dY_hat[param_name])(*[(v.lower + v.upper)/2.0 for v in self.sampler.vary.vary_dict.values()])
-                    else:
-                        # Evaluate dY_hat['param'] at the zero vector
-                        logging.info(f"Using zero vector to evaluate the derivative ")
-                        derivatives_first_dict[param_name] = cp.polynomial(dY_hat[param_name])(*np.zeros(Ndimensions))
-
-                    results['derivatives_first'][k] = derivatives_first_dict
-
-            except Exception:
-                traceback.print_exc()
-
-            # Transform the relative numbers back to the absolute values
-            if self.relative_analysis:
-                base = data_frame[k].values[-1]
-
-                results['percentiles'][k]['p01'] = (1.0 + results['percentiles'][k]['p01']) * base
-                results['percentiles'][k]['p10'] = (1.0 + results['percentiles'][k]['p10']) * base
-                results['percentiles'][k]['p50'] = (1.0 + results['percentiles'][k]['p50']) * base
-                results['percentiles'][k]['p90'] = (1.0 + results['percentiles'][k]['p90']) * base
-                results['percentiles'][k]['p99'] = (1.0 + results['percentiles'][k]['p99']) * base
-                results['statistical_moments'][k]['mean'] = (1.0 + results['statistical_moments'][k]['mean']) * base
-                results['statistical_moments'][k]['var']  = (1.0 + results['statistical_moments'][k]['var']) * base
-                results['statistical_moments'][k]['std']  = (1.0 + results['statistical_moments'][k]['std']) * base
-
-            # Correlation matrix
-            try:
-                if self.sampler._is_dependent:
-                    warnings.warn(f"Skipping computation of cp.Corr", RuntimeWarning)
-                    results['correlation_matrices'][k] = None
-                else:
-                    if self.CorrelationMatrices:
-                        results['correlation_matrices'][k] = cp.Corr(fit, self.sampler.distribution)
-                    else:
-                        warnings.warn(f"Skipping computation of cp.Corr", RuntimeWarning)
-                        results['correlation_matrices'][k] = None
-            except Exception as e:
-                print ('Error %s for %s when computing cp.Corr()'% (e.__class__.__name__, k))
-                results['correlation_matrices'][k] = None
-            
-
-            # Output distributions
-            try:
-                if self.sampler._is_dependent:
-                    warnings.warn(f"Skipping computation of cp.QoI_Dist", RuntimeWarning)
-                    results['output_distributions'][k] = None
-                else:
-                    if self.OutputDistributions:
-                        results['output_distributions'][k] = cp.QoI_Dist( fit, self.sampler.distribution)
-                    else:
-                        warnings.warn(f"Skipping computation of cp.QoI_Dist", RuntimeWarning)
-                        results['output_distributions'][k] = None                        
-            except Exception as e:
-                print ('Error %s for %s when computing cp.QoI_Dist()'% (e.__class__.__name__, k))
-#                from traceback import print_exc
-#                print_exc()
-                results['output_distributions'][k] = None
+                results[name] = _LazyStatistic(
+                    compute, {k: (results['fit'][k], distribution, k) for k in qoi_args},
+                    {k: results[name][k] for k in qoi_cols if k not in qoi_args}, stat_seed)
 
         return PCEAnalysisResults(raw_data=results, samples=data_frame,
                                   qois=self.qoi_cols, inputs=list(self.sampler.vary.get_keys()))
+
+    def _analyse_qoi(self, k, samples, base=None, design_matrix=None):
+        """Fit the PCE expansion of a single quantity of interest and compute
+        its moments and Sobol indices.
+
+        Parameters
+        ----------
+        k : str
+            Name of the quantity of interest.
+        samples : NumPy array
+            The code evaluations for this quantity of interest.
+        base : NumPy array or None
+            The value for the nominal parameter values, used for relative analysis.
+        design_matrix : NumPy array or None
+            The orthogonal polynomials evaluated at the nodes, by default
+            `self.sampler.design_matrix`.
+
+        Returns
+        -------
+        dict
+            The entries of the analysis results for this quantity of interest.
+        """
+        # Get sampler informations
+        P = self.sampler.P
+        weights = self.sampler._weights
+        regression = self.sampler.regression
+
+        results = {}
+
+        # Compute descriptive statistics for each quantity of interest
+        if design_matrix is None:
+            design_matrix = self.sampler.design_matrix[:, :self.sampler.n_samples]
+        if regression:
+            fit, fc = _fit_regression(P, design_matrix, samples)
+        else:
+            fit, fc = _fit_quadrature(P, design_matrix, weights, samples)
+        results['fit'] = fit
+        results['Fourier_coefficients'] = fc
+
+        if self.sampling:  # use Chaospy's sampling method
+
+            # Statistical moments
+            mean = cp.E(fit, self.sampler.distribution)
+            var = cp.Var(fit, self.sampler.distribution)
+            std = cp.Std(fit, self.sampler.distribution)
+            results['statistical_moments'] = {'mean': mean,
+                                              'var': var,
+                                              'std': std}
+
+            sobols_first_narr = cp.Sens_m(fit, self.sampler.distribution)
+            sobols_second_narr = cp.Sens_m2(fit, self.sampler.distribution)
+            sobols_total_narr = cp.Sens_t(fit, self.sampler.distribution)
+            sobols_first_dict = {}
+            sobols_second_dict = {}
+            sobols_total_dict = {}
+            for i, param_name in enumerate(self.sampler.vary.vary_dict):
+                sobols_first_dict[param_name] = sobols_first_narr[i]
+                sobols_second_dict[param_name] = sobols_second_narr[i]
+                sobols_total_dict[param_name] = sobols_total_narr[i]
+
+            results['sobols_first'] = sobols_first_dict
+            results['sobols_second'] = sobols_second_dict
+            results['sobols_total'] = sobols_total_dict
+
+        else:  # use PCE coefficients
+
+            # Statistical moments
+            mean = fc[0]
+            var = np.sum(fc[1:]**2, axis=0)
+            std = np.sqrt(var)
+            results['statistical_moments'] = {'mean': mean,
+                                              'var': var,
+                                              'std': std}
+
+            # Sensitivity Analysis: First, Second and Total Sobol indices
+            varied = list(self.sampler.vary.get_keys())
+            d = len(varied)
+            fc_squared = fc.reshape(len(fc), -1)**2
+            sobol = self._sobol_matrix[1] @ fc_squared / (var.ravel() + np.finfo(float).tiny)
+            results['sobols_first'] = {v: sobol[j] for j, v in enumerate(varied)}
+            results['sobols_second'] = {v: sobol[d + j * d:d + (j + 1) * d]
+                                        for j, v in enumerate(varied)}
+            results['sobols_total'] = {v: sobol[d + d * d + j] for j, v in enumerate(varied)}
+
+        # Transform the relative numbers back to the absolute values
+        if self.relative_analysis:
+            results['statistical_moments']['mean'] = (1.0 + results['statistical_moments']['mean']) * base
+            results['statistical_moments']['var']  = (1.0 + results['statistical_moments']['var']) * base
+            results['statistical_moments']['std']  = (1.0 + results['statistical_moments']['std']) * base
+
+        return results
+
+    def _derivative_point(self):
+        """The point at which the derivative based sensitivity indices are evaluated.
+
+        Returns
+        -------
+        NumPy array
+            The nominal value of the parameters if given, otherwise their mean if all
+            parameters are normally or all are uniformly distributed, otherwise zero.
+        """
+        Ndimensions = len(self.sampler.vary.vary_dict)
+        if self.sampler.nominal_value:
+            logging.info(f"Using nominal value of the parameters to evaluate the derivative ")
+            point = list(self.sampler.nominal_value.values())
+        elif all([type(v) == type(cp.Normal()) for v in self.sampler.vary.vary_dict.values()]):
+            logging.info(f"Using mean value of the parameters to evaluate the derivative ")
+            point = [v.get_mom_parameters()["shift"][0] for v in self.sampler.vary.vary_dict.values()]
+        elif all([type(v) == type(cp.Uniform()) for v in self.sampler.vary.vary_dict.values()]):
+            logging.info(f"Using mean value of the parameters to evaluate the derivative ")
+            point = [(v.lower + v.upper)/2.0 for v in self.sampler.vary.vary_dict.values()]
+        else:
+            logging.info(f"Using zero vector to evaluate the derivative ")
+            point = np.zeros(Ndimensions)
+        return np.ravel(point)
@@ -17,6 +17,9 @@ __license__ = "LGPL"
 
 logger = logging.getLogger(__name__)
 
+# approximate number of bytes used by the bootstrap in QMCAnalysis.sobol_bootstrap
+BOOTSTRAP_MEMORY_BUDGET = 2**28
+
 
 class QMCAnalysisResults(AnalysisResults):
     """Analysis results for the QMCAnalysis Method. Refer to the AnalysisResults base class
@@ -71,7 +74,8 @@ class QMCAnalysisResults(AnalysisResults):
 
 
 class QMCAnalysis(BaseAnalysisElement):
-    def __init__(self, sampler, qoi_cols=None):
+    def __init__(self, sampler, qoi_cols=None, n_bootstrap=1000, seed=None,
+                 memory_budget=BOOTSTRAP_MEMORY_BUDGET, pool=None, executor=None, n_jobs=None):
         """Analysis element for Quasi-Monte Carlo (QMC).
 
         Parameters
@@ -81,6 +85,21 @@ class QMCAnalysis(BaseAnalysisElement):
         qoi_cols : list or None
             Column names for quantities of interest (for which analysis is to be
             performed).
+        n_bootstrap : int
+            Number of bootstrap samples used for the Sobol confidence intervals.
+        seed : None or int
+            Seed for the bootstrap resampling, makes the confidence intervals
+            reproducible. If None the global numpy random state is used.
+        memory_budget : int
+            Approximate number of bytes to be used by the bootstrap, see `sobol_bootstrap`.
+        pool : An Executor instance (e.g. ProcessPoolExecutor) or None
+            Pool used to process the bootstrap in parallel.
+        executor : An Executor instance (e.g. ProcessPoolExecutor) or None
+            If given, the quantities of interest are analysed in parallel in this
+            executor, see `map_qois`.
+        n_jobs : int or None
+            Number of processes used to analyse the quantities of interest in
+            parallel if no executor is given, -1 to use all cores.
         """
         if not isinstance(sampler, QMCSampler) and not isinstance(sampler, MCSampler):
             raise RuntimeError(
@@ -91,6 +110,13 @@ class QMCAnalysis(BaseAnalysisElement):
             self.qoi_cols = qoi_cols
         self.output_type = OutputType.SUMMARY
         self.sampler = sampler
+        self.n_bootstrap = n_bootstrap
+        self.seed = seed
+        self.memory_budget = memory_budget
+        self.pool = pool
+        self.executor = executor
+        self.n_jobs = n_jobs
+        self._stream = None
 
     def element_name(self):
         """Name for this element.
@@ -201,49 +227,169 @@ class QMCAnalysis(BaseAnalysisElement):
 
         # Extract output values for each quantity of interest from Dataframe
         samples = self.get_samples(data_frame)
+        # independent bootstrap seeds for each quantity of interest
+        if self.seed is None:
+            seeds = [None] * len(qoi_cols)
+        else:
+            seeds = np.random.SeedSequence(self.seed).spawn(len(qoi_cols))
 
         # Compute descriptive statistics for each quantity of interest
+        qoi_results = self.map_qois('_analyse_qoi', {
+            k: (k, samples[k], seed) for k, seed in zip(qoi_cols, seeds)}, pool=None)
         for k in qoi_cols:
-            # Find NaNs and create a mask excluding these samples from the analysis
-            # https://github.com/simetenn/uncertainpy/blob/ffb2400289743066265b9a8561cdf3b72e478a28/src/uncertainpy/core/uncertainty_calculations.py#L1532
-            masked_samples, mask = self.create_mask(samples[k])
-
-            results['statistical_moments'][k] = {'mean': np.mean(masked_samples, axis=0),
-                                                 'var': np.var(masked_samples, axis=0),
-                                                 'std': np.std(masked_samples, axis=0),
-                                                 'min': np.min(masked_samples, axis=0),
-                                                 'max': np.max(masked_samples, axis=0),
-                                                 'median': np.median(masked_samples, axis=0),
-                                                 }
-            results['percentiles'][k] = {'p1': np.percentile(masked_samples, 1, 0)[0],
-                                         'p10': np.percentile(masked_samples, 10, 0)[0],
-                                         'p50': np.percentile(masked_samples, 50, 0)[0],
-                                         'p90': np.percentile(masked_samples, 90, 0)[0],
-                                         'p99': np.percentile(masked_samples, 99, 0)[0]}
-
-            # Replace Nan values by the mean before proceeding with the SA
-            indices = np.where(mask == 0)[0] # samples[~mask] = results[k].mean
-            for i in indices:
-                samples[k][i] = results['statistical_moments'][k]['mean']
-
-            if not np.all(mask):
-                print("Warning: QoI \"{}\" only yields ".format(k) +
-                    "results for {}/{} ".format(sum(mask), len(mask)) +
-                    "parameter combinations. " +
-                    "Runs {} are not valid. ".format(indices+1) +
-                    "NaN results are set to the mean when calculating the Sobol indices. " +
-                    "This might affect the Sobol indices.")
-            
-            sobols_first, conf_first, sobols_total, conf_total = \
-                self.sobol_bootstrap(samples[k])
-            results['sobols_first'][k] = sobols_first
-            results['sobols_total'][k] = sobols_total
-            results['conf_sobols_first'][k] = conf_first
-            results['conf_sobols_total'][k] = conf_total
+            for name, value in qoi_results[k].items():
+                results[name][k] = value
 
         return QMCAnalysisResults(raw_data=results, samples=data_frame,
                                   qois=self.qoi_cols, inputs=list(self.sampler.vary.get_keys()))
 
+    def _analyse_qoi(self, k, samples, seed=None):
+        """Statistics and Sobol indices of a single quantity of interest.
+
+        Parameters
+        ----------
+        k : str
+            Name of the quantity of interest.
+        samples : NumPy array
+            The code evaluations for this quantity of interest.
+        seed : None, int or numpy.random.SeedSequence
+            Seed for the bootstrap resampling.
+
+        Returns
+        -------
+        dict
+            The entries of the analysis results for this quantity of interest.
+        """
+        results = {}
+        # Find NaNs and create a mask excluding these samples from the analysis
+        # https://github.com/simetenn/uncertainpy/blob/ffb2400289743066265b9a8561cdf3b72e478a28/src/uncertainpy/core/uncertainty_calculations.py#L1532
+        masked_samples, mask = self.create_mask(samples)
+
+        results['statistical_moments'] = {'mean': np.mean(masked_samples, axis=0),
+                                          'var': np.var(masked_samples, axis=0),
+                                          'std': np.std(masked_samples, axis=0),
+                                          'min': np.min(masked_samples, axis=0),
+                                          'max': np.max(masked_samples, axis=0),
+                                          'median': np.median(masked_samples, axis=0),
+                                          }
+        results['percentiles'] = {'p1': np.percentile(masked_samples, 1, 0)[0],
+                                  'p10': np.percentile(masked_samples, 10, 0)[0],
+                                  'p50': np.percentile(masked_samples, 50, 0)[0],
+                                  'p90': np.percentile(masked_samples, 90, 0)[0],
+                                  'p99': np.percentile(masked_samples, 99, 0)[0]}
+
+        # Replace Nan values by the mean before proceeding with the SA
+        indices = np.where(mask == 0)[0] # samples[~mask] = results[k].mean
+        for i in indices:
+            samples[i] = results['statistical_moments']['mean']
+
+        if not np.all(mask):
+            print("Warning: QoI \"{}\" only yields ".format(k) +
+                  "results for {}/{} ".format(sum(mask), len(mask)) +
+                  "parameter combinations. " +
+                  "Runs {} are not valid. ".format(indices+1) +
+                  "NaN results are set to the mean when calculating the Sobol indices. " +
+                  "This might affect the Sobol indices.")
+
+        sobols_first, conf_first, sobols_total, conf_total = \
+            self.sobol_bootstrap(samples, n_bootstrap=self.n_bootstrap, seed=seed,
+                                 memory_budget=self.memory_budget, pool=self.pool)
+        results['sobols_first'] = sobols_first
+        results['sobols_total'] = sobols_total
+        results['conf_sobols_first'] = conf_first
+        results['conf_sobols_total'] = conf_total
+        return results
+
+    def update(self, result):
+        """Update the running statistics with the result of a single run, as
+        received from `ActionPool.stream`. The results may arrive in any order and
+        from several action pools, they are placed in the sampling plan by their
+        'sample_index'.
+
+        The running mean and variance are updated with every result. The Sobol indices
+        are estimated from the complete blocks of the Saltelli sampling plan, i.e. from
+        the MC samples for which the evaluations on M2, all Ni and M1 are available.
+
+        Parameters
+        ----------
+        result : dict
+            The output of `Actions` for a single run.
+        """
+        if self._stream is None:
+            self._stream = {
+                'moments': {k: _RunningMoments() for k in self.qoi_cols},
+                'variance': {k: _RunningMoments() for k in self.qoi_cols},
+                'first': {k: 0.0 for k in self.qoi_cols},
+                'total': {k: 0.0 for k in self.qoi_cols},
+                'n_blocks': 0,
+                'blocks': {}}
+        stream = self._stream
+        values = {k: np.atleast_1d(np.asarray(result['result'][k], dtype=float))
+                  for k in self.qoi_cols}
+        for k in self.qoi_cols:
+            stream['moments'][k].update(values[k])
+        step = self.sampler.n_params + 2
+        block_index, position = divmod(result['sample_index'], step)
+        block = stream['blocks'].setdefault(block_index, {})
+        block[position] = values
+        if len(block) < step:
+            return
+        del stream['blocks'][block_index]
+        stream['n_blocks'] += 1
+        for k in self.qoi_cols:
+            f_M2 = block[0][k]
+            f_M1 = block[step - 1][k]
+            f_Ni = np.array([block[i + 1][k] for i in range(self.sampler.n_params)])
+            stream['variance'][k].update(f_M2)
+            stream['variance'][k].update(f_M1)
+            stream['first'][k] = stream['first'][k] + f_M1 * (f_Ni - f_M2)
+            stream['total'][k] = stream['total'][k] + (f_M2 - f_Ni) ** 2
+
+    def running_statistics(self):
+        """Statistics computed so far from the results passed to `update`.
+
+        Returns
+        -------
+        dict
+            With keys 'n_runs', 'n_blocks' (number of complete Saltelli blocks used for
+            the Sobol indices), 'statistical_moments' ('mean', 'var', 'std' and 'sem' -
+            the standard error of the mean - for each QoI) as well as 'sobols_first' and
+            'sobols_total' (for each QoI and input parameter, None until the first block
+            is complete).
+        """
+        if self._stream is None:
+            raise RuntimeError("No results have been passed to update yet")
+        stream = self._stream
+        statistics = {
+            'n_runs': stream['moments'][self.qoi_cols[0]].count,
+            'n_blocks': stream['n_blocks'],
+            'statistical_moments': {},
+            'sobols_first': {},
+            'sobols_total': {}
+        }
+        n_blocks = stream['n_blocks']
+        for k in self.qoi_cols:
+            moments = stream['moments'][k]
+            var = moments.variance()
+            statistics['statistical_moments'][k] = {
+                'mean': moments.mean,
+                'var': var,
+                'std': np.sqrt(var),
+                'sem': np.sqrt(var / moments.count)}
+            statistics['sobols_first'][k] = {}
+            statistics['sobols_total'][k] = {}
+            V = stream['variance'][k].variance()
+            for j, param_name in enumerate(self.sampler.vary.get_keys()):
+                if n_blocks == 0:
+                    statistics['sobols_first'][k][param_name] = None
+                    statistics['sobols_total'][k][param_name] = None
+                    continue
+                statistics['sobols_first'][k][param_name] = \
+                    stream['first'][k][j] / n_blocks / (V + (V == 0)) * (V != 0)
+                statistics['sobols_total'][k][param_name] = \
+                    0.5 * stream['total'][k][j] / n_blocks / (V + (V == 0)) * (V != 0)
+        return statistics
+
     def get_samples(self, data_frame):
         """
         Converts the Pandas dataframe into a dictionary.
@@ -259,12 +405,9 @@ class QMCAnalysis(BaseAnalysisElement):
             A dictionary with the QoI names as keys.
             Each element is a list of code evaluations.
         """
-        samples = {k: [] for k in self.qoi_cols}
-        for run_id in data_frame['run_id'].squeeze().unique():
-            for k in self.qoi_cols:
-                data = data_frame.loc[data_frame['run_id'].squeeze() == run_id][k]
-                samples[k].append(data.values)
-        return samples
+        samples = self.extract_samples(data_frame)
+        # one (1, size of the QoI) array per run
+        return {k: values[:, np.newaxis, :] for k, values in samples.items()}
 
     def sobol_bootstrap_(self, samples, alpha=0.05, n_samples=1000):
         """
@@ -343,12 +486,18 @@ class QMCAnalysis(BaseAnalysisElement):
 
         return sobols_first_dict, conf_first_dict, sobols_total_dict, conf_total_dict
     
-    def sobol_bootstrap(self, samples, alpha=0.05, n_bootstrap=1000):
+    def sobol_bootstrap(self, samples, alpha=0.05, n_bootstrap=1000, seed=None,
+                        memory_budget=BOOTSTRAP_MEMORY_BUDGET, pool=None):
         """
         Computes the first order and total order Sobol indices using Saltelli's
         method. To assess the sampling inaccuracy, bootstrap confidence intervals
         are also computed.
 
+        The resampled estimates are computed for all parameters at once, from the
+        number of times each MC sample is drawn in a bootstrap sample. The QoI
+        components and the bootstrap samples are processed in chunks such that the
+        memory used stays roughly within `memory_budget`.
+
         Reference: A. Saltelli, Making best use of model evaluations to compute
         sensitivity indices, Computer Physics Communications, 2002.
 
@@ -358,8 +507,15 @@ class QMCAnalysis(BaseAnalysisElement):
             The samples for a given QoI.
         alpha: float
             The (1 - alpha) * 100 confidence interval parameter. The default is 0.05.
-        n_samples: int
+        n_bootstrap: int
             The number of bootstrap samples. The default is 1000.
+        seed: None, int or numpy.random.Generator
+            Seed for the bootstrap resampling. If None the global numpy random
+            state is used.
+        memory_budget: int
+            Approximate number of bytes to be used for the bootstrap computation.
+        pool: An Executor instance (e.g. ProcessPoolExecutor) or None
+            If given, the chunks of QoI components are processed in this pool.
 
         Returns
         -------
@@ -378,59 +534,64 @@ class QMCAnalysis(BaseAnalysisElement):
         # the number of parameter and the number of MC samples in n_mc * (n_params + 2)
         # and the size of the QoI
         n_params = self.sampler.n_params
-        # n_mc = self.sampler.n_mc_samples
-        n_mc = int(samples.shape[0]/(n_params + 2))
+        n_mc = int(samples.shape[0] / (n_params + 2))
+        shape = samples[0].shape
         n_qoi = samples[0].size
-        sobols_first_dict = {}
-        conf_first_dict = {}
-        sobols_total_dict = {}
-        conf_total_dict = {}
 
         # code evaluations of input matrices M1, M2 and Ni, i = 1,...,n_params
         # see reference above.
         f_M2, f_M1, f_Ni = self._separate_output_values(samples, n_params, n_mc)
-        r = np.random.randint(n_mc, size=(n_mc, n_bootstrap))
+        f_M2 = f_M2.reshape(n_mc, n_qoi)
+        f_M1 = f_M1.reshape(n_mc, n_qoi)
+        f_Ni = f_Ni.reshape(n_mc, n_params, n_qoi)
+
+        # our point estimates for the 1st and total order Sobol indices
+        value_first = np.array([self._first_order(f_M2, f_M1, f_Ni[:, j])
+                                for j in range(n_params)])
+        value_total = np.array([self._total_order(f_M2, f_M1, f_Ni[:, j])
+                                for j in range(n_params)])
+
+        # column j of r holds the MC samples drawn in bootstrap sample j
+        if seed is None:
+            r = np.random.randint(n_mc, size=(n_mc, n_bootstrap))
+        else:
+            r = np.random.default_rng(seed).integers(n_mc, size=(n_mc, n_bootstrap))
+
+        # split the QoI such that the resampled estimates of a block, together with
+        # the terms they are computed from, use at most half of the memory budget
+        n_terms = 2 * n_params + 4
+        column_bytes = 8 * (2 * n_bootstrap * n_params + n_mc * n_terms)
+        block_size = int(min(n_qoi, max(1, memory_budget // 2 // column_bytes)))
+        # the other half is used for the bootstrap counts and the resampled means
+        chunk_bytes = 8 * (n_mc + n_terms * block_size)
+        chunk_size = int(min(n_bootstrap, max(1, memory_budget // 2 // chunk_bytes)))
+        blocks = [slice(start, start + block_size) for start in range(0, n_qoi, block_size)]
+        args = [(f_M2[:, block], f_M1[:, block], f_Ni[:, :, block], r,
+                 value_first[:, block], value_total[:, block], alpha, chunk_size)
+                for block in blocks]
+        if pool is None:
+            intervals = [_sobol_bootstrap_block(*arg) for arg in args]
+        else:
+            intervals = [future.result() for future in
+                         [pool.submit(_sobol_bootstrap_block, *arg) for arg in args]]
+        low_first, high_first, low_total, high_total = [
+            np.concatenate(bounds, axis=1) for bounds in zip(*intervals)]
 
+        # store results
+        sobols_first_dict = {}
+        conf_first_dict = {}
+        sobols_total_dict = {}
+        conf_total_dict = {}
         for j, param_name in enumerate(self.sampler.vary.get_keys()):
-
-            # our point estimate for the 1st and total order Sobol indices
-            value_first = self._first_order(f_M2, f_M1, f_Ni[:, j])
-            value_total = self._total_order(f_M2, f_M1, f_Ni[:, j])
-
-            # sobols computed from resampled data points
-            if n_mc * n_bootstrap * n_qoi <= 10**7:
-                #this is a vectorized computation, Is fast, but f_M2[r] will be of size
-                #(n_mc, n_bootstrap, n_qoi), this can become too large and cause a crash, 
-                #especially when dealing with large QoI (n_qoi >> 1). So this is only done
-                #when n_mc * n_bootstrap * n_qoi <= 10**7
-                print("Vectorized bootstrapping")
-                sobols_first = self._first_order(f_M2[r], f_M1[r], f_Ni[r, j])
-                sobols_total = self._total_order(f_M2[r], f_M1[r], f_Ni[r, j])
-            else:
-                #array for resampled estimates
-                sobols_first = np.zeros([n_bootstrap, n_qoi])
-                sobols_total = np.zeros([n_bootstrap, n_qoi])
-                print("Sequential bootstrapping")
-                #non-vectorized implementation
-                for i in range(n_bootstrap):
-                    #resampled sample matrices of size (n_mc, n_qoi)
-                    sobols_first[i] = self._first_order(f_M2[r[i]], f_M1[r[i]], f_Ni[r[i], j])
-                    sobols_total[i] = self._total_order(f_M2[r[i]], f_M1[r[i]], f_Ni[r[i], j])
-
-            # compute confidence intervals based on percentiles
-            _, low_first, high_first = confidence_interval(sobols_first, value_first,
-                                                           alpha, pivotal=True)
-            _, low_total, high_total = confidence_interval(sobols_total, value_total,
-                                                           alpha, pivotal=True)
-            # store results
-            sobols_first_dict[param_name] = value_first
-            conf_first_dict[param_name] = {'low': low_first, 'high': high_first}
-            sobols_total_dict[param_name] = value_total
-            conf_total_dict[param_name] = {'low': low_total, 'high': high_total}
+            sobols_first_dict[param_name] = value_first[j].reshape(shape)
+            conf_first_dict[param_name] = {'low': low_first[j].reshape(shape),
+                                           'high': high_first[j].reshape(shape)}
+            sobols_total_dict[param_name] = value_total[j].reshape(shape)
+            conf_total_dict[param_name] = {'low': low_total[j].reshape(shape),
+                                           'high': high_total[j].reshape(shape)}
 
         return sobols_first_dict, conf_first_dict, sobols_total_dict, conf_total_dict
 
-
     # Adapted from SALib
     @staticmethod
     def _separate_output_values(samples, n_params, n_mc_samples):
@@ -517,3 +678,83 @@ class QMCAnalysis(BaseAnalysisElement):
         """
         V = np.var(np.r_[f_M2, f_M1], axis=0)
         return 0.5 * np.mean((f_M2 - f_Ni) ** 2, axis=0) / (V + (V == 0)) * (V != 0)
+
+
+def _sobol_bootstrap_block(f_M2, f_M1, f_Ni, r, value_first, value_total, alpha, chunk_size):
+    """Bootstrap confidence intervals of the Sobol indices for a block of QoI
+    components. The mean of a term over a bootstrap sample is the mean weighted by
+    the number of times each MC sample was drawn, so the terms of the first and
+    total order estimators and of the variance are computed once and the resampled
+    means for a chunk of bootstrap samples are obtained with a single product.
+
+    Parameters
+    ----------
+    f_M2, f_M1: NumPy array
+        Code evaluations on M2 and M1, of shape (n_mc, n_cols).
+    f_Ni: NumPy array
+        Code evaluations on Ni, of shape (n_mc, n_params, n_cols).
+    r: NumPy array
+        Indices of the MC samples in each bootstrap sample, (n_mc, n_bootstrap).
+    value_first, value_total: NumPy array
+        Point estimates of the Sobol indices, of shape (n_params, n_cols).
+    alpha: float
+        The (1 - alpha) * 100 confidence interval parameter.
+    chunk_size: int
+        Number of bootstrap samples processed at once.
+
+    Returns
+    -------
+    Lower and upper bounds for the first order indices followed by the lower and
+    upper bounds for the total order indices, each of shape (n_params, n_cols).
+    """
+    n_mc, n_params, n_cols = f_Ni.shape
+    n_bootstrap = r.shape[1]
+    # the variance is computed from the raw moments of the centered evaluations
+    offset = 0.5 * (f_M2.mean(axis=0) + f_M1.mean(axis=0))
+    c_M2 = (f_M2 - offset)[:, np.newaxis]
+    c_M1 = (f_M1 - offset)[:, np.newaxis]
+    f_M2 = f_M2[:, np.newaxis]
+    f_M1 = f_M1[:, np.newaxis]
+    terms = np.concatenate([c_M2, c_M1, c_M2 ** 2, c_M1 ** 2,
+                            f_M1 * (f_Ni - f_M2), 0.5 * (f_M2 - f_Ni) ** 2], axis=1)
+    n_terms = terms.shape[1]
+    terms = terms.reshape(n_mc, n_terms * n_cols)
+    sobols_first = np.empty((n_bootstrap, n_params, n_cols))
+    sobols_total = np.empty((n_bootstrap, n_params, n_cols))
+    for start in range(0, n_bootstrap, chunk_size):
+        idx = r[:, start:start + chunk_size]
+        n = idx.shape[1]
+        counts = np.bincount((idx + n_mc * np.arange(n)).ravel(),
+                             minlength=n * n_mc).reshape(n, n_mc)
+        means = (counts @ terms / n_mc).reshape(n, n_terms, n_cols)
+        V = np.maximum(0.5 * (means[:, 2] + means[:, 3]) -
+                       (0.5 * (means[:, 0] + means[:, 1])) ** 2, 0.0)[:, np.newaxis]
+        scale = (V != 0) / (V + (V == 0))
+        sobols_first[start:start + n] = means[:, 4:4 + n_params] * scale
+        sobols_total[start:start + n] = means[:, 4 + n_params:] * scale
+    _, low_first, high_first = confidence_interval(sobols_first, value_first,
+                                                   alpha, pivotal=True)
+    _, low_total, high_total = confidence_interval(sobols_total, value_total,
+                                                   alpha, pivotal=True)
+    return low_first, high_first, low_total, high_total
+
+
+class _RunningMoments:
+    """Running mean and variance of vector valued samples, computed using
+    Welford's algorithm.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    def update(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean = self.mean + delta / self.count
+        self._m2 = self._m2 + delta * (value - self.mean)
+
+    def variance(self):
+        """Population variance (same as `np.var` with `ddof=0`)."""
+        return self._m2 / self.count
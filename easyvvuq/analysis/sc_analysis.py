@@ -11,6 +11,7 @@ import copy
 from easyvvuq import OutputType
 from .base import BaseAnalysisElement
 from .results import AnalysisResults
+from easyvvuq.sampling.stochastic_collocation import MultiIndexSet
 import logging
 import pandas as pd
 
@@ -86,7 +87,7 @@ class SCAnalysisResults(AnalysisResults):
 
 class SCAnalysis(BaseAnalysisElement):
 
-    def __init__(self, sampler=None, qoi_cols=None):
+    def __init__(self, sampler=None, qoi_cols=None, executor=None, n_jobs=None):
         """
         Parameters
         ----------
@@ -95,6 +96,12 @@ class SCAnalysis(BaseAnalysisElement):
         qoi_cols : list or None
             Column names for quantities of interest (for which analysis is
             performed).
+        executor : An Executor instance (e.g. ProcessPoolExecutor) or None
+            If given, the quantities of interest are analysed in parallel in this
+            executor, see `map_qois`.
+        n_jobs : int or None
+            Number of processes used to analyse the quantities of interest in
+            parallel if no executor is given, -1 to use all cores.
         """
 
         if sampler is None:
@@ -108,6 +115,8 @@ class SCAnalysis(BaseAnalysisElement):
         self.qoi_cols = qoi_cols
         self.output_type = OutputType.SUMMARY
         self.sampler = sampler
+        self.executor = executor
+        self.n_jobs = n_jobs
         self.dimension_adaptive = sampler.dimension_adaptive
         if self.dimension_adaptive:
             self.adaptation_errors = []
@@ -141,6 +150,11 @@ class SCAnalysis(BaseAnalysisElement):
         # make a copy of the state, and do not store the sampler as well
         state = copy.copy(self.__dict__)
         del state['sampler']
+        # the grid index is rebuilt when needed
+        state.pop('_grid_index', None)
+        state.pop('_grid_index_of', None)
+        # executors can not be pickled
+        state.pop('executor', None)
         file = open(filename, 'wb')
         pickle.dump(state, file)
         file.close()
@@ -221,11 +235,7 @@ class SCAnalysis(BaseAnalysisElement):
         # Extract output values for each quantity of interest from Dataframe
         logging.debug('Loading samples...')
         qoi_cols = self.qoi_cols
-        samples = {k: [] for k in qoi_cols}
-        for run_id in data_frame[('run_id', 0)].unique():
-            for k in qoi_cols:
-                values = data_frame.loc[data_frame[('run_id', 0)] == run_id][k].values
-                samples[k].append(values.flatten())
+        samples = self.extract_samples(data_frame)
         self.samples = samples
         logging.debug('done')
 
@@ -233,50 +243,85 @@ class SCAnalysis(BaseAnalysisElement):
         # must be initialised, see sc_expansion subroutine
         self.init_interpolation = True
 
-        # same pce coefs must be computed for every qoi
-        if self.sparse:
-            for qoi_k in qoi_cols:
-                self.pce_coefs[qoi_k] = self.SC2PCE(samples[qoi_k], qoi_k)
-                # size of one code sample
-                self.N_qoi[qoi_k] = self.samples[qoi_k][0].size
-
         # Compute descriptive statistics for each quantity of interest
         results = {'statistical_moments': {},
                    'sobols_first': {k: {} for k in self.qoi_cols},
                    'sobols': {k: {} for k in self.qoi_cols}}
 
+        qoi_results = self.map_qois('_analyse_qoi', {
+            qoi_k: (qoi_k, samples[qoi_k], self.pce_coefs[qoi_k], compute_moments, compute_Sobols)
+            for qoi_k in qoi_cols}, samples={}, pce_coefs={}, N_qoi={})
+        for qoi_k in qoi_cols:
+            qoi_result, self.pce_coefs[qoi_k] = qoi_results[qoi_k]
+            # size of one code sample
+            self.N_qoi[qoi_k] = samples[qoi_k][0].size
+            for name, value in qoi_result.items():
+                results[name][qoi_k] = value
+
+        results = SCAnalysisResults(raw_data=results, samples=data_frame,
+                                    qois=qoi_cols, inputs=list(self.sampler.vary.get_keys()))
+        results.surrogate_ = self.surrogate
+        return results
+
+    def _analyse_qoi(self, qoi_k, samples, pce_coefs, compute_moments=True,
+                     compute_Sobols=True):
+        """Statistical moments and Sobol indices of a single quantity of interest.
+
+        Parameters
+        ----------
+        qoi_k : str
+            Name of the quantity of interest.
+        samples : array
+            The code samples for this quantity of interest.
+        pce_coefs : dict
+            The PCE coefficients computed previously for this quantity of interest,
+            only the coefficients of new multi indices are computed.
+        compute_moments : bool
+            Whether to compute the statistical moments.
+        compute_Sobols : bool
+            Whether to compute the first order Sobol indices.
+
+        Returns
+        -------
+        dict, dict
+            The entries of the analysis results and the PCE coefficients (if the
+            grid is sparse) for this quantity of interest.
+        """
+        self.samples[qoi_k] = samples
+        self.pce_coefs[qoi_k] = pce_coefs
+        # size of one code sample
+        self.N_qoi[qoi_k] = samples[0].size
+        # same pce coefs must be computed for every qoi
+        if self.sparse:
+            self.pce_coefs[qoi_k] = self.SC2PCE(samples, qoi_k)
+
+        results = {}
         if compute_moments:
-            for qoi_k in qoi_cols:
-                if not self.sparse:
-                    mean_k, var_k = self.get_moments(qoi_k)
-                    std_k = np.sqrt(var_k)
-                else:
-                    self.pce_coefs[qoi_k] = self.SC2PCE(self.samples[qoi_k], qoi_k)
-                    mean_k, var_k, _ = self.get_pce_stats(self.l_norm, self.pce_coefs[qoi_k],
-                                                          self.comb_coef)
-                    std_k = np.sqrt(var_k)
+            if not self.sparse:
+                mean_k, var_k = self.get_moments(qoi_k)
+                std_k = np.sqrt(var_k)
+            else:
+                mean_k, var_k, _ = self.get_pce_stats(self.l_norm, self.pce_coefs[qoi_k],
+                                                      self.comb_coef)
+                std_k = np.sqrt(var_k)
 
-                # compute statistical moments
-                results['statistical_moments'][qoi_k] = {'mean': mean_k,
-                                                         'var': var_k,
-                                                         'std': std_k}
+            # compute statistical moments
+            results['statistical_moments'] = {'mean': mean_k,
+                                              'var': var_k,
+                                              'std': std_k}
 
         if compute_Sobols:
-            for qoi_k in qoi_cols:
-                if not self.sparse:
-                    results['sobols'][qoi_k] = self.get_sobol_indices(qoi_k, 'first_order')
-                else:
-                    _, _, _, results['sobols'][qoi_k] = self.get_pce_sobol_indices(
-                        qoi_k, 'first_order')
+            if not self.sparse:
+                results['sobols'] = self.get_sobol_indices(qoi_k, 'first_order')
+            else:
+                _, _, _, results['sobols'] = self.get_pce_sobol_indices(
+                    qoi_k, 'first_order')
 
-                for idx, param_name in enumerate(self.sampler.vary.get_keys()):
-                    results['sobols_first'][qoi_k][param_name] = \
-                        results['sobols'][qoi_k][(idx,)]
+            results['sobols_first'] = {}
+            for idx, param_name in enumerate(self.sampler.vary.get_keys()):
+                results['sobols_first'][param_name] = results['sobols'][(idx,)]
 
-        results = SCAnalysisResults(raw_data=results, samples=data_frame,
-                                    qois=qoi_cols, inputs=list(self.sampler.vary.get_keys()))
-        results.surrogate_ = self.surrogate
-        return results
+        return results, self.pce_coefs[qoi_k]
 
     def compute_comb_coef(self, **kwargs):
         """Compute general combination coefficients. These are the coefficients
@@ -289,19 +334,17 @@ class SCAnalysis(BaseAnalysisElement):
         else:
             l_norm = self.l_norm
 
-        comb_coef = {}
         logging.debug('Computing combination coefficients...')
-        for k in l_norm:
-            coef = 0.0
-            # for every k, subtract all multi indices
-            for l in l_norm:
-                z = l - k
-                # if the results contains only 0's and 1's, then z is the
-                # vector that can be formed from a tensor product of unit vectors
-                # for which k+z is in self.l_norm
-                if np.array_equal(z, z.astype(bool)):
-                    coef += (-1)**(np.sum(z))
-            comb_coef[tuple(k)] = coef
+        # the set of multi indices of self.l_norm is updated incrementally if it
+        # still contains the previous indices, which is the usual case
+        multi_idx_set = getattr(self, 'multi_idx_set', None)
+        if 'l_norm' in kwargs or multi_idx_set is None or \
+                multi_idx_set.N != l_norm.shape[1] or not multi_idx_set.issubset(l_norm):
+            multi_idx_set = MultiIndexSet(l_norm.shape[1])
+        multi_idx_set.add_all(l_norm)
+        if 'l_norm' not in kwargs:
+            self.multi_idx_set = multi_idx_set
+        comb_coef = {tuple(l): float(multi_idx_set.comb_coef[tuple(l)]) for l in l_norm.tolist()}
         logging.debug('done')
         return comb_coef
 
@@ -340,11 +383,11 @@ class SCAnalysis(BaseAnalysisElement):
         # load the code samples
         samples = []
         if isinstance(data_frame, pd.DataFrame):
-            for run_id in data_frame[('run_id', 0)].unique():
-                values = data_frame.loc[data_frame[('run_id', 0)] == run_id][qoi].values
-                samples.append(values.flatten())
+            samples = self.extract_samples(data_frame, [qoi])[qoi]
 
         if method == 'var':
+            # make sure self.multi_idx_set contains the current multi indices
+            self.comb_coef = self.compute_comb_coef()
             all_idx = np.concatenate((self.l_norm, self.sampler.admissible_idx))
             self.xi_1d = self.sampler.xi_1d
             self.wi_1d = self.sampler.wi_1d
@@ -366,9 +409,9 @@ class SCAnalysis(BaseAnalysisElement):
                 X_l = np.array(list(product(*X_l)))
                 # only consider new points, subtract the accepted points
                 X_l = setdiff2d(X_l, xi_d_accepted)
-                for xi in X_l:
-                    # find the location of the current xi in the global grid
-                    idx = np.where((xi == self.sampler.xi_d).all(axis=1))[0][0]
+                # find the location of the points of X_l in the global grid
+                X_l_idx = self.grid_indices(X_l, self.sampler.xi_d)
+                for xi, idx in zip(X_l, X_l_idx):
                     # hierarchical surplus error at xi
                     hier_surplus = samples[idx] - self.surrogate(qoi, xi)
                     if 'index' in kwargs:
@@ -383,8 +426,9 @@ class SCAnalysis(BaseAnalysisElement):
                 # create a candidate set of multi indices by adding the current
                 # admissible index to l_norm
                 candidate_l_norm = np.concatenate((self.l_norm, l.reshape([1, self.N])))
-                # now we must recompute the combination coefficients
-                c_l = self.compute_comb_coef(l_norm=candidate_l_norm)
+                # now we must recompute the combination coefficients, only those
+                # of the backward neighbours of l change
+                c_l = self.multi_idx_set.comb_coef_with(l)
                 _, var_candidate_l, _ = self.get_pce_stats(
                     candidate_l_norm, self.pce_coefs[qoi], c_l)
                 # error in var
@@ -633,13 +677,42 @@ class SCAnalysis(BaseAnalysisElement):
             W_k = W_k * comb_coef[tuple(l)]
 
             # find corresponding code values
-            f_k = np.array([samples[np.where((x == xi_d).all(axis=1))[0][0]] for x in X_k])
+            f_k = np.array([samples[idx] for idx in self.grid_indices(X_k, xi_d)])
 
             # quadrature of Q^1_{k1} X ... X Q^1_{kN} product
             Q = Q + np.sum(f_k * W_k, axis=0).T
 
         return Q
 
+    def grid_indices(self, X, xi_d=None):
+        """Find the location of collocation points in a grid. The points are
+        looked up in a hash map from (exact) point coordinates to the position
+        in the grid, which is built once per grid.
+
+        Parameters
+        ----------
+        X : array
+            The points to look up, shape (number of points, N).
+        xi_d : array
+            The grid, default = self.xi_d
+
+        Returns
+        -------
+        array of int
+            The row of xi_d equal to each point of X. If a point occurs more
+            than once in xi_d, the first occurrence is returned.
+        """
+        if xi_d is None:
+            xi_d = self.xi_d
+        if getattr(self, '_grid_index_of', None) is not xi_d:
+            grid_index = {}
+            for i, x in enumerate(map(tuple, np.asarray(xi_d).tolist())):
+                grid_index.setdefault(x, i)
+            self._grid_index = grid_index
+            self._grid_index_of = xi_d
+        return np.array([self._grid_index[x] for x in map(tuple, np.asarray(X).tolist())],
+                        dtype=int)
+
     def get_moments(self, qoi):
         """
         Parameters
@@ -660,7 +733,7 @@ class SCAnalysis(BaseAnalysisElement):
         logging.debug('done')
         return mean_f, var_f
 
-    def sc_expansion(self, samples, x):
+    def sc_expansion(self, samples, x, batch_size=1000):
         """
         Non recursive implementation of the SC expansion. Performs interpolation
         of code output samples for both full and sparse grids.
@@ -672,6 +745,9 @@ class SCAnalysis(BaseAnalysisElement):
         x : array
             One or more locations in stochastic space at which to evaluate
             the surrogate.
+        batch_size : int
+            Maximum number of locations evaluated at once. The memory used
+            is proportional to batch_size times the number of code samples.
 
         Returns
         -------
@@ -680,47 +756,60 @@ class SCAnalysis(BaseAnalysisElement):
             specified by x.
 
         """
-        # Computing the tensor grid of each multiindex l (xi_d below)
-        # every time is slow. Instead store it globally, and only recompute when
+        # Computing the tensor grid of each multiindex l every time is slow.
+        # Instead store the interpolation plan globally, and only recompute when
         # self.l_norm has changed, when the flag init_interpolation = True.
         # This flag is set to True when self.analyse is executed
         if self.init_interpolation:
-            self.xi_d_per_l = {}
-            for l in self.l_norm:
-                # all points corresponding to l
-                xi = [self.xi_1d[n][l[n]] for n in range(self.N)]
-                self.xi_d_per_l[tuple(l)] = np.array(list(product(*xi)))
+            self.interpolation_plan = self.compute_interpolation_plan()
             self.init_interpolation = False
 
-        surr = 0.0
+        samples = np.array(samples)
+        samples = samples.reshape([samples.shape[0], -1])
+        x = np.asarray(x, dtype=float)
+        points = x.reshape([-1, self.N])
+
+        surr = np.zeros([points.shape[0], samples.shape[1]])
+        for start in range(0, points.shape[0], batch_size):
+            batch = points[start:start + batch_size]
+            # interpolation weight of every code sample at every point of the batch
+            weights = np.zeros([batch.shape[0], samples.shape[0]])
+            for coef, nodes, sample_idx in self.interpolation_plan:
+                # values of the Lagrange polynomials at x, per dimension
+                weight = lagrange_poly_matrix(batch[:, 0], nodes[0])
+                for n in range(1, self.N):
+                    weight = (weight[:, :, np.newaxis] *
+                              lagrange_poly_matrix(batch[:, n], nodes[n])[:, np.newaxis, :])
+                    weight = weight.reshape([batch.shape[0], -1])
+                # the points of a tensor product are unique
+                weights[:, sample_idx] += coef * weight
+            surr[start:start + batch_size] = weights @ samples
+
+        if x.ndim == 1:
+            return surr[0]
+        return surr
+
+    def compute_interpolation_plan(self):
+        """Compute the terms of the SC expansion, one per multi index l in
+        self.l_norm.
+
+        Returns
+        -------
+        list of tuples
+            The combination coefficient, the 1d collocation points per dimension,
+            and the indices of the code samples of the tensor product (in the
+            order of itertools.product) for every l with a non-zero coefficient.
+        """
+        plan = []
         for l in self.l_norm:
+            coef = self.comb_coef[tuple(l)]
+            if coef == 0:
+                continue
             # all points corresponding to l
-            # xi = [self.xi_1d[n][l[n]] for n in range(self.N)]
-            # xi_d = np.array(list(product(*xi)))
-            xi_d = self.xi_d_per_l[tuple(l)]
-
-            for xi in xi_d:
-                # indices of current collocation point
-                # in corresponding 1d colloc points (self.xi_1d[n][l[n]])
-                # These are the j of the 1D lagrange polynomials l_j(x), see
-                # lagrange_poly subroutine
-                idx = [(self.xi_1d[n][l[n]] == xi[n]).nonzero()[0][0] for n in range(self.N)]
-                # index of the code sample
-                sample_idx = np.where((xi == self.xi_d).all(axis=1))[0][0]
-
-                # values of Lagrange polynomials at x
-                if x.ndim == 1:
-                    weight = [lagrange_poly(x[n], self.xi_1d[n][l[n]], idx[n])
-                              for n in range(self.N)]
-                    surr += self.comb_coef[tuple(l)] * samples[sample_idx] * np.prod(weight, axis=0)
-                # batch setting, if multiple x values are presribed
-                else:
-                    weight = [lagrange_poly(x[:, n], self.xi_1d[n][l[n]], idx[n])
-                              for n in range(self.N)]
-                    surr += self.comb_coef[tuple(l)] * samples[sample_idx] * \
-                        np.prod(weight, axis=0).reshape([-1, 1])
-
-        return surr
+            nodes = [self.xi_1d[n][l[n]] for n in range(self.N)]
+            xi_d = np.array(list(product(*nodes)))
+            plan.append((coef, nodes, self.grid_indices(xi_d)))
+        return plan
 
     def get_sample_array(self, qoi):
         """
@@ -947,7 +1036,7 @@ class SCAnalysis(BaseAnalysisElement):
                     v_prod = v_prod.reshape([v_prod.size, 1])
 
                     # find corresponding code values
-                    f_k = np.array([samples[np.where((x == xi_d).all(axis=1))[0][0]] for x in x_l])
+                    f_k = np.array([samples[idx] for idx in self.grid_indices(x_l, xi_d)])
 
                     # the sum of all code sample * v_{k,j_1} * ... * v_{k,j_N}
                     # equals the PCE coefficient
@@ -1208,10 +1297,11 @@ class SCAnalysis(BaseAnalysisElement):
         # marginals h = f*w' integrated over u', so cardinality is that of u
         h = [0.0] * xi_d_u.shape[0]
         for i_u, xi_d_u_ in enumerate(xi_d_u):
-            for i_up, xi_d_u_prime_ in enumerate(xi_d_u_prime):
-                xi_s = np.concatenate((xi_d_u_, xi_d_u_prime_))[idxs]
-                # find the index of the corresponding code sample
-                idx = np.where(np.prod(self.xi_d == xi_s, axis=1))[0][0]
+            xi_s = [np.concatenate((xi_d_u_, xi_d_u_prime_))[idxs]
+                    for xi_d_u_prime_ in xi_d_u_prime]
+            # find the indices of the corresponding code samples
+            sample_idxs = self.grid_indices(xi_s)
+            for i_up, idx in enumerate(sample_idxs):
                 # perform quadrature
                 q_k = self.samples[qoi][idx]
                 h[i_u] += q_k * wi_d_u_prime[i_up].prod()
@@ -1256,33 +1346,57 @@ class SCAnalysis(BaseAnalysisElement):
 
         sobol = {}
 
+        # expand the multi-index indices of the tensor products
+        # (Q^1_{i1} - Q^1_{i1-1}) X ... X (Q^1_{id) - Q^1_{id-1}) and collect
+        # the total sign of every Q^1_l1 X ... X Q^1_l_N tensor prod
+        levels = {}
+        for l in self.l_norm:
+            diff_idx = np.array(list(product(*[[k, -(k - 1)] for k in l])))
+            for diff in diff_idx:
+                # if any Q^1_li is below the minimim level, Q^1_li is defined
+                # as zero: do not compute this Q^1_l1 X ... X Q^1_l_N tensor prod
+                if not (np.abs(diff) < self.l_norm_min).any():
+                    level = tuple(np.abs(diff))
+                    levels[level] = levels.get(level, 0) + np.sign(np.prod(diff))
+        levels = {level: sign for level, sign in levels.items() if sign != 0}
+
+        # the code samples of each tensor product, and their partial integrals
+        samples = np.array(self.samples[qoi])
+        samples = samples.reshape([samples.shape[0], -1])
+        marginals = {}
+
+        def marginal(level, u_prime):
+            """Integral of the tensor product of level over the dimensions u_prime,
+            shape ([number of points in dimension n for n in u] + [N_qoi])"""
+            key = (level, u_prime)
+            if key not in marginals:
+                if len(u_prime) == 0:
+                    xi = [self.xi_1d[n][level[n]] for n in range(self.N)]
+                    sample_idx = self.grid_indices(np.array(list(product(*xi))))
+                    marginals[key] = samples[sample_idx].reshape(
+                        [xi_n.size for xi_n in xi] + [samples.shape[1]])
+                else:
+                    # dimensions before u_prime[-1] have been integrated already
+                    n = u_prime[-1]
+                    marginals[key] = np.tensordot(marginal(level, u_prime[:-1]),
+                                                  self.wi_1d[n][level[n]],
+                                                  axes=([n - len(u_prime) + 1], [0]))
+            return marginals[key]
+
         for u in P[1:]:
 
             # complement of u
-            u_prime = np.delete(U, u)
+            u_prime = tuple(np.delete(U, u))
             D_u[u] = 0.0
 
-            for l in self.l_norm:
-
-                # expand the multi-index indices of the tensor product
-                # (Q^1_{i1} - Q^1_{i1-1}) X ... X (Q^1_{id) - Q^1_{id-1})
-                diff_idx = np.array(list(product(*[[k, -(k - 1)] for k in l])))
-
-                # perform analysis on each Q^1_l1 X ... X Q^1_l_N tensor prod
-                for diff in diff_idx:
-
-                    # if any Q^1_li is below the minimim level, Q^1_li is defined
-                    # as zero: do not compute this Q^1_l1 X ... X Q^1_l_N tensor prod
-                    if not (np.abs(diff) < self.l_norm_min).any():
-
-                        # mariginal integral h, integrate over dimensions u'
-                        h, wi_d_u = self.compute_marginal(qoi, u, u_prime, diff)
-
-                        # square result and integrate over remaining dimensions u
-                        for i_u in range(wi_d_u.shape[0]):
-                            D_u[u] += np.sign(np.prod(diff)) * h[i_u]**2 * wi_d_u[i_u].prod()
-
-                # D_u[u] = D_u[u].flatten()
+            for level, sign in levels.items():
+                # mariginal integral h, integrate over dimensions u'
+                h = marginal(level, u_prime)
+                # square result and integrate over remaining dimensions u
+                h = h**2
+                for n in reversed(u):
+                    h = np.tensordot(h, self.wi_1d[n][level[n]], axes=([h.ndim - 2], [0]))
+                D_u[u] += sign * h
 
             # all subsets of u
             W = list(powerset(u))[0:-1]
@@ -1405,6 +1519,35 @@ def lagrange_poly(x, x_i, j):
     # return np.prod((x - x_i_) / (x_i[j] - x_i_))
 
 
+def lagrange_poly_matrix(x, x_i):
+    """All Lagrange polynomials of a set of nodes, evaluated at several
+    locations. Equivalent to calling lagrange_poly for every location and
+    every j.
+
+    Parameters
+    ----------
+    x : array of float
+        locations at which to compute the polynomials, shape (n_points,)
+
+    x_i : list or array of float
+        nodes of the Lagrange polynomials
+
+    Returns
+    -------
+    array
+        l_j(x) of shape (n_points, len(x_i)).
+    """
+    x_i = np.asarray(x_i, dtype=float)
+    # barycentric weights 1 / product(x_j - x_m), m != j
+    diff_i = x_i[:, np.newaxis] - x_i[np.newaxis, :]
+    np.fill_diagonal(diff_i, 1.0)
+    w_i = 1.0 / np.prod(diff_i, axis=1)
+    # product(x - x_m), m != j
+    nom = np.repeat((x[:, np.newaxis] - x_i[np.newaxis, :])[:, np.newaxis, :], x_i.size, axis=1)
+    nom[:, np.arange(x_i.size), np.arange(x_i.size)] = 1.0
+    return np.prod(nom, axis=2) * w_i
+
+
 def setdiff2d(X, Y):
     """
     Computes the difference of two 2D arrays X and Y
@@ -5,6 +5,7 @@ ANALYSIS CLASS FOR THE SSC SAMPLER
 import numpy as np
 import pickle
 import copy
+from concurrent.futures import ProcessPoolExecutor
 from easyvvuq import OutputType
 from .base import BaseAnalysisElement
 from .results import AnalysisResults
@@ -68,7 +69,9 @@ class SSCAnalysisResults(AnalysisResults):
         Returns
         -------
         A function that takes a dictionary of parameter - value pairs and returns
-        a dictionary with the results (same output as decoder).
+        a dictionary with the results (same output as decoder). If the values are
+        arrays of length n_points the surrogate is evaluated at all n_points
+        points at once and the results are arrays of shape (n_points,).
         """
         def surrogate_fn(inputs):
             def swap(x):
@@ -76,6 +79,9 @@ class SSCAnalysisResults(AnalysisResults):
                     return list(x)
                 else:
                     return x[0]
+            if all(np.ndim(inputs[key]) > 0 for key in self.inputs):
+                values = np.column_stack([np.ravel(inputs[key]) for key in self.inputs])
+                return dict([(qoi, self.surrogate_(qoi, values)) for qoi in self.qois])
             values = np.squeeze(np.array([inputs[key] for key in self.inputs])).T
             results = dict([(qoi, swap(self.surrogate_(qoi, values))) for qoi in self.qois])
             return results
@@ -87,7 +93,7 @@ class SSCAnalysis(BaseAnalysisElement):
     SSc analysis class.
     """
 
-    def __init__(self, sampler=None, qoi_cols=None):
+    def __init__(self, sampler=None, qoi_cols=None, executor=None):
         """
         Parameters
         ----------
@@ -96,6 +102,11 @@ class SSCAnalysis(BaseAnalysisElement):
         qoi_cols : list or None
             Column names for quantities of interest (for which analysis is
             performed).
+        executor : ProcessPoolExecutor or None
+            If given, the LEC and ENO checks of update_surrogate are done by the
+            worker processes of this executor, which is reused in every update.
+            Otherwise the analysis creates its own worker processes when they
+            are first needed and keeps them until `close` is called.
         """
 
         if sampler is None:
@@ -109,6 +120,9 @@ class SSCAnalysis(BaseAnalysisElement):
         self.qoi_cols = qoi_cols
         self.output_type = OutputType.SUMMARY
         self.sampler = sampler
+        self.executor = executor
+        # worker pools created by the analysis, by number of processes
+        self._pools = {}
 
     def element_name(self):
         """Name for this element for logging purposes"""
@@ -129,12 +143,42 @@ class SSCAnalysis(BaseAnalysisElement):
             name to the file to write the state to
         """
         print("Saving analysis state to %s" % filename)
-        # make a copy of the state, and do not store the sampler as well
+        # make a copy of the state, and do not store the sampler and the worker
+        # processes as well
         state = copy.copy(self.__dict__)
         del state['sampler']
+        state.pop('executor', None)
+        state.pop('_pools', None)
         with open(filename, 'wb') as fp:
             pickle.dump(state, fp)
 
+    def close(self):
+        """
+        Shut down the worker processes created by update_surrogate. A user
+        supplied executor is left running. The analysis creates new worker
+        processes if it is updated again.
+        """
+        for pool in getattr(self, '_pools', {}).values():
+            pool.shutdown()
+        self._pools = {}
+
+    def _worker_pool(self, max_jobs):
+        """
+        The pool of worker processes used for tasks run by at most max_jobs processes:
+        the executor of the analysis if it has one, None if the tasks are run in this
+        process (max_jobs = 1), otherwise a pool of max_jobs processes created on first
+        use and kept for later updates.
+        """
+        if getattr(self, 'executor', None) is not None:
+            return self.executor
+        if max_jobs <= 1:
+            return None
+        if getattr(self, '_pools', None) is None:
+            self._pools = {}
+        if max_jobs not in self._pools:
+            self._pools[max_jobs] = ProcessPoolExecutor(max_jobs)
+        return self._pools[max_jobs]
+
     def load_state(self, filename):
         """
         Loads the complete state of the analysis object from a
@@ -212,14 +256,7 @@ class SSCAnalysis(BaseAnalysisElement):
 
         """
         print('Loading samples...')
-        qoi_cols = self.qoi_cols
-        samples = {k: [] for k in qoi_cols}
-        for k in qoi_cols:
-            for run_id in data_frame[('run_id', 0)].unique():
-                values = data_frame.loc[data_frame[('run_id', 0)] == run_id][k].values
-                samples[k].append(values.flatten())
-            samples[k] = np.array(samples[k])
-        self.samples = samples
+        self.samples = self.extract_samples(data_frame)
         print('done')
 
     def get_moments(self, qoi, n_mc):
@@ -245,14 +282,14 @@ class SSCAnalysis(BaseAnalysisElement):
         """
         print('Computing mean and variance...')
         Xi = self.sampler.sample_inputs(n_mc)
-        rvs = [self.surrogate(qoi, xi) for xi in Xi]
+        rvs = self.surrogate(qoi, Xi)
         mean = np.mean(rvs)
         var = np.var(rvs)
         print('done.')
         return np.array([mean]), np.array([var])
 
     def update_surrogate(self, qoi, data_frame, max_LEC_jobs=4, n_mc_LEC=5,
-                         max_ENO_jobs=4):
+                         max_ENO_jobs=4, chunk_size=None):
         """
         Update the SSC surrogate given new data. Given an EasyVVUQ dataframe,
         check the LEC condition, and compute the ENO interpolation stencils.
@@ -265,12 +302,21 @@ class SSCAnalysis(BaseAnalysisElement):
         data_frame : EasyVVUQ (pandas) data frame
             The code samples from the EasyVVUQ data frame.
         max_LEC_jobs : int, optional
-            The number of LEC checks to perform in parallel. The default is 4.
+            The number of worker processes for the LEC checks if the analysis
+            has no executor. The processes are started in the first update and
+            reused in later ones, until `close` is called. With 1 the checks are
+            done in this process. The default is 4.
         n_mc_LEC : int, optional
             The number of surrogate evaluations used in the LEC check.
             The default is 5.
-        max_LEC_jobs : int, optional
-            The number of ENO stencils to compute in parallel. The default is 4.
+        max_ENO_jobs : int, optional
+            The number of worker processes for the ENO stencils if the analysis
+            has no executor, kept like those of the LEC checks. If it equals
+            max_LEC_jobs, the same worker processes are used for both. With 1
+            the stencils are computed in this process. The default is 4.
+        chunk_size : int or None, optional
+            The number of elements handled per task by the worker processes,
+            see SSCSampler.check_LEC.
 
         Returns
         -------
@@ -308,7 +354,9 @@ class SSCAnalysis(BaseAnalysisElement):
         # check the LEC condition of all stencil
         res_LEC = self.sampler.check_LEC(p_j, v, S_j,
                                          n_mc=n_mc_LEC,
-                                         max_jobs=max_LEC_jobs)
+                                         max_jobs=max_LEC_jobs,
+                                         chunk_size=chunk_size,
+                                         executor=self._worker_pool(max_LEC_jobs))
         # updated polynomial order, stencil and el_idx are the element indices
         # per interpolation stencil
         p_j = res_LEC['p_j']
@@ -316,8 +364,9 @@ class SSCAnalysis(BaseAnalysisElement):
         el_idx = res_LEC['el_idx']
 
         # convert the nearest-neighbour stencils to ENO stencils
-        S_j, p_j, el_idx = self.sampler.compute_ENO_stencil(p_j, S_j, el_idx,
-                                                            max_jobs=max_ENO_jobs)
+        S_j, p_j, el_idx = self.sampler.compute_ENO_stencil(
+            p_j, S_j, el_idx, max_jobs=max_ENO_jobs, chunk_size=chunk_size,
+            executor=self._worker_pool(max_ENO_jobs))
         # store polynomial orders and stencils
         self.p_j = p_j
         self.S_j = S_j
@@ -399,20 +448,24 @@ class SSCAnalysis(BaseAnalysisElement):
         ----------
         qoi : string
             Name of the QoI.
-        xi : array, shape (n_xi,)
-            The location in the input space at which to evaluate the
+        xi : array, shape (n_xi,) or (n_points, n_xi)
+            The location(s) in the input space at which to evaluate the
             surrogate.
 
         Returns
         -------
         array
-            The surrogate output at xi
+            The surrogate output at xi, of shape (1,) for a single location
+            and (n_points,) otherwise.
 
         """
 
         if not isinstance(xi, np.ndarray):
             xi = np.array([xi])
 
+        if xi.ndim == 2:
+            return self.sampler.surrogate_batch(xi, self.S_j, self.p_j, self.samples[qoi])
+
         surr = self.sampler.surrogate(xi, self.S_j, self.p_j, self.samples[qoi])
         return np.array([surr])
 
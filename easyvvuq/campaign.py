@@ -10,7 +10,7 @@ import tempfile
 import easyvvuq
 from concurrent.futures import ProcessPoolExecutor
 from easyvvuq.constants import default_campaign_prefix, Status
-from easyvvuq.data_structs import RunInfo, CampaignInfo, AppInfo
+from easyvvuq.data_structs import CampaignInfo, AppInfo
 from easyvvuq.sampling import BaseSamplingElement
 from easyvvuq.actions import ActionPool
 import easyvvuq.db.sql as db
@@ -82,6 +82,13 @@ class Campaign:
         app), values lying within defined physical range, type checking etc. This should normally
         always be set to True, but in cases where the performance is too degraded, the checks can
         be disabled by setting to False.
+    result_encoding: str, optional, default='json'
+        How the simulation results are stored in the database. Either 'json' or 'binary'.
+        The binary encoding keeps numeric vector quantities of interest as raw typed buffers,
+        which is much more compact and faster to collate for long vectors. Campaigns with
+        results stored using either encoding can always be read back.
+    compress_results: bool, optional, default=False
+        Compress the results stored using the binary encoding.
 
     Attributes
     ----------
@@ -142,11 +149,15 @@ class Campaign:
             db_location=None,
             work_dir="./",
             change_to_state=False,
-            verify_all_runs=True
+            verify_all_runs=True,
+            result_encoding='json',
+            compress_results=False
     ):
 
         self.work_dir = os.path.realpath(os.path.expanduser(work_dir))
         self.verify_all_runs = verify_all_runs
+        self.result_encoding = result_encoding
+        self.compress_results = compress_results
 
         self.campaign_name = name
         self._campaign_dir = None
@@ -199,7 +210,9 @@ class Campaign:
         work_dir: str
             Work directory, defaults to cwd.
         """
-        self.campaign_db = db.CampaignDB(location=self.db_location)
+        self.campaign_db = db.CampaignDB(location=self.db_location,
+                                         result_encoding=self.result_encoding,
+                                         compress_results=self.compress_results)
         if self.campaign_db.campaign_exists(name):
             self.campaign_id = self.campaign_db.get_campaign_id(name)
             self._active_app_name = self.campaign_db.get_active_app()[0].name
@@ -351,30 +364,26 @@ class Campaign:
             logging.error(msg)
             raise Exception(msg)
         app_default_params = self._active_app["params"]
-        run_info_list = []
-        for new_run in runs:
-            if new_run is None:
-                msg = ("add_run() was passed new_run of type None. Bad sampler?")
-                logging.error(msg)
-                raise Exception(msg)
-            # Verify and complete run with missing/default param values
-            status = Status.NEW
-            try:
-                new_run = app_default_params.process_run(new_run, verify=self.verify_all_runs)
-            except RuntimeError:
-                if mark_invalid:
-                    new_run = app_default_params.process_run(new_run, verify=False)
-                    status = Status.INVALID
-                else:
-                    raise
-            # Add to run queue
-            run_info = RunInfo(app=self._active_app['id'],
-                               params=new_run,
-                               sample=self._active_sampler_id,
-                               campaign=self.campaign_id,
-                               status=status)
-            run_info_list.append(run_info)
-        self.campaign_db.add_runs(run_info_list, iteration=self._active_sampler.iteration)
+        runs = list(runs)
+        if any(new_run is None for new_run in runs):
+            msg = ("add_run() was passed new_run of type None. Bad sampler?")
+            logging.error(msg)
+            raise Exception(msg)
+        # Verify and complete runs with missing/default param values
+        params_list, errors = app_default_params.process_runs(runs, verify=self.verify_all_runs)
+        statuses = []
+        for error in errors:
+            if error is None:
+                statuses.append(Status.NEW)
+            elif mark_invalid:
+                statuses.append(Status.INVALID)
+            else:
+                logging.error(error)
+                raise RuntimeError(error)
+        # Add to run queue
+        self.campaign_db.add_runs_from_params(
+            params_list, app=self._active_app['id'], sampler=self._active_sampler_id,
+            campaign=self.campaign_id, status=statuses, iteration=self._active_sampler.iteration)
 
     def draw_samples(self, num_samples=0, mark_invalid=False):
         """Draws `num_samples` sets of parameters from the currently set
@@ -400,13 +409,16 @@ class Campaign:
                    f"is an infinite generator, therefore a finite number of "
                    f"draws (n > 0) must be specified.")
             raise RuntimeError(msg)
-        num_added = 0
-        new_runs = []
-        for new_run in self._active_sampler:
-            new_runs.append(new_run)
-            num_added += 1
-            if num_samples != 0 and num_added >= num_samples:
-                break
+        try:
+            new_runs = self._active_sampler.next_block(num_samples).to_dict('records')
+        except NotImplementedError:
+            num_added = 0
+            new_runs = []
+            for new_run in self._active_sampler:
+                new_runs.append(new_run)
+                num_added += 1
+                if num_samples != 0 and num_added >= num_samples:
+                    break
         self.add_runs(new_runs, mark_invalid)
         # Write sampler's new state to database
         self.campaign_db.update_sampler(self._active_sampler_id, self._active_sampler)
@@ -496,6 +508,17 @@ class Campaign:
         ActionPool
             An object containing ActionStatus instances to track action execution.
         """
+        # position of each run in the samples drawn from its sampler, the runs
+        # of a sampler are added in the order they are drawn
+        sample_indices = {}
+
+        def sample_index(run_id, sampler):
+            if sampler not in sample_indices:
+                run_ids = self.campaign_db.session.query(db.RunTable.id).\
+                    filter(db.RunTable.sampler == sampler).order_by(db.RunTable.id)
+                sample_indices[sampler] = {id_: index for index, (id_,) in enumerate(run_ids)}
+            return sample_indices[sampler][run_id]
+
         # Loop through all runs in this campaign with status ENCODED, and
         # run the specified action on each run's dir
         def inits():
@@ -503,6 +526,7 @@ class Campaign:
                     status=status, app_id=self._active_app['id']):
                 previous = {}
                 previous['run_id'] = run_id
+                previous['sample_index'] = sample_index(run_id, run_data['sampler'])
                 previous['campaign_dir'] = self._campaign_dir
                 previous['rundir'] = run_data['run_dir']
                 previous['run_info'] = run_data
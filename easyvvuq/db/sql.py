@@ -8,7 +8,8 @@ import logging
 import pandas as pd
 import numpy as np
 from sqlalchemy.sql import case
-from sqlalchemy import create_engine, Column, Integer, String, ForeignKey
+from sqlalchemy import create_engine, Column, Integer, String, ForeignKey, LargeBinary
+from sqlalchemy import select, update, func, bindparam
 from sqlalchemy.orm import sessionmaker, declarative_base
 from sqlalchemy import MetaData
 from sqlalchemy import text
@@ -18,6 +19,9 @@ from .base import BaseCampaignDB
 from easyvvuq import constants
 from easyvvuq import ParamsSpecification
 from easyvvuq.utils.helpers import easyvvuq_serialize, easyvvuq_deserialize
+from easyvvuq.utils.helpers import encode_result_blob, decode_result_blob
+from easyvvuq.utils.helpers import easyvvuq_serialize_state, easyvvuq_deserialize_state
+from easyvvuq.utils.helpers import encode_array, decode_array, STATE_ARRAYS_MAGIC
 
 
 __copyright__ = """
@@ -43,6 +47,9 @@ __copyright__ = """
 __license__ = "LGPL"
 
 COMMIT_RATE = 50000
+COLLATION_CHUNK_SIZE = 10000
+# arrays in the sampler state of at least this number of bytes are stored separately
+SAMPLER_ARRAY_MIN_SIZE = 2**16
 
 logger = logging.getLogger(__name__)
 
@@ -98,6 +105,15 @@ class RunTable(Base):
     iteration = Column(Integer, default=0)
 
 
+class ResultBlobTable(Base):
+    """An SQLAlchemy schema for the table holding binary encoded results.
+    A run has its result stored here when its `result` column in the run table is NULL.
+    """
+    __tablename__ = 'result_blob'
+    run = Column(Integer, ForeignKey('run.id'), primary_key=True)
+    result = Column(LargeBinary)
+
+
 class SamplerTable(Base):
     """An SQLAlchemy schema for the run table.
     """
@@ -106,6 +122,26 @@ class SamplerTable(Base):
     sampler = Column(String)
 
 
+class SamplerArrayTable(Base):
+    """An SQLAlchemy schema for the table holding the large arrays of the sampler
+    states in the NumPy .npy format. The arrays are referenced by their key in the
+    state stored in the sampler table, and are only written when they change.
+    """
+    __tablename__ = 'sampler_array'
+    sampler = Column(Integer, ForeignKey('sampler.id'), primary_key=True)
+    key = Column(String, primary_key=True)
+    array = Column(LargeBinary)
+
+
+def _convert_nonserializable(obj):
+    if isinstance(obj, np.int64):
+        return int(obj)
+    raise TypeError('Unknown type:', type(obj))
+
+
+_params_encoder = json.JSONEncoder(default=_convert_nonserializable)
+
+
 @event.listens_for(Engine, "connect")
 def set_sqlite_pragma(dbapi_connection, connection_record):
     cursor = dbapi_connection.cursor()
@@ -121,13 +157,23 @@ class CampaignDB(BaseCampaignDB):
     ----------
     location: str
        database URI as needed by SQLAlchemy
+    result_encoding: str
+       Encoding used to store new results. Either 'json' (default) or 'binary'.
+       Binary results keep numeric vectors as raw typed buffers instead of text.
+       Results stored using either encoding can always be read back.
+    compress_results: bool
+       Compress binary encoded results with zlib.
     """
 
-    def __init__(self, location=None):
+    def __init__(self, location=None, result_encoding='json', compress_results=False):
+        if result_encoding not in ('json', 'binary'):
+            raise ValueError("result_encoding must be either 'json' or 'binary'")
         if location is not None:
             self.engine = create_engine(location)
         else:
             self.engine = create_engine('sqlite://')
+        self.result_encoding = result_encoding
+        self.compress_results = compress_results
         self.commit_counter = 0
         session_maker = sessionmaker(bind=self.engine)
         self.session = session_maker()
@@ -300,9 +346,10 @@ class CampaignDB(BaseCampaignDB):
         int
             The sampler `id` in the database.
         """
-        db_entry = SamplerTable(sampler=easyvvuq_serialize(sampler_element))
-
+        db_entry = SamplerTable()
         self.session.add(db_entry)
+        self.session.flush()
+        self._store_sampler(db_entry, sampler_element)
         self.session.commit()
 
         return db_entry.id
@@ -320,9 +367,33 @@ class CampaignDB(BaseCampaignDB):
         """
 
         selected = self.session.get(SamplerTable,sampler_id)
-        selected.sampler = easyvvuq_serialize(sampler_element)
+        self._store_sampler(selected, sampler_element)
         self.session.commit()
 
+    def _store_sampler(self, db_entry, sampler_element):
+        """Store the state of a sampler. The large arrays in the state are written to
+        the 'sampler_array' table, unless they are already stored for this sampler.
+
+        Parameters
+        ----------
+        db_entry: SamplerTable
+            The entry of the sampler in the 'sampler' table.
+        sampler_element: Sampler
+            The sampler to store.
+        """
+        state, arrays = easyvvuq_serialize_state(sampler_element, SAMPLER_ARRAY_MIN_SIZE)
+        stored = {key for (key,) in self.session.query(SamplerArrayTable.key).filter_by(
+            sampler=db_entry.id)}
+        self.session.add_all([
+            SamplerArrayTable(sampler=db_entry.id, key=key, array=encode_array(arrays[key]))
+            for key in arrays.keys() - stored])
+        unused = stored - arrays.keys()
+        if unused:
+            self.session.query(SamplerArrayTable).filter(
+                SamplerArrayTable.sampler == db_entry.id,
+                SamplerArrayTable.key.in_(unused)).delete(synchronize_session=False)
+        db_entry.sampler = state
+
     def resurrect_sampler(self, sampler_id):
         """Return the sampler object corresponding to id sampler_id in the database.
         It is deserialized from the state stored in the database.
@@ -339,7 +410,13 @@ class CampaignDB(BaseCampaignDB):
         """
         try:
             serialized_sampler = self.session.get(SamplerTable,sampler_id).sampler 
-            sampler = easyvvuq_deserialize(serialized_sampler.encode('utf-8'))
+            if serialized_sampler.startswith(STATE_ARRAYS_MAGIC):
+                arrays = {row.key: decode_array(row.array) for row in self.session.query(
+                    SamplerArrayTable).filter_by(sampler=sampler_id)}
+                sampler = easyvvuq_deserialize_state(serialized_sampler, arrays)
+            else:
+                # stored by a version that pickled the complete sampler
+                sampler = easyvvuq_deserialize(serialized_sampler.encode('utf-8'))
         except AttributeError:
             sampler = None
         return sampler
@@ -378,38 +455,92 @@ class CampaignDB(BaseCampaignDB):
             Iteration number used by iterative workflows. For example, MCMC. Can be left
             as default zero in other cases.
         """
-        # Add all runs to RunTable
-        commit_counter = 0
+        runs = []
         for run_info in run_info_list:
-            run_info.run_name = f"{run_prefix}{self._next_run}"
+            run_info.run_name = f"{run_prefix}{self._next_run + len(runs)}"
             run_info.iteration = iteration
-            run = RunTable(**run_info.to_dict(flatten=True))
-            self.session.add(run)
-            self._next_run += 1
-            commit_counter += 1
-            if commit_counter % COMMIT_RATE == 0:
-                self.session.commit()
+            runs.append(run_info.to_dict(flatten=True))
+        self._insert_runs(runs)
+
+    def add_runs_from_params(self, params_list, app, sampler, campaign,
+                             status=constants.Status.NEW, run_prefix='run_', iteration=0):
+        """Add runs to the `runs` table in the database directly from their parameter
+        values, without creating a `RunInfo` object per run.
+
+        Parameters
+        ----------
+        params_list: list of dicts
+            Parameter values of each run.
+        app: int
+            ID of the associated application.
+        sampler: int
+            ID of the sampler that created the runs.
+        campaign: int
+            ID of the associated campaign.
+        status: enum(Status) or list of enum(Status)
+            Status of all runs or of each run separately.
+        run_prefix: str
+            Prefix for run name
+        iteration: int
+            Iteration number used by iterative workflows. For example, MCMC. Can be left
+            as default zero in other cases.
+        """
+        if isinstance(status, constants.Status):
+            statuses = [status] * len(params_list)
+        else:
+            statuses = status
+        names = np.char.add(run_prefix, np.arange(
+            self._next_run, self._next_run + len(params_list)).astype(str)).tolist()
+        encode = _params_encoder.encode
+        runs = [{'run_name': name,
+                 'run_dir': None,
+                 'params': encode(params),
+                 'status': status_,
+                 'campaign': campaign,
+                 'sampler': sampler,
+                 'app': app,
+                 'iteration': iteration} for name, params, status_ in
+                zip(names, params_list, statuses)]
+        self._insert_runs(runs)
+
+    def _insert_runs(self, runs):
+        """Insert runs into the run table using bulk inserts and update the run counter.
+
+        Parameters
+        ----------
+        runs: list of dicts
+            Column values for each run.
+        """
+        run_table = RunTable.__table__
+        for i in range(0, len(runs), COMMIT_RATE):
+            self.session.execute(run_table.insert(), runs[i:i + COMMIT_RATE])
+        self._next_run += len(runs)
         # Update run and ensemble counters in db
-        db_info = self.session.query(DBInfoTable).first()
-        db_info.next_run = self._next_run
+        self.session.execute(update(DBInfoTable).values(next_run=self._next_run))
         self.session.commit()
 
     @staticmethod
-    def _run_to_dict(run_row):
+    def _run_to_dict(run_row, blob=None):
         """Convert the provided row from 'runs' table into a dictionary
 
         Parameters
         ----------
         run_row: RunTable
             Information on a particular run in the database.
+        blob: bytes or None
+            The binary encoded result of the run, if it has one, see `_select_runs`.
 
         Returns
         -------
         dict
             Contains run information (keys = run_name, params, status, sample,
-            campaign and app)
+            campaign and app). The result is JSON encoded, also if it was stored
+            in binary form.
         """
 
+        result = run_row.result
+        if result is None and blob is not None:
+            result = json.dumps(decode_result_blob(blob), default=lambda obj: obj.tolist())
         run_info = {
             'run_name': run_row.run_name,
             'params': json.loads(run_row.params),
@@ -417,7 +548,7 @@ class CampaignDB(BaseCampaignDB):
             'sampler': run_row.sampler,
             'campaign': run_row.campaign,
             'app': run_row.app,
-            'result': run_row.result,
+            'result': result,
             'run_dir': run_row.run_dir
         }
 
@@ -617,7 +748,8 @@ class CampaignDB(BaseCampaignDB):
             sampler=None,
             status=None,
             not_status=None,
-            app_id=None):
+            app_id=None,
+            blobs=False):
         """Select all runs in the database which match the input criteria.
 
         Parameters
@@ -634,6 +766,9 @@ class CampaignDB(BaseCampaignDB):
             Exclude runs with this status string
         app_id: int or None
             App id to filter for.
+        blobs: bool
+            If True the binary encoded results are selected with the runs, as
+            (run, blob) rows with the blob None for runs without one.
 
         Returns
         -------
@@ -653,8 +788,13 @@ class CampaignDB(BaseCampaignDB):
             filter_options['app'] = app_id
 
         # Note that for some databases this can be sped up with a yield_per(), but not all
-        selected = self.session.query(RunTable).filter_by(
-            **filter_options).filter(RunTable.status != not_status)
+        if blobs:
+            selected = self.session.query(RunTable, ResultBlobTable.result)
+        else:
+            selected = self.session.query(RunTable)
+        selected = selected.filter_by(**filter_options).filter(RunTable.status != not_status)
+        if blobs:
+            selected = selected.outerjoin(ResultBlobTable, ResultBlobTable.run == RunTable.id)
 
         return selected
 
@@ -688,11 +828,12 @@ class CampaignDB(BaseCampaignDB):
             sampler=sampler,
             status=status,
             not_status=not_status,
-            app_id=app_id)
+            app_id=app_id,
+            blobs=True)
         if selected.count() != 1:
             logging.warning('Multiple runs selected - using the first')
-        selected = selected.first()
-        return self._run_to_dict(selected)
+        selected, blob = selected.first()
+        return self._run_to_dict(selected, blob)
 
     def runs(self, campaign=None, sampler=None, status=None, not_status=None, app_id=None):
         """A generator to return all run information for selected `campaign` and `sampler`.
@@ -721,9 +862,10 @@ class CampaignDB(BaseCampaignDB):
             sampler=sampler,
             status=status,
             not_status=not_status,
-            app_id=app_id)
-        for r in selected:
-            yield r.id, self._run_to_dict(r)
+            app_id=app_id,
+            blobs=True)
+        for r, blob in selected:
+            yield r.id, self._run_to_dict(r, blob)
 
     def run_ids(self, campaign=None, sampler=None, status=None, not_status=None, app_id=None):
         """A generator to return all run IDs for selected `campaign` and `sampler`.
@@ -813,28 +955,89 @@ class CampaignDB(BaseCampaignDB):
             useful in scenarios where you want several apps to work on the same runs.
         """
         self.commit_counter += 1
-
-        def convert_nonserializable(obj):
-            if isinstance(obj, np.int64):
-                return int(obj)
-            raise TypeError('Unknown type:', type(obj))
         result_ = result['result']
         result.pop('result')
         result.pop('run_info')
+        values = {'result': self._encode_result(run_id, result_), 'run_dir': result['rundir']}
         if change_status:
-            self.session.query(RunTable).\
-                filter(RunTable.id == run_id).\
-                update({'result': json.dumps(result_, default=convert_nonserializable),
-                        'status': constants.Status.COLLATED,
-                        'run_dir': result['rundir']})
-        else:
-            self.session.query(RunTable).\
-                filter(RunTable.id == run_id).\
-                update({'result': json.dumps(result_, default=convert_nonserializable),
-                        'run_dir': result['rundir']})
+            values['status'] = constants.Status.COLLATED
+        self.session.query(RunTable).\
+            filter(RunTable.id == run_id).\
+            update(values)
         if self.commit_counter % COMMIT_RATE == 0:
             self.session.commit()
 
+    def store_result_batch(self, results):
+        """Stores the results of several simulations using bulk updates and
+        commits them in a single transaction.
+
+        Parameters
+        ----------
+        results: list of tuples
+            Each tuple contains the arguments of `store_result` - a run id, the results
+            in dictionary form and whether the status of the run should be changed to
+            COLLATED. The results dictionaries are not modified.
+        """
+        collated = []
+        not_collated = []
+        blobs = []
+        for run_id, result, change_status in results:
+            values = {'id': run_id, 'run_dir': result['rundir']}
+            if self.result_encoding == 'binary':
+                values['result'] = None
+                blobs.append({'blob_run': run_id, 'result': encode_result_blob(
+                    result['result'], compress=self.compress_results)})
+            else:
+                values['result'] = json.dumps(result['result'], default=_convert_nonserializable)
+            if change_status:
+                values['status'] = constants.Status.COLLATED
+                collated.append(values)
+            else:
+                not_collated.append(values)
+        self._store_blobs(blobs)
+        for values in (collated, not_collated):
+            if values:
+                self.session.execute(update(RunTable), values)
+        self.session.commit()
+
+    def _encode_result(self, run_id, result):
+        """Encode a result according to the selected `result_encoding`.
+
+        Parameters
+        ----------
+        run_id: int
+            The id of a run the result belongs to.
+        result: dict
+            Results in dictionary form (decoder output).
+
+        Returns
+        -------
+        str or None
+            The value of the result column in the run table. None if the result
+            was stored in binary form.
+        """
+        if self.result_encoding == 'binary':
+            self._store_blobs([{'blob_run': run_id, 'result': encode_result_blob(
+                result, compress=self.compress_results)}])
+            return None
+        return json.dumps(result, default=_convert_nonserializable)
+
+    def _store_blobs(self, blobs):
+        """Write binary encoded results, replacing the ones the runs had before.
+
+        Parameters
+        ----------
+        blobs: list of dicts
+            Each with the run id under 'blob_run' and the encoded result under 'result'.
+        """
+        if not blobs:
+            return
+        blob_table = ResultBlobTable.__table__
+        self.session.execute(
+            blob_table.delete().where(blob_table.c.run == bindparam('blob_run')), blobs)
+        self.session.execute(
+            blob_table.insert().values(run=bindparam('blob_run')), blobs)
+
     def store_results(self, app_name, results):
         """Stores the results from a given run in the database.
 
@@ -854,7 +1057,8 @@ class CampaignDB(BaseCampaignDB):
             try:
                 self.session.query(RunTable).\
                     filter(RunTable.id == run_id, RunTable.app == app_id).\
-                    update({'result': json.dumps(result), 'status': constants.Status.COLLATED})
+                    update({'result': self._encode_result(run_id, result),
+                            'status': constants.Status.COLLATED})
                 commit_counter += 1
                 if commit_counter % COMMIT_RATE == 0:
                     self.session.commit()
@@ -885,37 +1089,121 @@ class CampaignDB(BaseCampaignDB):
             app_id = self.session.query(AppTable).filter(AppTable.name == app_name).all()[0].id
         except IndexError:
             raise RuntimeError("app with the name {} not found".format(app_name))
-        pd_result = {}
-        query = self.session.query(RunTable).\
-            filter(RunTable.app == app_id).\
-            filter(RunTable.sampler == sampler_id).\
-            filter(RunTable.status == status)
+        query = select(RunTable.id, RunTable.iteration, RunTable.params, RunTable.result,
+                       ResultBlobTable.result).\
+            outerjoin(ResultBlobTable, ResultBlobTable.run == RunTable.id).\
+            where(RunTable.app == app_id).\
+            where(RunTable.sampler == sampler_id).\
+            where(RunTable.status == status)
         # if only a specific iteration is requested filter it out
         if iteration >= 0:
-            query = query.filter(RunTable.iteration == iteration)
-        for row in query:
-            params = {'run_id': row.id}
-            params['iteration'] = row.iteration
-            params = {**params, **json.loads(row.params)}
-            result = json.loads(row.result)
-            pd_dict = {**params, **result}
-            for key in pd_dict.keys():
-                if not isinstance(pd_dict[key], list):
-                    try:
-                        pd_result[(key, 0)].append(pd_dict[key])
-                    except KeyError:
-                        pd_result[(key, 0)] = [pd_dict[key]]
-                else:
-                    for i, elt in enumerate(pd_dict[key]):
-                        try:
-                            pd_result[(key, i)].append(pd_dict[key][i])
-                        except KeyError:
-                            pd_result[(key, i)] = [pd_dict[key][i]]
-        try:
-            return pd.DataFrame(pd_result)
-        except ValueError:
-            raise RuntimeError(
-                'the results received from the database seem to be malformed - commonly because a vector quantity of interest changes dimensionality')
+            query = query.where(RunTable.iteration == iteration)
+        n_rows = self.session.execute(
+            select(func.count()).select_from(query.subquery())).scalar()
+        if n_rows == 0:
+            return pd.DataFrame({})
+        query = query.order_by(RunTable.id).execution_options(yield_per=COLLATION_CHUNK_SIZE)
+        keys = None
+        columns = {}
+        offset = 0
+        for chunk in self.session.execute(query).partitions():
+            ids, iterations, params, results, blobs = zip(*chunk)
+            # decode the whole chunk with a single call to the JSON parser
+            params = json.loads('[' + ','.join(params) + ']')
+            results = json.loads('[' + ','.join(result or 'null' for result in results) + ']')
+            # runs without a JSON result have it stored in binary form
+            if None in results:
+                results = [decode_result_blob(blob) if result is None else result
+                           for result, blob in zip(results, blobs)]
+            rows = [{'run_id': id_, 'iteration': iteration_, **params_, **result_}
+                    for id_, iteration_, params_, result_ in zip(ids, iterations, params, results)]
+            if keys is None:
+                keys = list(rows[0].keys())
+            try:
+                if any(len(row) != len(keys) for row in rows):
+                    raise KeyError
+                for key in keys:
+                    block = self._collation_block([row[key] for row in rows])
+                    if key not in columns:
+                        columns[key] = np.empty((n_rows, block.shape[1]), dtype=block.dtype)
+                    column = columns[key]
+                    if block.shape[1] != column.shape[1]:
+                        raise ValueError
+                    dtype = self._collation_dtype(column.dtype, block.dtype)
+                    if dtype != column.dtype:
+                        column = column.astype(dtype)
+                        columns[key] = column
+                    column[offset:offset + len(rows)] = block
+            except (KeyError, ValueError):
+                raise RuntimeError(
+                    'the results received from the database seem to be malformed - commonly because a vector quantity of interest changes dimensionality')
+            offset += len(rows)
+        pd_result = {}
+        for key in keys:
+            for i in range(columns[key].shape[1]):
+                pd_result[(key, i)] = columns[key][:offset, i]
+        return pd.DataFrame(pd_result)
+
+    @staticmethod
+    def _collation_block(values):
+        """Convert the decoded values of a single key, for a chunk of runs, into a
+        two dimensional array with one row per run.
+
+        Parameters
+        ----------
+        values: list
+            Scalars or lists (for vector quantities) decoded from the database.
+
+        Returns
+        -------
+        numpy.ndarray
+            Array of shape (len(values), width). Strings and other non-numeric
+            values are stored with the `object` dtype, as pandas would do.
+
+        Raises
+        ------
+        ValueError
+            If the vector quantities in `values` differ in length.
+        """
+        block = np.array(values)
+        if block.dtype.kind in 'USO':
+            block = np.array(values, dtype=object)
+        if block.ndim == 1:
+            if block.dtype == object and any(isinstance(value, list) for value in values):
+                raise ValueError
+            return block[:, np.newaxis]
+        if block.ndim == 2:
+            return block
+        # nested lists are stored as they are, one per cell
+        width = len(values[0])
+        block = np.empty((len(values), width), dtype=object)
+        for i, value in enumerate(values):
+            if len(value) != width:
+                raise ValueError
+            for j, elt in enumerate(value):
+                block[i, j] = elt
+        return block
+
+    @staticmethod
+    def _collation_dtype(current, new):
+        """Find a dtype able to hold both the values already collated and the new ones.
+
+        Parameters
+        ----------
+        current: numpy.dtype
+            dtype of the already allocated column
+        new: numpy.dtype
+            dtype of the chunk to be written into the column
+
+        Returns
+        -------
+        numpy.dtype
+        """
+        if current == new:
+            return current
+        if current.kind in 'iuf' and new.kind in 'iuf':
+            return np.result_type(current, new)
+        return np.dtype(object)
 
     def relocate(self, new_path, campaign_name):
         """Update all runs in the db with the new campaign path.
@@ -46,6 +46,9 @@ class EasyVVUQValidator(cerberus.Validator):
 
 class ParamsSpecification:
 
+    # Rules that process_runs is able to check column-wise, anything else is left to cerberus
+    _vectorized_rules = {'type', 'default', 'min', 'max'}
+
     def __init__(self, params, appname=None):
 
         if not isinstance(params, dict):
@@ -91,24 +94,117 @@ class ParamsSpecification:
         # correct, params are within specified ranges etc. Uses cerberus for this.
         if verify:
             if not self.cerberus_validator.validate(new_run):
-                errors = self.cerberus_validator.errors
-                msg = (
-                    f"Error when verifying the following new run:\n"
-                    f"{new_run}\n"
-                    f"Identified errors were:\n"
-                    f"{errors}\n")
-
-                errors_list = [error[0] for error in self.cerberus_validator.errors.values()]
-                if 'unknown field' in errors_list:
-                    msg += (
-                        f"The allowed parameter names for this app are:\n"
-                        f"{list(self.params_dict.keys())}")
-
+                msg = self._error_message(new_run, self.cerberus_validator.errors)
                 logger.error(msg)
                 raise RuntimeError(msg)
 
         return new_run
 
+    def process_runs(self, new_runs, verify=True):
+        """Fill in the default values and verify a batch of runs. Equivalent to calling
+        `process_run` on each run, but the checks are done column-wise and cerberus
+        is only used to produce the error reports for the runs that fail them. If the
+        parameter definitions use rules other than 'type', 'min' and 'max' all runs are
+        verified using cerberus.
+
+        Parameters
+        ----------
+        new_runs: list of dicts
+            Parameter values for each run. These are completed in place.
+        verify: bool
+            Whether to verify the runs.
+
+        Returns
+        -------
+        list of dicts, list
+            The completed runs and, for each run, either None if the run is valid or
+            a message describing the errors found.
+        """
+        new_runs = list(new_runs)
+        for param, param_def in self.params_dict.items():
+            default_val = param_def["default"]
+            for new_run in new_runs:
+                if param not in new_run:
+                    new_run[param] = default_val
+        errors = [None] * len(new_runs)
+        if not verify or not new_runs:
+            return new_runs, errors
+        if all(self._vectorized_rules.issuperset(param_def)
+               for param_def in self.params_dict.values()):
+            candidates = self._find_invalid_runs(new_runs)
+        else:
+            candidates = range(len(new_runs))
+        for i in candidates:
+            if not self.cerberus_validator.validate(new_runs[i]):
+                errors[i] = self._error_message(new_runs[i], self.cerberus_validator.errors)
+        return new_runs, errors
+
+    def _find_invalid_runs(self, new_runs):
+        """Find the runs that have unknown parameters, parameters of the wrong type or
+        outside of the allowed range.
+
+        Parameters
+        ----------
+        new_runs: list of dicts
+            Parameter values for each run (with the default values filled in).
+
+        Returns
+        -------
+        numpy.ndarray
+            Sorted indices of the invalid runs. All runs are returned if the checks
+            can not be done column-wise (e.g. for a type unknown to this method).
+        """
+        invalid = numpy.zeros(len(new_runs), dtype=bool)
+        if set().union(*new_runs) - self.params_dict.keys():
+            invalid |= [not (new_run.keys() <= self.params_dict.keys()) for new_run in new_runs]
+        types_mapping = self.cerberus_validator.types_mapping
+        for param, param_def in self.params_dict.items():
+            values = [new_run[param] for new_run in new_runs]
+            value_types = set(map(type, values))
+            if 'type' in param_def:
+                type_names = param_def['type']
+                if isinstance(type_names, str):
+                    type_names = [type_names]
+                if not all(name in types_mapping for name in type_names):
+                    return numpy.arange(len(new_runs))
+                definitions = [types_mapping[name] for name in type_names]
+                wrong_types = {value_type for value_type in value_types if not any(
+                    issubclass(value_type, definition.included_types) and
+                    not issubclass(value_type, definition.excluded_types)
+                    for definition in definitions)}
+            else:
+                wrong_types = {type(None)} & value_types
+            if wrong_types:
+                invalid |= [type(value) in wrong_types for value in values]
+            if 'min' not in param_def and 'max' not in param_def:
+                continue
+            if not all(issubclass(value_type, (int, float, numpy.number))
+                       for value_type in value_types):
+                invalid[:] = True
+                continue
+            values = numpy.asarray(values, dtype=float)
+            if 'min' in param_def:
+                invalid |= values < param_def['min']
+            if 'max' in param_def:
+                invalid |= values > param_def['max']
+        return numpy.flatnonzero(invalid)
+
+    def _error_message(self, new_run, errors):
+        """Format the cerberus errors found when verifying a run.
+        """
+        msg = (
+            f"Error when verifying the following new run:\n"
+            f"{new_run}\n"
+            f"Identified errors were:\n"
+            f"{errors}\n")
+
+        errors_list = [error[0] for error in errors.values()]
+        if 'unknown field' in errors_list:
+            msg += (
+                f"The allowed parameter names for this app are:\n"
+                f"{list(self.params_dict.keys())}")
+        return msg
+
     def serialize(self):
         return json.dumps(self.params_dict)
 
@@ -1,5 +1,7 @@
 from easyvvuq.base_element import BaseElement
 import logging
+import chaospy as cp
+import pandas as pd
 
 __copyright__ = """
 
@@ -89,6 +91,71 @@ class BaseSamplingElement(BaseElement):
         """
         raise NotImplementedError
 
+    def next_block(self, n):
+        """
+        Optional, returns the next `n` runs in the sequence at once.
+        Samplers that store their samples in an array should implement
+        it, the campaign object's draw_samples() method falls back to
+        __next__() if it raises NotImplementedError.
+
+        Parameters
+        ----------
+        n : int
+            Number of runs to return. If 0, all remaining runs of a finite
+            sampler are returned.
+
+        Returns
+        -------
+        pandas.DataFrame
+            One column per varied parameter and one row per run. Has fewer
+            than `n` rows (possibly none) if the sampler is exhausted.
+        """
+        raise NotImplementedError
+
+    def _block_bounds(self, n, n_samples):
+        """
+        Range of the samples returned by next_block, advances the count.
+
+        Parameters
+        ----------
+        n : int
+            Number of runs requested, 0 for all remaining runs.
+        n_samples : int
+            Total number of runs in the sampler.
+
+        Returns
+        -------
+        tuple
+            Start and stop indices of the block.
+        """
+        start = min(self.count, n_samples)
+        stop = n_samples if n <= 0 else min(start + n, n_samples)
+        self.count = max(self.count, stop)
+        return start, stop
+
+    def _to_block(self, xi, distributions=None):
+        """
+        Convert an array of samples to the format returned by next_block.
+
+        Parameters
+        ----------
+        xi : array-like
+            Array of shape (number of runs, number of parameters).
+        distributions : list or None
+            Distributions of the parameters. Values of cp.DiscreteUniform
+            parameters are converted to integers.
+
+        Returns
+        -------
+        pandas.DataFrame
+        """
+        block = pd.DataFrame(xi, columns=list(self.vary.get_keys()))
+        if distributions is not None:
+            for param_name, dist in zip(block.columns, distributions):
+                if isinstance(dist, cp.DiscreteUniform):
+                    block[param_name] = block[param_name].astype(int)
+        return block
+
     @property
     def analysis_class(self):
         raise NotImplementedError
@@ -90,6 +90,10 @@ class MCSampler(RandomSampler, sampler_name='MC_sampler'):
 
         return run_dict
 
+    def next_block(self, n):
+        start, stop = self._block_bounds(n, self.max_num)
+        return self._to_block(self.xi_mc[start:stop], self.params_distribution)
+
     def saltelli(self, n_mc):
         """
         Generates a Saltelli sampling plan of n_mc*(n_params + 2) input samples
@@ -1,9 +1,13 @@
+import copy
+import hashlib
 import logging
 import chaospy as cp
 import numpy as np
+import pandas as pd
 import random
 from .base import BaseSamplingElement, Vary
 from .transformations import Transformations
+from .pce_cache import PCECache
 
 __author__ = "Jalal Lakhlili"
 __copyright__ = """
@@ -28,6 +32,9 @@ __copyright__ = """
 """
 __license__ = "LGPL"
 
+# chaospy sampling rules which do not generate the same samples every time
+RANDOM_RULES = {'r', 'random', 'l', 'latin_hypercube'}
+
 
 class PCESampler(BaseSamplingElement, sampler_name="PCE_sampler"):
     def __init__(self,
@@ -40,7 +47,8 @@ class PCESampler(BaseSamplingElement, sampler_name="PCE_sampler"):
                  sparse=False,
                  growth=False,
                  relative_analysis=False,
-                 nominal_value=None):
+                 nominal_value=None,
+                 cache_dir=None):
         """
         Create the sampler for the Polynomial Chaos Expansion using
         pseudo-spectral projection or regression (Point Collocation).
@@ -88,6 +96,13 @@ class PCESampler(BaseSamplingElement, sampler_name="PCE_sampler"):
             Evaluate derivative of the model at the nominal value of the parameters.
             It should be a dict with the keys which are present in vary.
             In case the base_value is None, the mean of the distribution is used (assuming cp.Normal).    
+
+        cache_dir : str, optional
+            Directory of a cache for the polynomial expansion, the nodes and weights
+            and the design matrix (the expansion evaluated at the nodes). If given
+            these are loaded from the cache if they have been computed before for
+            the same distribution and settings, otherwise they are computed and stored.
+            Random sampling rules are never cached.
         """
 
         if vary is None:
@@ -189,8 +204,12 @@ class PCESampler(BaseSamplingElement, sampler_name="PCE_sampler"):
             logging.debug(f"The independent distribution consists of: {self.distribution}")
             logging.debug(f"Using parameter permutation: {list(vary.keys())}")
 
+        self.cache_dir = cache_dir
+        self._design_matrix = None
+
         # The orthogonal polynomials corresponding to the joint distribution
-        self.P = cp.expansion.stieltjes(polynomial_order, self.distribution, normed=True)
+        self.P = self._cached('expansion', lambda: cp.expansion.stieltjes(
+            polynomial_order, self.distribution, normed=True), polynomial_order=polynomial_order)
 
         # The quadrature information
         self.quad_sparse = sparse
@@ -218,9 +237,10 @@ class PCESampler(BaseSamplingElement, sampler_name="PCE_sampler"):
             # Generates samples
             self._n_samples = 2 * len(self.P)
             logging.info(f"Generating {self._n_samples} samples using {self.rule} rule")
-            self._nodes = cp.generate_samples(order=self._n_samples,
-                                              domain=self.distribution,
-                                              rule=self.rule)
+            self._nodes = self._cached('nodes', lambda: cp.generate_samples(
+                order=self._n_samples, domain=self.distribution, rule=self.rule),
+                n_samples=self._n_samples, rule=self.rule,
+                cache=self.rule.lower() not in RANDOM_RULES)
             
             # Transform relative nodes to absolute nodes
             if self.relative_analysis:
@@ -254,11 +274,11 @@ class PCESampler(BaseSamplingElement, sampler_name="PCE_sampler"):
 
             logging.info(f"Using pseudo-spectral method to create PCE")
             # Nodes and weights for the integration
-            self._nodes, self._weights = cp.generate_quadrature(order=polynomial_order,
-                                                                dist=self.distribution,
-                                                                rule=self.rule,
-                                                                sparse=sparse,
-                                                                growth=self.quad_growth)
+            self._nodes, self._weights = self._cached('quadrature', lambda: cp.generate_quadrature(
+                order=polynomial_order, dist=self.distribution, rule=self.rule,
+                sparse=sparse, growth=self.quad_growth),
+                polynomial_order=polynomial_order, rule=self.rule, sparse=sparse,
+                growth=self.quad_growth)
             # Number of samples
             self._n_samples = len(self._nodes[0])
             logging.info(f"Generated {self._n_samples} nodes/weights pairs using {self.rule} rule")
@@ -282,6 +302,54 @@ class PCESampler(BaseSamplingElement, sampler_name="PCE_sampler"):
             for i in range(count):
                 self.__next__()
 
+    def _cached(self, name, compute, cache=True, **params):
+        """Compute a part of the PCE setup, or load it from the cache in
+        `self.cache_dir` if there is one.
+
+        Parameters
+        ----------
+        name : str
+            Name of the cache entry.
+        compute : callable
+            Computes the entry.
+        cache : bool
+            False if the entry must not be cached.
+        params
+            Everything the entry depends on in addition to the joint distribution.
+
+        Returns
+        -------
+        The entry.
+        """
+        if getattr(self, 'cache_dir', None) is None or not cache:
+            return compute()
+        value = PCECache(self.cache_dir).get(name, compute, distribution=self.distribution,
+                                             **params)
+        if name == 'design_matrix':
+            return value
+        # a copy of the arrays loaded from disk, they can be modified by the sampler
+        return copy.deepcopy(value)
+
+    @property
+    def design_matrix(self):
+        """The orthogonal polynomials `self.P` evaluated at the nodes, an array of
+        shape (number of polynomials, number of nodes). It is computed (or loaded
+        from the cache) when first needed and is not part of the stored state of
+        the sampler.
+        """
+        if getattr(self, '_design_matrix', None) is None:
+            nodes = np.asarray(self._nodes)
+            self._design_matrix = self._cached(
+                'design_matrix', lambda: np.asarray(self.P(*nodes)),
+                polynomial_order=self.polynomial_order, nodes=hashlib.sha256(
+                    np.ascontiguousarray(nodes).tobytes()).hexdigest())
+        return self._design_matrix
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_design_matrix'] = None
+        return state
+
     def is_finite(self):
         return True
 
@@ -333,4 +401,18 @@ class PCESampler(BaseSamplingElement, sampler_name="PCE_sampler"):
             self.count += 1
             return run_dict
         else:
-            raise StopIteration
\ No newline at end of file
+            raise StopIteration
+
+    def next_block(self, n):
+        # the extra sample for the nominal case comes after the base samples
+        n_nominal = 1 if self.relative_analysis else 0
+        start, stop = self._block_bounds(n, self._n_samples + n_nominal)
+        stop_nodes = min(stop, self._n_samples)
+        if self._is_dependent:
+            block = self._to_block(np.asarray(self._nodes_dep)[:, start:stop_nodes].T)
+        else:
+            block = self._to_block(np.asarray(self._nodes)[:, start:stop_nodes].T,
+                                   self.params_distribution)
+        if start <= self._n_samples < stop:
+            block = pd.concat([block, pd.DataFrame([self.nominal_value])], ignore_index=True)
+        return block
@@ -0,0 +1,166 @@
+"""On-disk cache for the expensive parts of the PCE setup: the orthogonal
+polynomial expansion, the quadrature or regression nodes and weights and the
+expansion evaluated at the nodes (the design matrix). The entries are content
+addressed, i.e. stored under a hash of everything they are computed from, so
+a cache directory can be shared between campaigns.
+"""
+import hashlib
+import logging
+import os
+import pickle
+import tempfile
+import chaospy as cp
+import numpy as np
+
+__copyright__ = """
+
+    Copyright 2018 Robin A. Richardson, David W. Wright
+
+    This file is part of EasyVVUQ
+
+    EasyVVUQ is free software: you can redistribute it and/or modify
+    it under the terms of the Lesser GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    EasyVVUQ is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    Lesser GNU General Public License for more details.
+
+    You should have received a copy of the Lesser GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+__license__ = "LGPL"
+
+logger = logging.getLogger(__name__)
+
+
+def _content(value):
+    """A description of `value` that determines it completely, used to compute
+    the cache keys. Unlike the `repr` of a chaospy distribution, which leaves
+    out e.g. the samples of a kernel density estimate, it includes all data
+    the distribution holds. The internal caches and the dependency bookkeeping
+    of chaospy, which differs between processes, are left out.
+
+    Parameters
+    ----------
+    value
+        A chaospy distribution, NumPy array, scalar, string or a (nested)
+        list, tuple or dict of these.
+
+    Returns
+    -------
+    str or tuple
+
+    Raises
+    ------
+    TypeError
+        If `value` (or a part of it) cannot be described, e.g. a distribution
+        defined by Python functions.
+    """
+    if isinstance(value, cp.Distribution):
+        attributes = {name: attribute for name, attribute in vars(value).items()
+                      if name in ('_parameters', '_rotation') or
+                      not isinstance(attribute, (dict, list, set))}
+        return (type(value).__module__ + '.' + type(value).__qualname__, _content(attributes))
+    if isinstance(value, np.ndarray) and not value.dtype.hasobject:
+        return ('ndarray', value.dtype.str, value.shape,
+                hashlib.sha256(np.ascontiguousarray(value).tobytes()).hexdigest())
+    if isinstance(value, dict):
+        return tuple(sorted((repr(key), _content(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_content(item) for item in value)
+    if value is None or isinstance(value, (bool, int, float, complex, str, np.generic)):
+        return repr(value)
+    raise TypeError(f"cannot describe a {type(value).__name__} for the PCE cache")
+
+
+class PCECache:
+    """A directory of cached PCE setup entries.
+
+    Parameters
+    ----------
+    cache_dir: str
+        The directory to store the entries in, created if it does not exist.
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = os.path.realpath(os.path.expanduser(cache_dir))
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def key(name, **params):
+        """The key of an entry.
+
+        Parameters
+        ----------
+        name: str
+            Name of the entry, e.g. 'expansion'.
+        params
+            Everything the entry is computed from. The values are hashed using
+            their contents, see `_content`.
+
+        Returns
+        -------
+        str
+
+        Raises
+        ------
+        TypeError
+            If one of the values cannot be hashed.
+        """
+        description = repr((name, cp.__version__, sorted(
+            (param, _content(value)) for param, value in params.items())))
+        return name + '-' + hashlib.sha256(description.encode('utf-8')).hexdigest()
+
+    def get(self, name, compute, **params):
+        """Return an entry, computing and storing it if it is not in the cache.
+        Plain NumPy arrays are stored in the .npy format and memory mapped when loaded,
+        anything else is pickled. Entries whose parameters cannot be hashed,
+        e.g. a user defined distribution, are computed and not cached.
+
+        Parameters
+        ----------
+        name: str
+            Name of the entry.
+        compute: callable
+            Computes the entry if it is not in the cache.
+        params
+            Everything the entry is computed from, see `key`.
+
+        Returns
+        -------
+        The entry.
+        """
+        try:
+            path = os.path.join(self.cache_dir, self.key(name, **params))
+        except TypeError as error:
+            logger.debug(f"Not caching {name}: {error}")
+            return compute()
+        if os.path.exists(path + '.npy'):
+            logger.debug(f"Loading {name} from {path}.npy")
+            return np.load(path + '.npy', mmap_mode='r')
+        if os.path.exists(path + '.pickle'):
+            logger.debug(f"Loading {name} from {path}.pickle")
+            with open(path + '.pickle', 'rb') as fd:
+                return pickle.load(fd)
+        value = compute()
+        # write to a temporary file first so that concurrent readers never see
+        # a partially written entry
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir)
+        try:
+            with os.fdopen(fd, 'wb') as tmp:
+                if type(value) is np.ndarray:
+                    np.save(tmp, value)
+                    path = path + '.npy'
+                else:
+                    pickle.dump(value, tmp)
+                    path = path + '.pickle'
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        logger.debug(f"Stored {name} in {path}")
+        return value
@@ -136,3 +136,7 @@ class QMCSampler(BaseSamplingElement, sampler_name="QMC_sampler"):
             return run_dict
         else:
             raise StopIteration
+
+    def next_block(self, n):
+        start, stop = self._block_bounds(n, self.n_samples)
+        return self._to_block(self._samples.T[start:stop])
@@ -13,10 +13,14 @@ https://en.wikipedia.org/wiki/Halton_sequence
 """
 
 
+from .base import BaseSamplingElement
 from .random import RandomSampler
 
 
 class LHCSampler(RandomSampler, sampler_name='lhc_sampler'):
+    # the samples are drawn one at a time using __next__
+    next_block = BaseSamplingElement.next_block
+
     def __next__(self):
         if self.is_finite():
             if self.count >= self.max_num:
@@ -31,6 +35,9 @@ class LHCSampler(RandomSampler, sampler_name='lhc_sampler'):
 
 
 class HaltonSampler(RandomSampler, sampler_name='halton_sampler'):
+    # the samples are drawn one at a time using __next__
+    next_block = BaseSamplingElement.next_block
+
     def __next__(self):
         if self.is_finite():
             if self.count >= self.max_num:
@@ -1,4 +1,7 @@
 from .base import BaseSamplingElement, Vary
+import chaospy as cp
+import numpy as np
+import pandas as pd
 
 __copyright__ = """
     Copyright 2018 Robin A. Richardson, David W. Wright
@@ -19,15 +22,32 @@ __license__ = "LGPL"
 
 class RandomSampler(BaseSamplingElement, sampler_name="random_sampler"):
 
-    def __init__(self, vary=None, count=0, max_num=0, analysis_class=None):
+    def __init__(self, vary=None, count=0, max_num=0, analysis_class=None,
+                 seed=None, chunk_size=1000):
         """
-            Expects dict of var names, and their corresponding distributions
+            Expects dict of var names, and their corresponding distributions.
+            The samples are drawn from the joint distribution `chunk_size` at
+            a time, using a random number generator initialised with `seed`.
+            If `seed` is None it is drawn from the global NumPy random state when
+            the first samples are drawn, so that `np.random.seed` makes the samples
+            reproducible. The sequence of samples does not depend on `chunk_size`.
         """
         self.vary = Vary(vary)
         self.count = count
         self.max_num = max_num
         if analysis_class is not None:
             self.analysis_class_ = analysis_class
+        self.joint = cp.J(*self.vary.get_values())
+        self.seed = seed
+        self.chunk_size = chunk_size
+        # created when first needed if there is no seed, see `_draw`
+        self._rng = None if seed is None else np.random.default_rng(seed)
+        # samples drawn in advance, the generator state they were drawn with
+        # and the index of the next sample to be returned
+        self._chunk = None
+        self._chunk_state = None
+        self._chunk_size = 0
+        self._chunk_pos = 0
 
     def element_version(self):
         return "0.1"
@@ -64,8 +84,101 @@ class RandomSampler(BaseSamplingElement, sampler_name="random_sampler"):
                 raise StopIteration
 
         run_dict = {}
-        for param_name, dist in self.vary.get_items():
-            run_dict[param_name] = dist.sample(1)[0]
+        for (param_name, dist), value in zip(self.vary.get_items(), self._draw(1)[0]):
+            run_dict[param_name] = int(value) if dist.interpret_as_integer else value
 
         self.count += 1
         return run_dict
+
+    def next_block(self, n):
+        if self.is_finite():
+            start, stop = self._block_bounds(n, self.max_num)
+            n = stop - start
+        elif n <= 0:
+            raise RuntimeError("You can't draw all samples from an infinite sampler")
+        else:
+            self.count += n
+        block = pd.DataFrame(self._draw(n), columns=list(self.vary.get_keys()))
+        for param_name, dist in self.vary.get_items():
+            if dist.interpret_as_integer:
+                block[param_name] = block[param_name].astype(int)
+        return block
+
+    def _draw(self, n):
+        """Take the next `n` samples from the pre-drawn chunk, drawing new
+        chunks as needed.
+
+        Parameters
+        ----------
+        n : int
+            Number of samples.
+
+        Returns
+        -------
+        numpy.ndarray
+            Array of shape (n, number of parameters).
+        """
+        samples = []
+        while n > 0:
+            if self._chunk is None and self._chunk_pos < self._chunk_size:
+                # regenerate the chunk the sampler was stored with
+                rng = np.random.default_rng()
+                rng.bit_generator.state = self._chunk_state
+                self._chunk = self._transform(rng.random((self._chunk_size, len(self.joint))))
+            elif self._chunk_pos >= self._chunk_size:
+                size = max(self.chunk_size, n)
+                if self.is_finite():
+                    size = min(size, max(self.max_num - self.count, n))
+                if self._rng is None:
+                    # subclasses that do not draw from the generator (e.g. MCSampler)
+                    # leave the global random state untouched
+                    self._rng = np.random.default_rng(np.random.randint(2**32, dtype=np.uint64))
+                self._chunk_state = self._rng.bit_generator.state
+                self._chunk = self._transform(self._rng.random((size, len(self.joint))))
+                self._chunk_size = size
+                self._chunk_pos = 0
+            taken = self._chunk[self._chunk_pos:self._chunk_pos + n]
+            self._chunk_pos += len(taken)
+            n -= len(taken)
+            samples.append(taken)
+        if not samples:
+            return np.empty((0, len(self.joint)))
+        return np.concatenate(samples)
+
+    def _transform(self, uniform):
+        """Map samples from the unit hypercube to the joint distribution.
+
+        Parameters
+        ----------
+        uniform : numpy.ndarray
+            Array of shape (number of samples, number of parameters).
+
+        Returns
+        -------
+        numpy.ndarray
+            Array of the same shape.
+        """
+        samples = self.joint.inv(uniform.T).reshape(len(self.joint), -1)
+        for idx, dist in enumerate(self.vary.get_values()):
+            if dist.interpret_as_integer:
+                samples[idx] = np.round(samples[idx])
+        return samples.T
+
+    def __getstate__(self):
+        # the chunk is not stored, it is regenerated from the generator state
+        state = self.__dict__.copy()
+        state['_chunk'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if '_rng' not in state:
+            # stored by a version that drew the samples one at a time
+            self.joint = cp.J(*self.vary.get_values())
+            self.seed = None
+            self.chunk_size = 1000
+            self._rng = np.random.default_rng()
+            self._chunk = None
+            self._chunk_state = None
+            self._chunk_size = 0
+            self._chunk_pos = 0
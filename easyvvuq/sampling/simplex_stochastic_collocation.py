@@ -21,9 +21,11 @@ import numpy as np
 import pickle
 from itertools import product, combinations
 # import logging
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
 from scipy.spatial import Delaunay
 from scipy.special import factorial
-import multiprocessing as mp
+from .stencil_solver import DAFSILAS, solve_stencils
 
 
 __author__ = "Wouter Edeling"
@@ -110,6 +112,9 @@ class SSCSampler(BaseSamplingElement, sampler_name="ssc_sampler"):
             4 VERTICES TO MAKE A SQUARE IN A PLANE, NOT A 3D SIMPLEX. TURNED IT OFF.
             CONSEQUENCE: I NEED TO RE-MAKE A NEW 'Delaunay' OBJECT EVERYTIME THE GRID
             IS REFINED.
+            (Qhull does not allow the 'Qz' option in incremental mode, without it
+            cospherical points, such as the hypercube corners, give flat simplices
+            for n_xi >= 3.)
             """
             # tri = Delaunay(xi_k_jl, incremental=True)
             tri = Delaunay(xi_k_jl)
@@ -353,17 +358,29 @@ class SSCSampler(BaseSamplingElement, sampler_name="ssc_sampler"):
             xi_1 ** i_1 + ... + xi_{n_xi} ** i_{n_xi}.
 
         """
-        Np1 = xi_Sj.shape[0]
+        # the rows are the monomials at each point of the stencil
+        return self.compute_Psi_batch(xi_Sj, pmax)
 
-        Psi = np.ones([Np1, Np1])
+    def compute_Psi_batch(self, xi, pmax):
+        """
+        Compute the interpolation monomials at many points at once, i.e. the
+        rows of the Vandermonde matrix Psi (see compute_Psi) for the points xi.
 
-        for row in range(Np1):
-            for col in range(Np1):
-                for j in range(self.n_xi):
-                    # compute monomial xi_1 ** i_1 + ... + xi_{n_xi} ** i_{n_xi}
-                    Psi[row, col] *= xi_Sj[row][j] ** self.i_norm_le_pj[pmax][col][j]
+        Parameters
+        ----------
+        xi : array, shape (n_points, n_xi)
+            Points inside the stochastic input domain.
+        pmax : int
+            The max polynomial order of the local stencil.
+
+        Returns
+        -------
+        Psi_xi : array, shape (n_points, N + 1)
+            The monomials xi_1 ** i_1 * ... * xi_{n_xi} ** i_{n_xi} at each point.
 
-        return Psi
+        """
+        multi_idx = self.i_norm_le_pj[pmax]
+        return np.prod(xi[:, np.newaxis, :] ** multi_idx[np.newaxis, :, :], axis=2)
 
     def w_j(self, xi, c_jl, pmax):
         """
@@ -404,7 +421,7 @@ class SSCSampler(BaseSamplingElement, sampler_name="ssc_sampler"):
 
         return w_j_at_xi
 
-    def check_LEC(self, p_j, v, S_j, n_mc, max_jobs=4):
+    def check_LEC(self, p_j, v, S_j, n_mc, max_jobs=4, chunk_size=None, executor=None):
         """
         Check the Local Extremum Conserving propery of all simplex elements.
 
@@ -422,106 +439,94 @@ class SSCSampler(BaseSamplingElement, sampler_name="ssc_sampler"):
             The number of Monte Carlo samples to use in checking the LEC
             conditions.
         max_jobs : int
-            The number of LEC check (one per element) that can be run in
-            parallel.
+            The number of worker processes used if no executor is given. With
+            max_jobs = 1 the checks are done in this process.
+        chunk_size : int or None
+            The number of elements checked per task, by default the elements
+            are divided into 4 tasks per worker.
+        executor : ProcessPoolExecutor or None
+            A pool of worker processes to (re)use for the checks.
 
         Returns
         -------
-        None.
+        dict
+            The polynomial orders 'p_j', the stencils 'S_j' and the element
+            indices per stencil 'el_idx'.
 
         """
 
         n_e = self.tri.nsimplex
         print('Checking LEC condition of ' + str(n_e) + ' stencils...')
 
-        # multi-processing pool which will hold the check_LEC_j jobs
-        jobs = []
-        queues = []
-
-        running_jobs = 0
-        j = 0
-        n_jobs = n_e
+        # every check starts from the same random state, so that the result does
+        # not depend on how the elements are distributed over the workers
+        random_state = np.random.get_state()
+        arrays = {'points': self.tri.points, 'simplices': self.tri.simplices,
+                  'v': v, 'S_j': S_j}
+        args = [(chunk, p_j[chunk], n_mc, random_state) for chunk in
+                self._chunks(n_e, max_jobs, chunk_size, executor)]
+        results = self._map_chunks(_check_LEC_chunk, arrays, args, max_jobs, executor)
+        np.random.set_state(random_state)
 
         el_idx = {}
+        j = 0
+        for chunk_results in results:
+            for tmp in chunk_results:
+                p_j[j] = tmp['p_j[j]']
+                el_idx[j] = tmp['el_idx_j']
+                j += 1
 
-        # r = np.array(list(product([0.25, 0.75], repeat=self.n_xi)))
-
-        while n_jobs > 0:
-
-            # check how many processes are still alive
-            for p in jobs:
-                if p.is_alive() == False:
-                    jobs.remove(p)
+        print('done.')
+        return {'p_j': p_j, 'S_j': S_j, 'el_idx': el_idx}
 
-            # number of processes still running
-            running_jobs = len(jobs)
+    @staticmethod
+    def _chunks(n_e, max_jobs, chunk_size, executor):
+        """
+        Divide the element indices 0, ..., n_e - 1 into chunks of chunk_size elements,
+        by default into 4 chunks per worker.
+        """
+        if chunk_size is None:
+            n_workers = getattr(executor, '_max_workers', max_jobs)
+            chunk_size = max(1, -(-n_e // (4 * n_workers)))
+        return [np.arange(start, min(start + chunk_size, n_e))
+                for start in range(0, n_e, chunk_size)]
 
-            # re-fill jobs with max max_jobs processes
-            while running_jobs < max_jobs and n_jobs > 0:
-                queue = mp.Queue()
-                prcs = mp.Process(target=self.check_LEC_j,
-                                  args=(p_j[j], v, S_j[j, :], n_mc, queue))
-                prcs.start()
-                running_jobs += 1
-                n_jobs -= 1
-                j += 1
-                jobs.append(prcs)
-                queues.append(queue)
+    def _map_chunks(self, fn, arrays, args, max_jobs, executor):
+        """
+        Apply fn to each chunk of elements, in the worker processes of the executor,
+        a pool of max_jobs processes or, if max_jobs is 1, in this process. The arrays
+        are placed in shared memory once and reused by all tasks.
 
-        # retrieve results
-        for j in range(n_e):
-            # jobs[j].join()
-            tmp = queues[j].get()
-            p_j[j] = tmp['p_j[j]']
-            el_idx[j] = tmp['el_idx_j']
-
-    #    singular_idx = (p_j == -99).nonzero()[0]
-    #
-    #    jobs = []
-    #    queues = []
-    #    n_jobs = singular_idx.size
-    #
-    #    if singular_idx.size > 0:
-    #        nnS_j = compute_stencil_j(tri)
-    #
-    #    k = 0
-    #    while n_jobs > 0:
-    #
-    #        #check how many processes are still alive
-    #        for p in jobs:
-    #            if p.is_alive() == False:
-    #                jobs.remove(p)
-    #
-    #        #number of processes still running
-    #        running_jobs = len(jobs)
-    #
-    #        while running_jobs < max_jobs and n_jobs > 0:
-    #            #print 'Re-computing S_j for j = ' + str(j)
-    #            queue = mp.Queue()
-    #            #S_j[j,:], p_j[j], el_idx[j] = \
-    #            j = singular_idx[k]
-    #            k += 1
-    #            prcs = mp.Process(target=non_singular_stencil_j, \
-    #            args = (tri, p_j, S_j, j, nnS_j, i_norm_le_pj, el_idx, queue,))
-    #            prcs.start()
-    #            jobs.append(prcs)
-    #            queues.append(queue)
-    #
-    #            running_jobs += 1
-    #            n_jobs -= 1
-    #
-    #    #retrieve results
-    #    idx = 0
-    #    for j in singular_idx:
-    #        #jobs[idx].join()
-    #        tmp = queues[idx].get()
-    #        S_j[j,:] = tmp['S_j[j,:]']
-    #        p_j[j] = tmp['p_j[j]']
-    #        el_idx[j] = tmp['el_idx[j]']
-    #        idx += 1
+        Parameters
+        ----------
+        fn : callable
+            Called as fn(sampler, arrays, *args[i]) for each chunk i.
+        arrays : dict
+            The (large) arrays needed by fn.
+        args : list of tuples
+            The remaining arguments of fn, one tuple per chunk.
+        max_jobs : int
+            The number of worker processes if no executor is given.
+        executor : ProcessPoolExecutor or None
+            The pool of worker processes.
 
-        print('done.')
-        return {'p_j': p_j, 'S_j': S_j, 'el_idx': el_idx}
+        Returns
+        -------
+        list
+            The results of fn for each chunk.
+        """
+        if executor is None and max_jobs == 1:
+            return [fn(self, arrays, *args_i) for args_i in args]
+        shared = _SharedArrays(arrays)
+        pool = executor if executor is not None else ProcessPoolExecutor(max_jobs)
+        try:
+            state = (shared.descriptors, self.n_xi, self.i_norm_le_pj)
+            futures = [pool.submit(_run_chunk, fn, state, args_i) for args_i in args]
+            return [future.result() for future in futures]
+        finally:
+            if executor is None:
+                pool.shutdown()
+            shared.close()
 
     def find_simplices(self, S_j):
         """
@@ -539,15 +544,39 @@ class SSCSampler(BaseSamplingElement, sampler_name="ssc_sampler"):
             The element indices of stencil S_j.
 
         """
-        n_e = self.tri.nsimplex
+        indptr, indices = self.point_simplices()
+        # the elements that have at least one point in S_j, once per point in S_j
+        candidates = np.concatenate([indices[indptr[i]:indptr[i + 1]] for i in S_j])
         # if the overlap between element i and S_j = n_xi + 1, element i
         # is in S_j
-        idx = [np.in1d(self.tri.simplices[i], S_j).nonzero()[0].size for i in range(n_e)]
-        idx = (np.array(idx) == self.n_xi + 1).nonzero()[0]
+        candidates, overlap = np.unique(candidates, return_counts=True)
+        idx = candidates[overlap == self.n_xi + 1]
 
         return idx
 
-    def check_LEC_j(self, p_j, v, S_j, n_mc, queue):
+    def point_simplices(self):
+        """
+        The inverted index of the triangulation, i.e. the simplex elements that
+        contain each point. It is recomputed when the triangulation has changed.
+
+        Returns
+        -------
+        indptr : array, shape (n_s + 1,)
+            The elements containing point i are indices[indptr[i]:indptr[i + 1]].
+        indices : array, shape (n_e * (n_xi + 1),)
+            The element indices, in ascending order per point.
+
+        """
+        index = getattr(self, '_point_simplices', None)
+        if index is None or index[0] is not self.tri or index[1] != self.tri.npoints:
+            simplices = np.ravel(self.tri.simplices)
+            order = np.argsort(simplices, kind='stable')
+            indices = order // self.tri.simplices.shape[1]
+            indptr = np.append(0, np.cumsum(np.bincount(simplices, minlength=self.tri.npoints)))
+            self._point_simplices = index = (self.tri, self.tri.npoints, indptr, indices)
+        return index[2], index[3]
+
+    def check_LEC_j(self, p_j, v, S_j, n_mc, queue=None):
         """
         Check the LEC conditin of the j-th interpolation stencil.
 
@@ -563,15 +592,22 @@ class SSCSampler(BaseSamplingElement, sampler_name="ssc_sampler"):
         n_mc : int
             The number of Monte Carlo samples to use in checking the LEC
             conditions.
-        queue : multiprocessing queue object
-            Used to store the results.
+        queue : multiprocessing queue object, optional
+            If given, the results are also stored in the queue.
 
         Returns
         -------
-        None, results (polynomial order and element indices are stored
-                       in the queue)
+        dict
+            The new polynomial order 'p_j[j]' and element indices 'el_idx_j'
+            of the stencil.
 
         """
+        result = self._check_LEC_j(p_j, v, S_j, n_mc)
+        if queue is not None:
+            queue.put(result)
+        return result
+
+    def _check_LEC_j(self, p_j, v, S_j, n_mc):
         n_xi = self.n_xi
         # n_e = self.tri.nsimplex
         N = v[0, :].size
@@ -599,7 +635,7 @@ class SSCSampler(BaseSamplingElement, sampler_name="ssc_sampler"):
 
         # compute the coefficients c_jl
         # c_jl = np.linalg.solve(Psi, v_Sj)
-        c_jl = DAFSILAS(Psi, v_Sj)
+        c_jl = solve_stencils(Psi[np.newaxis], v_Sj[np.newaxis])[0]
 
         # check the LEC condition for all simplices in the STENCIL S_j
         k = 0
@@ -614,9 +650,7 @@ class SSCSampler(BaseSamplingElement, sampler_name="ssc_sampler"):
             v_max = np.max(v[self.tri.simplices[el_idx_j[k]]])
 
             # compute interpolation values at MC sample points
-            w_j_at_xi = np.zeros([n_mc, N])
-            for i in range(n_mc):
-                w_j_at_xi[i, :] = self.w_j(xi_samples[i], c_jl, p_j)
+            w_j_at_xi = (self.compute_Psi_batch(xi_samples, p_j) @ c_jl).reshape([n_mc, N])
 
             k += 1
 
@@ -638,7 +672,7 @@ class SSCSampler(BaseSamplingElement, sampler_name="ssc_sampler"):
                 k = 0
 
                 if p_j == 1:
-                    return queue.put({'p_j[j]': p_j, 'el_idx_j': el_idx_j})
+                    return {'p_j[j]': p_j, 'el_idx_j': el_idx_j}
 
                 # recompute sample matrix
                 Psi = self.compute_Psi(xi_Sj, p_j)
@@ -653,12 +687,12 @@ class SSCSampler(BaseSamplingElement, sampler_name="ssc_sampler"):
 
                 # compute the coefficients c_jl
                 # c_jl = np.linalg.solve(Psi, v_Sj)
-                c_jl = DAFSILAS(Psi, v_Sj, False)
+                c_jl = solve_stencils(Psi[np.newaxis], v_Sj[np.newaxis])[0]
 
             if k == el_idx_j.size:
                 LEC_checked = True
 
-        queue.put({'p_j[j]': p_j, 'el_idx_j': el_idx_j})
+        return {'p_j[j]': p_j, 'el_idx_j': el_idx_j}
 
     def compute_stencil_j(self):
         """
@@ -700,7 +734,8 @@ class SSCSampler(BaseSamplingElement, sampler_name="ssc_sampler"):
 
         return S_j.astype('int')
 
-    def compute_ENO_stencil(self, p_j, S_j, el_idx, max_jobs=4):
+    def compute_ENO_stencil(self, p_j, S_j, el_idx, max_jobs=4, chunk_size=None,
+                            executor=None):
         """
         Compute the Essentially Non-Oscillatory stencils. The idea behind ENO
         stencils is to have higher degree interpolation stencils up to a thin
@@ -725,8 +760,14 @@ class SSCSampler(BaseSamplingElement, sampler_name="ssc_sampler"):
             stencil. The number of elements is determined by the local
             polynomial order.
         max_jobs : int, optional
-            The number of ENO stencils that are computed in parallel.
-            The default is 4.
+            The number of worker processes used if no executor is given.
+            The default is 4. With max_jobs = 1 the stencils are computed
+            in this process.
+        chunk_size : int or None
+            The number of stencils computed per task, by default the elements
+            are divided into 4 tasks per worker.
+        executor : ProcessPoolExecutor or None
+            A pool of worker processes to (re)use.
 
         Returns
         -------
@@ -747,50 +788,31 @@ class SSCSampler(BaseSamplingElement, sampler_name="ssc_sampler"):
         # the center of each simplex
         xi_centers = self.compute_xi_center_j()
 
-        jobs = []
-        queues = []
-        running_jobs = 0
-        j = 0
-        n_jobs = n_e
-
         print('Computing ENO stencils...')
 
-        while n_jobs > 0:
-
-            # check how many processes are still alive
-            for p in jobs:
-                if p.is_alive() == False:
-                    jobs.remove(p)
-
-            # number of processes still running
-            running_jobs = len(jobs)
-
-            # compute the ENO stencils (in parallel)
-            while running_jobs < max_jobs and n_jobs > 0:
-                queue = mp.Queue()
-                prcs = mp.Process(target=self.compute_ENO_stencil_j,
-                                  args=(p_j, S_j, xi_centers, j, el_idx, queue))
-
-                # print check_LEC_j(tri, p_j, v, S_j, n_mc, j)
-                jobs.append(prcs)
-                queues.append(queue)
-                prcs.start()
-                n_jobs -= 1
-                running_jobs += 1
-                j += 1
+        # the element indices of all stencils, stored contiguously
+        el_idx_size = np.array([np.size(el_idx[j]) for j in range(n_e)])
+        arrays = {'points': self.tri.points, 'simplices': self.tri.simplices,
+                  'p_j': p_j, 'S_j': S_j, 'xi_centers': xi_centers,
+                  'el_idx': np.concatenate([np.ravel(el_idx[j]) for j in range(n_e)]).astype(int),
+                  'el_idx_offsets': np.append(0, np.cumsum(el_idx_size))}
+        args = [(chunk,) for chunk in self._chunks(n_e, max_jobs, chunk_size, executor)]
+        results = self._map_chunks(_ENO_stencil_chunk, arrays, args, max_jobs, executor)
 
         # retrieve results
-        for j in range(n_e):
-            tmp = queues[j].get()
-            ENO_S_j[j, :] = tmp['ENO_S_j']
-            p_j[j] = tmp['p_j_new']
-            el_idx[j] = tmp['el_idx[j]']
+        j = 0
+        for chunk_results in results:
+            for tmp in chunk_results:
+                ENO_S_j[j, :] = tmp['ENO_S_j']
+                p_j[j] = tmp['p_j_new']
+                el_idx[j] = tmp['el_idx[j]']
+                j += 1
 
         print('done.')
 
         return ENO_S_j, p_j, el_idx
 
-    def compute_ENO_stencil_j(self, p_j, S_j, xi_centers, j, el_idx, queue):
+    def compute_ENO_stencil_j(self, p_j, S_j, xi_centers, j, el_idx, queue=None):
         """
         Compute the ENO stencil of the j-th element.
 
@@ -811,16 +833,19 @@ class SSCSampler(BaseSamplingElement, sampler_name="ssc_sampler"):
             el_idx[2] gives the elements indices of the 3rd interpolation
             stencil. The number of elements is determined by the local
             polynomial order.
-        queue : multiprocessing queue object
-            Used to store the results.
+        queue : multiprocessing queue object, optional
+            If given, the results are also stored in the queue.
 
         Returns
         -------
-        None, results (polynomial order and element indices are stored
-                       in the queue)
+        dict
+            The ENO stencil 'ENO_S_j', polynomial order 'p_j_new' and element
+            indices 'el_idx[j]' of the j-th element.
 
         """
         n_e = self.tri.nsimplex
+        # el_idx[j] is replaced below, the caller's dict is left unchanged
+        el_idx = dict(el_idx)
 
         # set the stencil to the nearest neighbor stencil
         ENO_S_j = np.copy(S_j[j, :])
@@ -851,7 +876,10 @@ class SSCSampler(BaseSamplingElement, sampler_name="ssc_sampler"):
                         ENO_S_j = np.copy(S_j[i, :])
                         el_idx[j] = np.copy(el_idx[i])
 
-        queue.put({'ENO_S_j': ENO_S_j, 'p_j_new': p_j_new, 'el_idx[j]': np.copy(el_idx[j])})
+        result = {'ENO_S_j': ENO_S_j, 'p_j_new': p_j_new, 'el_idx[j]': np.copy(el_idx[j])}
+        if queue is not None:
+            queue.put(result)
+        return result
 
     def sample_simplex(self, n_mc, xi_k_jl, check=False):
         """
@@ -1034,32 +1062,68 @@ class SSCSampler(BaseSamplingElement, sampler_name="ssc_sampler"):
 
         Returns
         -------
-        None.
+        float
+            The surrogate prediction at xi.
 
         """
-        n_xi = self.n_xi
-        idx = int(self.tri.find_simplex(xi))
+        return self.surrogate_batch(np.reshape(xi, [1, self.n_xi]), S_j, p_j, v)[0]
 
-        # the number of points in S_j
-        Np1_j = int(factorial(n_xi + p_j[idx]) / (factorial(n_xi) * factorial(p_j[idx])))
-        # the vertices of the stencil S_j
-        xi_Sj = self.tri.points[S_j[idx, 0:Np1_j]]
-        # find the corresponding indices of v
-        v_Sj = v[S_j[idx, 0:Np1_j], :]
-        # compute sample matrix
-        Psi = self.compute_Psi(xi_Sj, p_j[idx])
+    def surrogate_batch(self, xi, S_j, p_j, v):
+        """
+        Evaluate the SSC surrogate at many points at once. The points are located
+        with a single find_simplex call and grouped per simplex element, such that
+        the interpolation coefficients of each element are computed once and its
+        polynomial is evaluated at all its points with one matrix product.
 
-    #    #check if Psi is well poised, at this point all stencils should be well-poised
-    #    det_Psi = np.linalg.det(Psi)
-    #    if det_Psi == 0:
-    #        print 'Error, det(Psi)=0 in compute_surplus_k() method, should not be possible'
+        Parameters
+        ----------
+        xi : array, shape (n_points, n_xi)
+            The locations in the input space at which to evaluate the surrogate.
+        S_j : array, shape (n_e, n_s)
+            The indices of all nearest neighbours points of each simplex j=1,..,n_e,
+            ordered from closest to the neighbour that furthest away. The first
+            n_xi + 1 indeces belong to the j-th simplex itself.
+        p_j : array, shape (n_e,)
+            The polynomial order of each simplex element.
+        v : array, shape (N + 1,)
+            The (scalar) code outputs. #TODO:modify when vectors are allowed
 
-        # compute the coefficients c_jl
-        # c_jl = np.linalg.solve(Psi, v_Sj)
-        c_jl = DAFSILAS(Psi, v_Sj, False)
+        Returns
+        -------
+        w_j : array, shape (n_points,)
+            The surrogate predictions at xi.
 
-        # compute the interpolation on the old grid
-        w_j = self.w_j(xi, c_jl, p_j[idx])
+        """
+        n_xi = self.n_xi
+        xi = np.asarray(xi, dtype=float).reshape([-1, n_xi])
+        idx = np.asarray(self.tri.find_simplex(xi), dtype=int)
+
+        # sort the points per element
+        order = np.argsort(idx, kind='stable')
+        elements, start = np.unique(idx[order], return_index=True)
+        stop = np.append(start[1:], idx.size)
+
+        # compute the coefficients c_jl of these elements, the stencils of the
+        # same polynomial order are solved together
+        c_jl = {}
+        for p in np.unique(p_j[elements]):
+            elements_p = elements[p_j[elements] == p]
+            # the number of points in S_j
+            Np1_j = int(factorial(n_xi + p) / (factorial(n_xi) * factorial(p)))
+            # the vertices of the stencils S_j
+            xi_Sj = self.tri.points[S_j[elements_p, 0:Np1_j]]
+            # find the corresponding indices of v
+            v_Sj = v[S_j[elements_p, 0:Np1_j], :]
+            # compute the sample matrices
+            Psi = self.compute_Psi_batch(xi_Sj.reshape([-1, n_xi]), p)
+            Psi = Psi.reshape([elements_p.size, Np1_j, Np1_j])
+            c_jl.update(zip(elements_p, solve_stencils(Psi, v_Sj)))
+
+        w_j = np.zeros(idx.size)
+        for el, first, last in zip(elements, start, stop):
+            # compute the interpolation at all points in this element
+            points = order[first:last]
+            w_j[points] = (self.compute_Psi_batch(xi[points], p_j[el]) @ c_jl[el]).reshape(-1)
 
         return w_j
 
@@ -1125,11 +1189,12 @@ class SSCSampler(BaseSamplingElement, sampler_name="ssc_sampler"):
 
         """
 
-        xi_k_jl = np.append(self.tri.points, new_points, 0)
         if self.n_xi > 1:
+            # the triangulation is recomputed, see the note in init_grid
+            xi_k_jl = np.append(self.tri.points, new_points, 0)
             self.tri = Delaunay(xi_k_jl)
         else:
-            self.tri = Tri1D(xi_k_jl)
+            self.tri.add_points(new_points)
 
         self._n_samples = self.tri.npoints
 
@@ -1190,8 +1255,11 @@ class SSCSampler(BaseSamplingElement, sampler_name="ssc_sampler"):
 
         """
         print("Saving sampler state to %s" % filename)
+        # the inverted index is recomputed when needed
+        state = dict(self.__dict__)
+        state.pop('_point_simplices', None)
         with open(filename, 'wb') as fp:
-            pickle.dump(self.__dict__, fp)
+            pickle.dump(state, fp)
 
     def load_state(self, filename):
         """
@@ -1212,123 +1280,94 @@ class SSCSampler(BaseSamplingElement, sampler_name="ssc_sampler"):
             self.__dict__ = pickle.load(fp)
 
 
-def DAFSILAS(A, b, print_message=False):
+class _SharedArrays:
+    """
+    NumPy arrays copied into shared memory, so that worker processes can use
+    them without each receiving a pickled copy.
+
+    Parameters
+    ----------
+    arrays : dict
+        The arrays to share.
+    """
+
+    def __init__(self, arrays):
+        self._shm = []
+        # name, shape and dtype of each array, used by the workers to attach to it
+        self.descriptors = {}
+        for key, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            np.ndarray(array.shape, array.dtype, buffer=shm.buf)[...] = array
+            self._shm.append(shm)
+            self.descriptors[key] = (shm.name, array.shape, array.dtype.str)
+
+    def close(self):
+        for shm in self._shm:
+            shm.close()
+            shm.unlink()
+        self._shm = []
+
+
+# the sampler and shared arrays of the tasks last run in this worker process
+_worker_state = {'descriptors': None, 'shm': [], 'sampler': None, 'arrays': None}
+
+
+def _run_chunk(fn, state, args):
+    """
+    Run a task in a worker process. The shared arrays are attached to once and
+    reused by the following tasks that use the same arrays.
+    """
+    descriptors, n_xi, i_norm_le_pj = state
+    if _worker_state['descriptors'] != descriptors:
+        for shm in _worker_state['shm']:
+            shm.close()
+        shms = {key: shared_memory.SharedMemory(name=name)
+                for key, (name, _, _) in descriptors.items()}
+        arrays = {key: np.ndarray(shape, dtype, buffer=shms[key].buf)
+                  for key, (_, shape, dtype) in descriptors.items()}
+        # a sampler with just what the per element checks need
+        sampler = SSCSampler.__new__(SSCSampler)
+        sampler.n_xi = n_xi
+        sampler.i_norm_le_pj = i_norm_le_pj
+        sampler.tri = _Triangulation(arrays['points'], arrays['simplices'])
+        _worker_state.update(descriptors=descriptors, shm=list(shms.values()),
+                             sampler=sampler, arrays=arrays)
+    return fn(_worker_state['sampler'], _worker_state['arrays'], *args)
+
+
+def _check_LEC_chunk(sampler, arrays, chunk, p_j, n_mc, random_state):
     """
-    Direct Algorithm For Solving Ill-conditioned Linear Algebraic Systems,
+    Check the LEC condition of a chunk of stencils, see SSCSampler.check_LEC.
+    """
+    results = []
+    for j, p_j_j in zip(chunk, p_j):
+        np.random.set_state(random_state)
+        results.append(sampler.check_LEC_j(p_j_j, arrays['v'], arrays['S_j'][j, :], n_mc))
+    return results
+
 
-    solves the linear system when Ax = b when A is ill conditioned.
+def _ENO_stencil_chunk(sampler, arrays, chunk):
+    """
+    Compute the ENO stencils of a chunk of elements, see SSCSampler.compute_ENO_stencil.
+    """
+    offsets = arrays['el_idx_offsets']
+    el_idx = {i: arrays['el_idx'][offsets[i]:offsets[i + 1]] for i in range(offsets.size - 1)}
+    return [sampler.compute_ENO_stencil_j(arrays['p_j'], arrays['S_j'], arrays['xi_centers'],
+                                          j, el_idx) for j in chunk]
 
-    Solves for x in the non-null subspace of the solution as described in
-    the reference below. This method utilizes Gauss–Jordan elimination with
-    complete pivoting to identify the null subspace of a (almost) singular
-    matrix.
 
-    X. J. Xue, Kozaczek, K. J., Kurtzl, S. K., & Kurtz, D. S. (2000). A direct
-    algorithm for solving ill-conditioned linear algebraic systems.
-    Adv. X-Ray Anal, 42.
+class _Triangulation:
+    """
+    The points and simplices of a triangulation, which is all that the LEC and
+    ENO checks of single elements use.
     """
 
-    # The matrix A' as defined in Xue
-    b = b.reshape(b.size)
-    Ap = np.zeros([A.shape[0], 2 * A.shape[0] + 1])
-    Ap[:, 0:A.shape[0]] = np.copy(A)
-    Ap[:, A.shape[0]] = np.copy(b)
-    Ap[:, A.shape[0] + 1:] = np.eye(A.shape[0])
-    n, m = Ap.shape
-
-    # permutation matrix
-    P = np.eye(n)
-
-    # the ill-condition control parameter
-    # epsilon = np.finfo(np.float64).eps
-    epsilon = 10**-14
-
-    for i in range(n - 1):
-        # calc sub matrix Ai
-        Ai = np.copy(Ap[i:n, i:n])
-
-        # find the complete pivot in sub matrix Ai
-        api = np.max(np.abs(Ai))
-
-        if api == 0:
-            break
-
-        # find the location of the complete pivot in Ai
-        row, col = np.unravel_index(np.abs(Ai).argmax(), Ai.shape)
-
-        # interchange rows and columns to exchange position of api and aii
-        tmp = np.copy(Ap[i, :])
-        Ap[i, :] = np.copy(Ap[i + row, :])
-        Ap[i + row, :] = tmp
-
-        tmp = np.copy(Ap[:, i])
-        Ap[:, i] = np.copy(Ap[:, i + col])
-        Ap[:, i + col] = tmp
-
-        # Also interchange the entries in b
-        # tmp = A[i, n]
-        # A[i, n] = A[i+col, n]Ap[i+1+j, i:m]
-        # A[i+col, n] = tmp
-
-        # keep track of column switches via a series of permuation matrices P =
-        # P1*P2*...*Pi*...*Pn ==> at each iteration x = P*xi
-        Pi = np.eye(n)
-        tmp = np.copy(Pi[i, :])
-        Pi[i, :] = np.copy(Pi[i + col, :])
-        Pi[i + col, :] = tmp
-        P = np.dot(P, Pi)
-
-        # Calculate multipliers
-        if Ai[row, col] < 0:
-            api = api * -1.  # sign is important in multipliers
-
-        M = Ap[i + 1:n, i] / np.double(api)
-
-        # start row reduction
-        for j in range(M.size):
-            Ap[i + 1 + j, i:m] = Ap[i + 1 + j, i:m] - M[j] * Ap[i, i:m]
-
-    # the largest complete pivot
-    eta = np.max(np.abs(np.diag(Ap))) * 1.0
-    # test if |aii/nc| <= epsilon
-    idx = (np.abs(np.diag(Ap) / eta) <= epsilon).nonzero()[0]
-
-    # Perform zeroing operation if necessary
-    if idx.size > 0:
-        nullity = idx.size
-        Arange = Ap[0:n - nullity, 0:n - nullity]
-        if print_message:
-            print('Matrix is ill-conditioned, performing zeroing operation')
-            print('nullity = ' + str(nullity) + ', rank = ' + str(n - nullity) +
-                  ', cond(A) = ' + str(np.linalg.cond(A)) +
-                  ', cond(Arange) = ' + str(np.linalg.cond(Arange)))
-
-        # ajj = 1, aij = 0 for j = i...n
-        Ap[idx[0]:n, idx[0]:n] = np.eye(nullity)
-        # bj = 0
-        Ap[idx[0]:n, n] = 0
-        # ejj = 1, eij = 0
-        Ap[idx[0]:n, idx[0] + n + 1:m] = np.eye(nullity)
-
-    # Back substitution
-    for i in range(n, 0, -1):
-        Ai = Ap[0:i, :]
-
-        # Calculate multipliers
-        M = Ai[0:i - 1, i - 1] / np.double(Ai[i - 1, i - 1])
-
-        # start back substitution
-        for j in range(M.size):
-            Ai[j, :] = Ai[j, :] - M[j] * Ai[i - 1, :]
-
-        # store result in A
-        Ap[0:i, :] = Ai
-
-    # turn A into eye(n)
-    D = (1. / np.diag(Ap)).reshape([n, 1])
-    Ap = np.multiply(D, Ap)
-    # Calculated solution
-    return np.dot(P, Ap[:, n]).reshape([n, 1])
+    def __init__(self, points, simplices):
+        self.points = points
+        self.simplices = simplices
+        self.npoints = points.shape[0]
+        self.nsimplex = simplices.shape[0]
 
 
 class Tri1D:
@@ -1340,7 +1379,7 @@ class Tri1D:
         * nsimplex
         * simplices
         * neighbours
-        * the find_simplex subroutine
+        * the find_simplex and add_points subroutines
     """
 
     def __init__(self, points):
@@ -1360,23 +1399,43 @@ class Tri1D:
         """
         self.ndim = 1
         self.points = points
-        self.npoints = points.size
-        self.nsimplex = points.size - 1
-
-        points_sorted = np.sort(self.points.reshape(self.npoints))
-        self.simplices = np.zeros([self.nsimplex, 2])
-        for i in range(self.nsimplex):
-            self.simplices[i, 0] = (self.points == points_sorted[i]).nonzero()[0]
-            self.simplices[i, 1] = (self.points == points_sorted[i + 1]).nonzero()[0]
-        self.simplices = self.simplices.astype('int')
-
-        self.neighbors = np.zeros([self.nsimplex, 2])
-        for i in range(self.nsimplex):
-            self.neighbors[i, 0] = i - 1
-            self.neighbors[i, 1] = i + 1
+        self._triangulate()
+
+    def _triangulate(self):
+        """
+        Compute the simplices (the intervals between consecutive nodes) and
+        their neighbours.
+        """
+        self.npoints = self.points.size
+        self.nsimplex = self.npoints - 1
+
+        order = np.argsort(self.points.reshape(self.npoints), kind='stable')
+        self.points_sorted = self.points.reshape(self.npoints)[order]
+        self.simplices = np.column_stack([order[:-1], order[1:]]).astype('int')
+
+        self.neighbors = np.column_stack([np.arange(-1, self.nsimplex - 1),
+                                          np.arange(1, self.nsimplex + 1)])
         self.neighbors[-1, 1] = -1
         self.neighbors = self.neighbors.astype('int')
 
+    def add_points(self, points):
+        """
+        Add new nodes to the triangulation. The simplices are numbered from
+        left to right, as if the triangulation was created with all nodes.
+
+        Parameters
+        ----------
+        points : array, shape (P, 1)
+            The new nodes.
+
+        Returns
+        -------
+        None.
+
+        """
+        self.points = np.append(self.points, np.reshape(points, [-1, 1]), 0)
+        self._triangulate()
+
     def find_simplex(self, xi):
         """
         Find the simplex indices of nodes xi
@@ -1392,15 +1451,15 @@ class Tri1D:
             An array containing the simplex indices of points xi.
 
         """
-        Idx = np.zeros(xi.shape[0])
-        points_sorted = np.sort(self.points.reshape(self.npoints))
+        points_sorted = getattr(self, 'points_sorted', None)
+        if points_sorted is None:
+            # a triangulation stored before the sorted nodes were kept
+            points_sorted = np.sort(self.points.reshape(self.npoints))
 
-        for i in range(xi.shape[0]):
-            idx = (points_sorted < xi[i]).argmin() - 1
-            # if xi = 0 idx will be -1
-            if idx == -1:
-                Idx[i] = 0
-            else:
-                Idx[i] = idx
+        # the first node >= xi is the right node of the simplex containing xi
+        idx = np.searchsorted(points_sorted, np.reshape(xi, [-1]), side='left') - 1
+        # points at the left end (idx = -1) and, as before, points to the right of
+        # all nodes are assigned to the first simplex
+        idx[(idx < 0) | (idx >= self.nsimplex)] = 0
 
-        return Idx.astype('int')
+        return idx
@@ -0,0 +1,193 @@
+"""Solvers for the interpolation systems of the simplex stochastic collocation
+stencils. These are small, possibly (nearly) singular, Vandermonde systems.
+`solve_stencils` solves many systems of equal size with one stacked LAPACK
+call and uses the DAFSILAS elimination only for the nearly singular ones, so
+that their null-space treatment is unchanged.
+"""
+import numpy as np
+
+__author__ = "Wouter Edeling"
+__copyright__ = """
+
+    Copyright 2018 Robin A. Richardson, David W. Wright
+
+    This file is part of EasyVVUQ
+
+    EasyVVUQ is free software: you can redistribute it and/or modify
+    it under the terms of the Lesser GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    EasyVVUQ is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    Lesser GNU General Public License for more details.
+
+    You should have received a copy of the Lesser GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+__license__ = "LGPL"
+
+
+def solve_stencils(A, b, cond_max=1e8):
+    """
+    Solve a stack of square linear systems A[k] x[k] = b[k].
+
+    The well-conditioned systems are solved together using LAPACK
+    (numpy.linalg.solve). The systems with a condition number above cond_max
+    are solved one by one with DAFSILAS, which solves for x in the non-null
+    subspace of (almost) singular matrices. The bound is well below the
+    condition numbers at which DAFSILAS detects a null space (about 1e14),
+    so both give the same solution up to round-off.
+
+    Parameters
+    ----------
+    A : array, shape (K, n, n)
+        The matrices, e.g. the Vandermonde matrices Psi of K stencils.
+    b : array, shape (K, n) or (K, n, 1)
+        The right-hand sides.
+    cond_max : float, optional
+        The largest condition number (in the 2-norm) of the systems solved
+        with LAPACK. The default is 1e8.
+
+    Returns
+    -------
+    x : array, shape (K, n, 1)
+        The solutions.
+
+    """
+    A = np.asarray(A, dtype=float)
+    K, n = A.shape[0], A.shape[1]
+    b = np.asarray(b, dtype=float).reshape([K, n, 1])
+    x = np.zeros([K, n, 1])
+    if K == 0:
+        return x
+
+    # the largest and smallest singular values of each matrix
+    sigma = np.linalg.svd(A, compute_uv=False)
+    well_posed = sigma[:, -1] * cond_max > sigma[:, 0]
+    if well_posed.any():
+        x[well_posed] = np.linalg.solve(A[well_posed], b[well_posed])
+    for k in np.flatnonzero(~well_posed):
+        x[k] = DAFSILAS(A[k], b[k])
+    return x
+
+
+def DAFSILAS(A, b, print_message=False):
+    """
+    Direct Algorithm For Solving Ill-conditioned Linear Algebraic Systems,
+
+    solves the linear system when Ax = b when A is ill conditioned.
+
+    Solves for x in the non-null subspace of the solution as described in
+    the reference below. This method utilizes Gauss–Jordan elimination with
+    complete pivoting to identify the null subspace of a (almost) singular
+    matrix.
+
+    X. J. Xue, Kozaczek, K. J., Kurtzl, S. K., & Kurtz, D. S. (2000). A direct
+    algorithm for solving ill-conditioned linear algebraic systems.
+    Adv. X-Ray Anal, 42.
+    """
+
+    # The matrix A' as defined in Xue
+    b = b.reshape(b.size)
+    Ap = np.zeros([A.shape[0], 2 * A.shape[0] + 1])
+    Ap[:, 0:A.shape[0]] = np.copy(A)
+    Ap[:, A.shape[0]] = np.copy(b)
+    Ap[:, A.shape[0] + 1:] = np.eye(A.shape[0])
+    n, m = Ap.shape
+
+    # permutation matrix
+    P = np.eye(n)
+
+    # the ill-condition control parameter
+    # epsilon = np.finfo(np.float64).eps
+    epsilon = 10**-14
+
+    for i in range(n - 1):
+        # calc sub matrix Ai
+        Ai = np.copy(Ap[i:n, i:n])
+
+        # find the complete pivot in sub matrix Ai
+        api = np.max(np.abs(Ai))
+
+        if api == 0:
+            break
+
+        # find the location of the complete pivot in Ai
+        row, col = np.unravel_index(np.abs(Ai).argmax(), Ai.shape)
+
+        # interchange rows and columns to exchange position of api and aii
+        tmp = np.copy(Ap[i, :])
+        Ap[i, :] = np.copy(Ap[i + row, :])
+        Ap[i + row, :] = tmp
+
+        tmp = np.copy(Ap[:, i])
+        Ap[:, i] = np.copy(Ap[:, i + col])
+        Ap[:, i + col] = tmp
+
+        # Also interchange the entries in b
+        # tmp = A[i, n]
+        # A[i, n] = A[i+col, n]Ap[i+1+j, i:m]
+        # A[i+col, n] = tmp
+
+        # keep track of column switches via a series of permuation matrices P =
+        # P1*P2*...*Pi*...*Pn ==> at each iteration x = P*xi
+        Pi = np.eye(n)
+        tmp = np.copy(Pi[i, :])
+        Pi[i, :] = np.copy(Pi[i + col, :])
+        Pi[i + col, :] = tmp
+        P = np.dot(P, Pi)
+
+        # Calculate multipliers
+        if Ai[row, col] < 0:
+            api = api * -1.  # sign is important in multipliers
+
+        M = Ap[i + 1:n, i] / np.double(api)
+
+        # start row reduction
+        for j in range(M.size):
+            Ap[i + 1 + j, i:m] = Ap[i + 1 + j, i:m] - M[j] * Ap[i, i:m]
+
+    # the largest complete pivot
+    eta = np.max(np.abs(np.diag(Ap))) * 1.0
+    # test if |aii/nc| <= epsilon
+    idx = (np.abs(np.diag(Ap) / eta) <= epsilon).nonzero()[0]
+
+    # Perform zeroing operation if necessary
+    if idx.size > 0:
+        nullity = idx.size
+        Arange = Ap[0:n - nullity, 0:n - nullity]
+        if print_message:
+            print('Matrix is ill-conditioned, performing zeroing operation')
+            print('nullity = ' + str(nullity) + ', rank = ' + str(n - nullity) +
+                  ', cond(A) = ' + str(np.linalg.cond(A)) +
+                  ', cond(Arange) = ' + str(np.linalg.cond(Arange)))
+
+        # ajj = 1, aij = 0 for j = i...n
+        Ap[idx[0]:n, idx[0]:n] = np.eye(nullity)
+        # bj = 0
+        Ap[idx[0]:n, n] = 0
+        # ejj = 1, eij = 0
+        Ap[idx[0]:n, idx[0] + n + 1:m] = np.eye(nullity)
+
+    # Back substitution
+    for i in range(n, 0, -1):
+        Ai = Ap[0:i, :]
+
+        # Calculate multipliers
+        M = Ai[0:i - 1, i - 1] / np.double(Ai[i - 1, i - 1])
+
+        # start back substitution
+        for j in range(M.size):
+            Ai[j, :] = Ai[j, :] - M[j] * Ai[i - 1, :]
+
+        # store result in A
+        Ap[0:i, :] = Ai
+
+    # turn A into eye(n)
+    D = (1. / np.diag(Ap)).reshape([n, 1])
+    Ap = np.multiply(D, Ap)
+    # Calculated solution
+    return np.dot(P, Ap[:, n]).reshape([n, 1])
@@ -2,7 +2,7 @@ from .base import BaseSamplingElement, Vary
 import chaospy as cp
 import numpy as np
 import pickle
-from itertools import product, chain
+from itertools import product
 import logging
 
 __author__ = "Wouter Edeling"
@@ -127,15 +127,15 @@ class SCSampler(BaseSamplingElement, sampler_name="sc_sampler"):
 
             # generate collocation as a standard tensor product
             l_norm = np.array([self.polynomial_order])
-            self.xi_d = self.generate_grid(l_norm)
+            self.grid_idx = self.generate_grid_idx(l_norm)
 
         else:
             self.l_norm = self.compute_sparse_multi_idx(self.L, self.N)
             # create sparse grid of dimension N and level q using the 1d
             # rules in self.xi_1d
-            self.xi_d = self.generate_grid(self.l_norm)
+            self.grid_idx = self.generate_grid_idx(self.l_norm)
 
-        self._n_samples = self.xi_d.shape[0]
+        self._n_samples = self.grid_idx.shape[0]
 
         self.count = 0
 
@@ -208,6 +208,9 @@ class SCSampler(BaseSamplingElement, sampler_name="sc_sampler"):
                 self.xi_1d[n][self.polynomial_order[n]] = xi_i[0]
                 self.wi_1d[n][self.polynomial_order[n]] = wi_i
 
+        # integer ids of the 1D points, used to represent the N-dimensional grid
+        self._index_1D_points()
+
     def check_max_quad_level(self):
         """
 
@@ -298,39 +301,20 @@ class SCSampler(BaseSamplingElement, sampler_name="sc_sampler"):
 
         """
 
-        # compute all forward neighbors for every l in current_multi_idx
-        forward_neighbor = []
-        e_n = np.eye(self.N, dtype=int)
-        for l in current_multi_idx:
-            for n in range(self.N):
-                # the forward neighbor is l plus a unit vector
-                forward_neighbor.append(l + e_n[n])
-
-        # remove duplicates
-        forward_neighbor = np.unique(np.array(forward_neighbor), axis=0)
-        # remove those which are already in the grid
-        forward_neighbor = setdiff2d(forward_neighbor, current_multi_idx)
-        # make sure the final candidates are admissible (all backward neighbors
-        # must be in the current multi indices)
+        # the set of current multi indices is updated incrementally if the
+        # previous indices are still included, which is the usual case
+        multi_idx_set = getattr(self, 'multi_idx_set', None)
+        if multi_idx_set is None or not multi_idx_set.issubset(current_multi_idx):
+            multi_idx_set = MultiIndexSet(self.N)
         logging.debug('Computing admissible levels...')
-        admissible_idx = []
-        for l in forward_neighbor:
-            admissible = True
-            for n in range(self.N):
-                backward_neighbor = l - e_n[n]
-                # find backward_neighbor in current_multi_idx
-                idx = np.where((backward_neighbor == current_multi_idx).all(axis=1))[0]
-                # if backward neighbor is not in the current index set
-                # and it is 'on the interior' (contains no 0): not admissible
-                if idx.size == 0 and backward_neighbor[n] != 0:
-                    admissible = False
-                    break
-            # if all backward neighbors are in the current index set: l is admissible
-            if admissible:
-                admissible_idx.append(l)
+        multi_idx_set.add_all(current_multi_idx)
+        self.multi_idx_set = multi_idx_set
+        # the admissible forward neighbors: all backward neighbors must be in the
+        # current multi indices
+        admissible_idx = list(multi_idx_set.admissible)
         logging.debug('done')
 
-        self.admissible_idx = np.array(admissible_idx)
+        self.admissible_idx = np.array(admissible_idx, dtype=int).reshape([-1, self.N])
         # make sure that all entries of each index are <= the max quadrature order
         # The max quad order can be low for discrete input variables
         idx = np.where((self.admissible_idx <= self.max_level).all(axis=1))[0]
@@ -343,12 +327,14 @@ class SCSampler(BaseSamplingElement, sampler_name="sc_sampler"):
         # recompute the 1D weights and collocation points
         self.compute_1D_points_weights(self.L, self.N)
         # compute collocation grid based on the admissible level indices
-        admissible_grid = self.generate_grid(self.admissible_idx)
+        admissible_grid = self.generate_grid_idx(self.admissible_idx)
         # remove collocation points which have already been computed
-        if not hasattr(self, 'xi_d'):
-            self.xi_d = self.generate_grid(self.admissible_idx)
-            self._n_samples = self.xi_d.shape[0]
-        new_points = setdiff2d(admissible_grid, self.xi_d)
+        if not hasattr(self, 'grid_idx'):
+            self.grid_idx = self.generate_grid_idx(self.admissible_idx)
+            self._n_samples = self.grid_idx.shape[0]
+        current_points = set(map(tuple, self.grid_idx.tolist()))
+        new_points = admissible_grid[[point not in current_points
+                                      for point in map(tuple, admissible_grid.tolist())]]
 
         logging.debug('%d new points added' % new_points.shape[0])
 
@@ -362,7 +348,7 @@ class SCSampler(BaseSamplingElement, sampler_name="sc_sampler"):
 
         # update the N-dimensional sparse grid if unsampled points are added
         if new_points.shape[0] > 0:
-            self.xi_d = np.concatenate((self.xi_d, new_points))
+            self.grid_idx = np.concatenate((self.grid_idx, new_points))
 
         # count the number of times the dimensions were adapted
         self.nadaptations += 1
@@ -405,18 +391,66 @@ class SCSampler(BaseSamplingElement, sampler_name="sc_sampler"):
         else:
             raise StopIteration
 
+    def next_block(self, n):
+        start, stop = self._block_bounds(n, self._n_samples)
+        return self._to_block(self.xi_d[start:stop], self.params_distribution)
+
     def save_state(self, filename):
         logging.debug("Saving sampler state to %s" % filename)
         file = open(filename, 'wb')
-        pickle.dump(self.__dict__, file)
+        pickle.dump(self.__getstate__(), file)
         file.close()
 
     def load_state(self, filename):
         logging.debug("Loading sampler state from %s" % filename)
         file = open(filename, 'rb')
-        self.__dict__ = pickle.load(file)
+        self.__dict__ = {}
+        self.__setstate__(pickle.load(file))
         file.close()
 
+    def __getstate__(self):
+        # the collocation points are stored as integer grid coordinates only
+        state = self.__dict__.copy()
+        state['_xi_d'] = None
+        return state
+
+    def __setstate__(self, state):
+        xi_d = state.pop('xi_d', None)
+        self.__dict__.update(state)
+        if xi_d is not None:
+            # stored by a version that kept the collocation points only
+            self._index_1D_points()
+            self.xi_d = xi_d
+
+    @property
+    def grid_idx(self):
+        """
+        The N-dimensional collocation points as integer coordinates, i.e.
+        for every dimension n the index of the point in self.nodes_1d[n].
+        The ids of the 1d points do not change when levels are added,
+        which makes a row a canonical id of a collocation point.
+        """
+        return self._grid_idx
+
+    @grid_idx.setter
+    def grid_idx(self, grid_idx):
+        self._grid_idx = grid_idx
+        self._xi_d = None
+
+    @property
+    def xi_d(self):
+        """
+        The N-dimensional collocation points, shape (number of points, N).
+        Computed from self.grid_idx when first needed.
+        """
+        if self._xi_d is None:
+            self._xi_d = self.grid_to_points(self._grid_idx)
+        return self._xi_d
+
+    @xi_d.setter
+    def xi_d(self, xi_d):
+        self.grid_idx = self.points_to_grid_idx(xi_d)
+
     """
     =========================
     (SPARSE) GRID SUBROUTINES
@@ -424,18 +458,96 @@ class SCSampler(BaseSamplingElement, sampler_name="sc_sampler"):
     """
 
     def generate_grid(self, l_norm):
+        """
+        Computes the collocation points of a (sparse) grid.
+
+        Parameters
+        ----------
+        l_norm : array of the level multi indices of the grid
+
+        Returns
+        -------
+        The unique collocation points, sorted lexicographically.
+        """
+        return self.grid_to_points(self.generate_grid_idx(l_norm))
+
+    def generate_grid_idx(self, l_norm):
+        """
+        Computes the collocation points of a (sparse) grid, as integer
+        coordinates (see self.grid_idx).
 
+        Parameters
+        ----------
+        l_norm : array of the level multi indices of the grid
+
+        Returns
+        -------
+        The unique collocation points, sorted lexicographically by their
+        physical coordinates.
+        """
         dimensions = range(self.N)
+        # rank of each 1d point, the grid is made unique in terms of ranks
+        # such that it is sorted like the physical coordinates
+        order = [np.argsort(self.nodes_1d[n], kind='stable') for n in dimensions]
+        rank = [np.argsort(order[n]) for n in dimensions]
         H_L_N = []
         # loop over all multi indices i
         for l in l_norm:
             # compute the tensor product of nodes indexed by i
-            X_l = [self.xi_1d[n][l[n]] for n in dimensions]
-            H_L_N.append(list(product(*X_l)))
-        # flatten the list of lists
-        H_L_N = np.array(list(chain(*H_L_N)))
-        # return unique nodes
-        return np.unique(H_L_N, axis=0)
+            X_l = [rank[n][self.node_ids_1d[n][l[n]]] for n in dimensions]
+            H_L_N.append(np.stack(np.meshgrid(*X_l, indexing='ij'), axis=-1).reshape([-1, self.N]))
+        H_L_N = np.unique(np.concatenate(H_L_N), axis=0)
+        return np.column_stack([order[n][H_L_N[:, n]] for n in dimensions]).astype(np.int32)
+
+    def grid_to_points(self, grid_idx):
+        """
+        Converts integer grid coordinates to collocation points.
+
+        Parameters
+        ----------
+        grid_idx : array of integer coordinates, shape (number of points, N)
+
+        Returns
+        -------
+        The collocation points, shape (number of points, N).
+        """
+        grid_idx = np.asarray(grid_idx).reshape([-1, self.N])
+        return np.column_stack([self.nodes_1d[n][grid_idx[:, n]] for n in range(self.N)])
+
+    def points_to_grid_idx(self, xi_d):
+        """
+        Converts collocation points to integer grid coordinates.
+
+        Parameters
+        ----------
+        xi_d : array of collocation points, shape (number of points, N)
+
+        Returns
+        -------
+        The integer coordinates, shape (number of points, N).
+        """
+        xi_d = np.asarray(xi_d).reshape([-1, self.N])
+        node_ids = [dict(zip(self.nodes_1d[n].tolist(), range(self.nodes_1d[n].size)))
+                    for n in range(self.N)]
+        return np.array([[node_ids[n][x_n] for n, x_n in enumerate(x)] for x in xi_d.tolist()],
+                        dtype=np.int32).reshape([-1, self.N])
+
+    def _index_1D_points(self):
+        """
+        Assigns an id to every distinct 1D collocation point, per dimension,
+        in order of the level in which the point first appears. The ids of
+        the 1D points of each level are stored in self.node_ids_1d, the
+        points themselves in self.nodes_1d.
+        """
+        self.nodes_1d = []
+        self.node_ids_1d = [{} for n in range(self.N)]
+        for n in range(self.N):
+            ids = {}
+            for level in sorted(self.xi_1d[n]):
+                self.node_ids_1d[n][level] = np.array(
+                    [ids.setdefault(x, len(ids)) for x in np.ravel(self.xi_1d[n][level]).tolist()],
+                    dtype=int)
+            self.nodes_1d.append(np.array(list(ids), dtype=float))
 
     # L : (int) max polynomial order
     # N : (int) the number of uncertain parameters
@@ -463,6 +575,140 @@ class SCSampler(BaseSamplingElement, sampler_name="sc_sampler"):
         return multi_idx
 
 
+class MultiIndexSet:
+    """
+    Set of level multi indices l = (l1,...,lN), li >= 1, of a sparse grid.
+    Keeps the combination coefficients of the indices and the admissible
+    forward neighbours of the set up to date when an index is added,
+    using hash lookups of the neighbouring indices instead of comparisons
+    with all indices of the set.
+
+    Source: Gerstner, Griebel, "Numerical integration using sparse grids"
+
+    Parameters
+    ----------
+    N : int
+        The number of dimensions.
+    indices : array or None
+        The initial multi indices, shape (number of indices, N).
+    """
+
+    def __init__(self, N, indices=None):
+        self.N = N
+        # the indices in the order in which they were added
+        self.indices = []
+        self._members = set()
+        # combination coefficients, see comb_coef_with
+        self.comb_coef = {}
+        # forward neighbours of which all backward neighbours are in the set,
+        # in the order in which they became admissible (dict used as ordered set)
+        self.admissible = {}
+        # whether all backward neighbours of every index are in the set
+        self.downward_closed = True
+        if indices is not None:
+            self.add_all(indices)
+
+    def __contains__(self, l):
+        return tuple(l) in self._members
+
+    def __len__(self):
+        return len(self.indices)
+
+    def to_array(self):
+        """The indices of the set, shape (number of indices, N)."""
+        return np.array(self.indices, dtype=int).reshape([-1, self.N])
+
+    def issubset(self, indices):
+        """Check whether all indices of the set are in indices."""
+        return self._members.issubset(map(tuple, np.asarray(indices).tolist()))
+
+    def add_all(self, indices):
+        """
+        Add several indices. They are added in order of increasing |l|, which
+        keeps the combination coefficients correct for any set of indices.
+
+        Parameters
+        ----------
+        indices : array
+            Multi indices of shape (number of indices, N).
+        """
+        new = [l for l in map(tuple, np.asarray(indices, dtype=int).reshape([-1, self.N]).tolist())
+               if l not in self._members]
+        new = sorted(dict.fromkeys(new), key=sum)
+        if new and not self.downward_closed:
+            # indices below one already in the set can only be added from scratch
+            new = sorted(self.indices + new, key=sum)
+            self.__init__(self.N)
+        for l in new:
+            self.add(l)
+
+    def add(self, l):
+        """
+        Add an index. The set must not contain indices larger than l, which
+        holds if the set is downward closed, e.g. when l is admissible.
+
+        Parameters
+        ----------
+        l : array or tuple
+            The multi index.
+        """
+        l = tuple(int(l_n) for l_n in l)
+        if l in self._members:
+            return
+        for k, sign in self._lower_neighbours(l):
+            self.comb_coef[k] += sign
+        self.comb_coef[l] = 1
+        self._members.add(l)
+        self.indices.append(l)
+        self.downward_closed = self.downward_closed and self._is_admissible(l)
+        # update the admissible forward neighbours
+        self.admissible.pop(l, None)
+        for n in range(self.N):
+            forward = l[:n] + (l[n] + 1,) + l[n + 1:]
+            if forward not in self._members and self._is_admissible(forward):
+                self.admissible[forward] = None
+
+    def comb_coef_with(self, l):
+        """
+        The combination coefficients of the set with l added, without
+        modifying the set. The coefficient of an index k is the sum of
+        (-1)**|z| over all z in {0, 1}^N for which k + z is in the set.
+
+        Parameters
+        ----------
+        l : array or tuple
+            The multi index, not in the set.
+
+        Returns
+        -------
+        dict
+            Combination coefficient per multi index.
+        """
+        l = tuple(int(l_n) for l_n in l)
+        comb_coef = dict(self.comb_coef)
+        for k, sign in self._lower_neighbours(l):
+            comb_coef[k] += sign
+        comb_coef[l] = 1
+        return comb_coef
+
+    def _lower_neighbours(self, l):
+        """The indices k = l - z, z in {0, 1}^N, z != 0 in the set, and (-1)**|z|."""
+        dims = [n for n in range(self.N) if l[n] > 1]
+        for z in product((0, 1), repeat=len(dims)):
+            if any(z):
+                k = list(l)
+                for n, z_n in zip(dims, z):
+                    k[n] -= z_n
+                k = tuple(k)
+                if k in self._members:
+                    yield k, (-1) ** sum(z)
+
+    def _is_admissible(self, l):
+        """Whether all backward neighbours of l (not containing 0) are in the set."""
+        return all(l[:n] + (l[n] - 1,) + l[n + 1:] in self._members
+                   for n in range(self.N) if l[n] > 1)
+
+
 def setdiff2d(X, Y):
     """
     Computes the difference of two 2D arrays X and Y
@@ -2,7 +2,11 @@ import easyvvuq as uq
 import chaospy as cp
 import numpy as np
 import json
+import tempfile
+import pandas as pd
 from timeit import Timer
+from easyvvuq.constants import Status
+from easyvvuq.db.sql import AppTable, RunTable
 
 
 def benchmark(nsamples):
@@ -48,9 +52,80 @@ def benchmark(nsamples):
     return benchmark_results
 
 
+def rowwise_collation(campaign_db, app_name, sampler_id, status=Status.COLLATED):
+    """Reference implementation of the collation that walks the run table row by
+    row through the ORM. Used as a baseline for `CampaignDB.get_results`.
+    """
+    app_id = campaign_db.session.query(AppTable).filter(AppTable.name == app_name).all()[0].id
+    pd_result = {}
+    query = campaign_db.session.query(RunTable).\
+        filter(RunTable.app == app_id).\
+        filter(RunTable.sampler == sampler_id).\
+        filter(RunTable.status == status)
+    for row in query:
+        params = {'run_id': row.id}
+        params['iteration'] = row.iteration
+        params = {**params, **json.loads(row.params)}
+        result = json.loads(row.result)
+        pd_dict = {**params, **result}
+        for key in pd_dict.keys():
+            if not isinstance(pd_dict[key], list):
+                pd_result.setdefault((key, 0), []).append(pd_dict[key])
+            else:
+                for i, elt in enumerate(pd_dict[key]):
+                    pd_result.setdefault((key, i), []).append(elt)
+    return pd.DataFrame(pd_result)
+
+
+def benchmark_collation(nsamples, qoi_size=100):
+    """Compare the row-wise collation with `CampaignDB.get_results` on a campaign
+    with `nsamples` collated runs, each with a vector quantity of interest of
+    length `qoi_size`.
+    """
+    params = {
+        "beta": {"type": "float", "default": 0.2},
+        "gamma": {"type": "float", "default": 0.04, "min": 0.0, "max": 1.0},
+        "outfile": {"type": "string", "default": "output.csv"}
+    }
+    campaign = uq.Campaign(name='collation_benchmark', params=params,
+                           actions=uq.actions.Actions(), work_dir=tempfile.mkdtemp())
+    campaign.set_sampler(uq.sampling.RandomSampler(vary={"beta": cp.Uniform(0.15, 0.25)}))
+    campaign_db = campaign.campaign_db
+    app_id = campaign.get_active_app()['id']
+    chunk_size = 10000
+    for start in range(0, nsamples, chunk_size):
+        rows = []
+        for i in range(start, min(start + chunk_size, nsamples)):
+            rows.append({
+                'run_name': 'run_{}'.format(i + 1),
+                'app': app_id,
+                'params': json.dumps({'beta': np.random.random(), 'gamma': 0.04,
+                                      'outfile': 'output.csv'}),
+                'status': Status.COLLATED,
+                'result': json.dumps({'values': list(np.random.random(size=qoi_size))}),
+                'campaign': campaign.campaign_id,
+                'sampler': campaign._active_sampler_id})
+        campaign_db.session.execute(RunTable.__table__.insert(), rows)
+    campaign_db.session.commit()
+    benchmark_results = {}
+    t = Timer(
+        'rowwise_collation(campaign_db, campaign._active_app_name, campaign._active_sampler_id)',
+        globals={**globals(), **locals()})
+    benchmark_results['rowwise_collation'] = t.timeit(1)
+    t = Timer('campaign.get_collation_result()', globals=locals())
+    benchmark_results['get_collation_result'] = t.timeit(1)
+    benchmark_results['speedup'] = (benchmark_results['rowwise_collation'] /
+                                    benchmark_results['get_collation_result'])
+    return benchmark_results
+
+
 if __name__ == '__main__':
     nsamples = [1000, 10000, 100000, 1000000]
     results = {}
     for nsamples_ in nsamples:
         results[nsamples_] = benchmark(nsamples_)
     print(json.dumps(results))
+    results = {}
+    for nsamples_ in [10000, 100000, 1000000]:
+        results[nsamples_] = benchmark_collation(nsamples_)
+    print(json.dumps(results))
@@ -1,6 +1,15 @@
 from ast import literal_eval
+import hashlib
+import io
+import json
+import struct
+import zlib
 import dill
 import base64
+import numpy as np
+
+RESULT_BLOB_MAGIC = b'EVQB'
+STATE_ARRAYS_MAGIC = 'EVQA:'
 
 
 def easyvvuq_serialize(obj):
@@ -38,6 +47,220 @@ def easyvvuq_deserialize(s):
         return dill.loads(base64.b64decode(s.encode('utf-8')))
 
 
+class _ArrayPickler(dill.Pickler):
+    """A dill pickler that leaves out the large numeric NumPy arrays, and collects
+    them by their key instead. Arrays with equal contents are collected once, but
+    distinct arrays keep distinct persistent ids, so they remain distinct objects
+    when unpickled.
+    """
+
+    def __init__(self, file, min_array_size):
+        super().__init__(file)
+        self.min_array_size = min_array_size
+        self.arrays = {}
+        # the persistent id and the array itself (keeping its id unique), by id
+        self._ids = {}
+
+    def persistent_id(self, obj):
+        if (type(obj) is np.ndarray and obj.dtype.kind in 'biufc' and
+                obj.nbytes >= self.min_array_size):
+            if id(obj) not in self._ids:
+                key = array_key(obj)
+                self.arrays[key] = obj
+                self._ids[id(obj)] = ((key, len(self._ids)), obj)
+            return self._ids[id(obj)][0]
+        return None
+
+
+class _ArrayUnpickler(dill.Unpickler):
+    """Unpickles the objects pickled by `_ArrayPickler`, given the arrays that were
+    left out. Every distinct array gets its own copy.
+    """
+
+    def __init__(self, file, arrays):
+        super().__init__(file)
+        self.arrays = arrays
+        self._loaded = {}
+
+    def persistent_load(self, pid):
+        if pid not in self._loaded:
+            self._loaded[pid] = np.array(self.arrays[pid[0]])
+        return self._loaded[pid]
+
+
+def array_key(array):
+    """Takes a NumPy array and returns a key that identifies its contents.
+
+    Parameters
+    ----------
+    array: numpy.ndarray
+        A numeric array.
+
+    Returns
+    -------
+    str:
+        A hash of the dtype, shape and values of `array`.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr((array.dtype.str, array.shape)).encode('utf-8'))
+    digest.update(np.ascontiguousarray(array).data)
+    return digest.hexdigest()
+
+
+def easyvvuq_serialize_state(obj, min_array_size=2**16):
+    """Takes an object and serializes it without its large numeric NumPy arrays,
+    so that these can be stored separately, and only once if they do not change.
+
+    Parameters
+    ----------
+    obj: obj
+        An arbitrary Python object, e.g. a sampler.
+    min_array_size: int
+        Arrays of at least this number of bytes are left out.
+
+    Returns
+    -------
+    str, dict:
+        A string representation of the rest of obj and the arrays left out,
+        by their `array_key`.
+    """
+    buffer = io.BytesIO()
+    pickler = _ArrayPickler(buffer, min_array_size)
+    pickler.dump(obj)
+    return STATE_ARRAYS_MAGIC + base64.b64encode(buffer.getvalue()).decode('utf-8'), pickler.arrays
+
+
+def easyvvuq_deserialize_state(s, arrays):
+    """Takes an object serialized by `easyvvuq_serialize_state` and reconstructs it.
+    Objects serialized by `easyvvuq_serialize` are reconstructed as well.
+
+    Parameters
+    ----------
+    s: str
+        A serialized Python object.
+    arrays: dict
+        The arrays left out of `s`, by their `array_key`.
+
+    Returns
+    -------
+    obj:
+        A previously serialized Python object.
+    """
+    if not s.startswith(STATE_ARRAYS_MAGIC):
+        return easyvvuq_deserialize(s)
+    buffer = io.BytesIO(base64.b64decode(s[len(STATE_ARRAYS_MAGIC):].encode('utf-8')))
+    return _ArrayUnpickler(buffer, arrays).load()
+
+
+def encode_array(array):
+    """Takes a numeric NumPy array and returns it in the NumPy .npy format.
+
+    Parameters
+    ----------
+    array: numpy.ndarray
+
+    Returns
+    -------
+    bytes:
+        The .npy representation of `array`.
+    """
+    buffer = io.BytesIO()
+    np.save(buffer, array, allow_pickle=False)
+    return buffer.getvalue()
+
+
+def decode_array(blob):
+    """Takes an array encoded by `encode_array` and reconstructs it.
+
+    Parameters
+    ----------
+    blob: bytes
+        An array in the NumPy .npy format.
+
+    Returns
+    -------
+    numpy.ndarray
+    """
+    return np.load(io.BytesIO(blob), allow_pickle=False)
+
+
+def encode_result_blob(result, compress=False):
+    """Takes a decoder output dictionary and encodes it as a binary blob.
+
+    Numeric vectors (lists or NumPy arrays) are stored as raw little-endian
+    buffers together with their dtype and shape, everything else is kept as
+    JSON in the blob header.
+
+    Parameters
+    ----------
+    result: dict
+        Decoder output.
+    compress: bool
+        Compress the blob with zlib.
+
+    Returns
+    -------
+    bytes:
+        Binary representation of `result`.
+    """
+    fields = []
+    buffers = []
+    offset = 0
+    for key, value in result.items():
+        if isinstance(value, (list, tuple, np.ndarray)):
+            array = np.asarray(value)
+            if array.ndim > 0 and array.dtype.kind in 'biuf':
+                array = np.ascontiguousarray(array, dtype=array.dtype.newbyteorder('<'))
+                fields.append([key, 'array', [array.dtype.str, list(array.shape), offset]])
+                buffers.append(array.tobytes())
+                offset += array.nbytes
+                # keep every buffer 8 byte aligned so that it can be viewed in place
+                padding = -offset % 8
+                buffers.append(b'\0' * padding)
+                offset += padding
+                continue
+        fields.append([key, 'json', value])
+    header = json.dumps(fields, default=lambda obj: obj.item()).encode('utf-8')
+    header += b' ' * (-(len(header) + 4) % 8)
+    body = struct.pack('<I', len(header)) + header + b''.join(buffers)
+    if compress:
+        return RESULT_BLOB_MAGIC + b'\1' + zlib.compress(body)
+    return RESULT_BLOB_MAGIC + b'\0' + body
+
+
+def decode_result_blob(blob):
+    """Takes a blob created by `encode_result_blob` and reconstructs the result.
+
+    Parameters
+    ----------
+    blob: bytes
+        A binary encoded decoder output.
+
+    Returns
+    -------
+    dict:
+        Decoder output with vector quantities as read-only NumPy arrays that
+        share memory with the (decompressed) blob.
+    """
+    if blob[:4] != RESULT_BLOB_MAGIC:
+        raise RuntimeError('not a binary encoded EasyVVUQ result')
+    body = memoryview(blob)[5:]
+    if blob[4] == 1:
+        body = memoryview(zlib.decompress(body))
+    header_length = struct.unpack_from('<I', body)[0]
+    fields = json.loads(bytes(body[4:4 + header_length]))
+    data_start = 4 + header_length
+    result = {}
+    for key, kind, value in fields:
+        if kind == 'array':
+            dtype, shape, offset = value
+            array = np.frombuffer(body, dtype=dtype, count=int(np.prod(shape)),
+                                  offset=data_start + offset)
+            value = array.reshape(shape)
+        result[key] = value
+    return result
+
+
 def multi_index_tuple_parser(lst):
     """
     Parses a list of strings to tuples if they represent tuples, otherwise
@@ -6,6 +6,8 @@ import easyvvuq as uq
 from easyvvuq.actions import CreateRunDirectory, Encode, Decode, ExecuteLocal, Actions
 # from matplotlib import cm
 import pytest
+from concurrent.futures import ProcessPoolExecutor
+from easyvvuq.sampling.simplex_stochastic_collocation import Tri1D
 
 
 def f(x1, x2):
@@ -268,6 +270,31 @@ def test_find_simplices(SSC_campaign):
     assert sampler.find_simplices(sampler.tri.simplices[3]) == np.array([3])
 
 
+def test_point_simplices(SSC_campaign):
+    # the inverted index follows the refinement of the triangulation
+    _, sampler, _ = SSC_campaign
+    np.random.seed(42)
+    sampler.update_Delaunay(sampler.sample_inputs(20))
+    indptr, indices = sampler.point_simplices()
+    for i in range(sampler.tri.npoints):
+        expected = (sampler.tri.simplices == i).any(axis=1).nonzero()[0]
+        assert (np.array_equal(indices[indptr[i]:indptr[i + 1]], expected))
+    # compare with checking the overlap of every element
+    for S_j in sampler.compute_stencil_j()[:, 0:6]:
+        overlap = np.isin(sampler.tri.simplices, S_j).sum(axis=1)
+        assert (np.array_equal(sampler.find_simplices(S_j), (overlap == 3).nonzero()[0]))
+
+
+def test_tri1D_add_points():
+    tri = Tri1D(np.array([[0.0], [1.0], [0.5]]))
+    tri.add_points(np.array([[0.25], [0.9]]))
+    expected = Tri1D(np.array([[0.0], [1.0], [0.5], [0.25], [0.9]]))
+    assert (np.array_equal(tri.simplices, expected.simplices))
+    assert (np.array_equal(tri.simplices, [[0, 3], [3, 2], [2, 4], [4, 1]]))
+    assert (np.array_equal(tri.neighbors, [[-1, 1], [0, 2], [1, 3], [2, -1]]))
+    assert (np.array_equal(tri.find_simplex(np.array([0.1, 0.3, 0.95])), [0, 1, 3]))
+
+
 def check_LEC_ENO(SSC_campaign):
     # test LEC + ENO subroutines, more comprehensive LEC test done in test_adapt_locally
     campaign, sampler, analysis = SSC_campaign
@@ -371,6 +398,39 @@ def test_adapt_locally_1D(SSC_campaign_1D):
     assert (analysis.p_j == np.array([4, 4, 4, 4, 1, 3, 3, 3])).all()
 
 
+def test_update_surrogate_jobs(SSC_campaign):
+    # the LEC and ENO checks give the same results in this process, in a pool
+    # of worker processes and for any chunk size
+    campaign, sampler, analysis = SSC_campaign
+    np.random.seed(42)
+    analysis.update_surrogate('f', campaign.get_collation_result(), n_mc_LEC=50)
+    analysis.adapt_locally(4)
+    campaign.execute().collate()
+    data_frame = campaign.get_collation_result()
+    results = []
+    for kwargs in [{'max_LEC_jobs': 1, 'max_ENO_jobs': 1}, {}, {'chunk_size': 1},
+                   {'max_LEC_jobs': 2, 'max_ENO_jobs': 3, 'chunk_size': 5}]:
+        np.random.seed(1)
+        analysis.update_surrogate('f', data_frame, n_mc_LEC=50, **kwargs)
+        results.append((analysis.p_j.copy(), analysis.S_j.copy(), np.random.rand()))
+    # the worker processes are kept for later updates
+    pools = dict(analysis._pools)
+    assert (sorted(pools) == [2, 3, 4])
+    analysis.update_surrogate('f', data_frame, n_mc_LEC=50)
+    assert (analysis._pools[4] is pools[4])
+    analysis.close()
+    assert (analysis._pools == {})
+    with ProcessPoolExecutor(2) as executor:
+        analysis = uq.analysis.SSCAnalysis(sampler=sampler, qoi_cols=['f'], executor=executor)
+        np.random.seed(1)
+        analysis.update_surrogate('f', data_frame, n_mc_LEC=50)
+        results.append((analysis.p_j.copy(), analysis.S_j.copy(), np.random.rand()))
+    for p_j, S_j, rand in results[1:]:
+        assert (np.array_equal(p_j, results[0][0]))
+        assert (np.array_equal(S_j, results[0][1]))
+        assert (rand == results[0][2])
+
+
 def test_sample_simplex(SSC_campaign):
     # test the random simplex sampling
     _, sampler, _ = SSC_campaign
@@ -435,6 +495,36 @@ def test_surrogate(SSC_campaign):
     assert analysis.surrogate('f', np.array([0.5, 0.5])) == pytest.approx(np.array([0]), 1e-5)
 
 
+def test_surrogate_batch(SSC_campaign):
+    campaign, sampler, analysis = SSC_campaign
+    data_frame = campaign.get_collation_result()
+    analysis.update_surrogate('f', data_frame)
+
+    np.random.seed(42)
+    xi = sampler.sample_inputs(50)
+    w = analysis.surrogate('f', xi)
+    assert w.shape == (50,)
+    assert w == pytest.approx(np.array([analysis.surrogate('f', x)[0] for x in xi]), 1e-10)
+
+    results = analysis.analyse(data_frame, n_mc=100)
+    surrogate = results.surrogate()
+    batch = surrogate({'x1': xi[:, 0], 'x2': xi[:, 1]})
+    assert batch['f'] == pytest.approx(w, 1e-10)
+    assert surrogate({'x1': xi[0, 0], 'x2': xi[0, 1]})['f'] == pytest.approx(w[0], 1e-10)
+
+
+def test_find_simplex_1D(SSC_campaign_1D):
+    _, sampler, _ = SSC_campaign_1D
+    sampler.update_Delaunay(np.array([[0.3], [0.8]]))
+    tri = sampler.tri
+    points = np.sort(tri.points.reshape(-1))
+    xi = np.array([points[0], 0.1, points[2], 0.5, points[-1]])
+    idx = tri.find_simplex(xi)
+    for x, i in zip(xi, idx):
+        left, right = np.sort(tri.points[tri.simplices[i]].reshape(-1))
+        assert left <= x <= right
+
+
 def test_compute_eps_bar_j(SSC_campaign):
     # test geometric refinement measure
     campaign, sampler, analysis = SSC_campaign
@@ -31,3 +31,29 @@ def test_action_pool_start_sequential(campaign):
     assert (len(action_pool.results) == 3)
     action_pool.collate()
     assert (len(action_pool.campaign.get_collation_result()) == 3)
+
+
+def test_action_pool_collate_batches(campaign):
+    action_pool = campaign.execute(nsamples=5)
+    campaign.campaign_db.store_result_batch = MagicMock(
+        side_effect=campaign.campaign_db.store_result_batch)
+    action_pool.collate(batch_size=2)
+    assert ([len(call.args[0]) for call in campaign.campaign_db.store_result_batch.mock_calls] ==
+            [2, 2, 1])
+    assert (len(action_pool.campaign.get_collation_result()) == 5)
+
+
+def test_action_pool_stream(campaign):
+    action_pool = campaign.execute(nsamples=5)
+    subscriber = MagicMock()
+    results = []
+    for result in action_pool.stream(subscribers=[subscriber]):
+        results.append(result)
+        # each result is stored before it is yielded
+        assert (len(campaign.get_collation_result()) == len(results))
+        if len(results) == 3:
+            break
+    assert (subscriber.update.call_count == 3)
+    assert (all(result['result']['y'] == result['run_info']['params']['x'] + 1
+                for result in results))
+    assert (sorted(result['sample_index'] for result in action_pool.stream()) == [0, 1, 2, 3, 4])
@@ -1,4 +1,8 @@
 import pytest
+from concurrent.futures import ProcessPoolExecutor
+import easyvvuq as uq
+from easyvvuq.actions import Actions, ExecutePython
+from easyvvuq.sampling import RandomSampler
 from easyvvuq.analysis.qmc_analysis import QMCAnalysis
 from easyvvuq.sampling.qmc import QMCSampler
 import chaospy as cp
@@ -25,5 +29,117 @@ def test_analyse():
     results = analysis.analyse(df)
 
 
+def test_streaming():
+    vary = {
+        "a": cp.Uniform(0.0, 1.0),
+        "b": cp.Uniform(0.0, 1.0)
+    }
+    sampler = QMCSampler(vary, 32)
+    samples = {('run_id', 0): [], ('a', 0): [], ('b', 0): [], ('f', 0): [], ('f', 1): []}
+    results = []
+    for i, sample in enumerate(sampler):
+        f = [sample['a'] + 2 * sample['b'], sample['a'] * sample['b']]
+        samples[('run_id', 0)].append(i)
+        samples[('a', 0)].append(sample['a'])
+        samples[('b', 0)].append(sample['b'])
+        samples[('f', 0)].append(f[0])
+        samples[('f', 1)].append(f[1])
+        results.append({'sample_index': i, 'result': {'f': f}})
+    analysis = QMCAnalysis(sampler, qoi_cols=['f'])
+    reference = analysis.analyse(pd.DataFrame(samples)).raw_data
+    # results arrive in arbitrary order
+    np.random.seed(0)
+    for i in np.random.permutation(len(results)):
+        analysis.update(results[i])
+    running = analysis.running_statistics()
+    assert (running['n_runs'] == len(results))
+    assert (running['n_blocks'] == 32)
+    moments = running['statistical_moments']['f']
+    assert (np.allclose(moments['mean'], reference['statistical_moments']['f']['mean']))
+    assert (np.allclose(moments['var'], reference['statistical_moments']['f']['var']))
+    for param in ['a', 'b']:
+        assert (np.allclose(running['sobols_first']['f'][param],
+                            reference['sobols_first']['f'][param]))
+        assert (np.allclose(running['sobols_total']['f'][param],
+                            reference['sobols_total']['f'][param]))
+
+
+def test_streaming_campaign(tmp_path):
+    # results streamed from several action pools, of a sampler whose runs do not
+    # start at the first run of the campaign, are placed in the sampling plan
+    def model(params):
+        return {'f': params['a'] + 2 * params['b'] + params['a'] * params['b']}
+    params = {'a': {'type': 'float', 'default': 0.0}, 'b': {'type': 'float', 'default': 0.0}}
+    vary = {'a': cp.Uniform(0.0, 1.0), 'b': cp.Uniform(0.0, 1.0)}
+    campaign = uq.Campaign('qmc_stream', params, Actions(ExecutePython(model)),
+                           work_dir=str(tmp_path))
+    campaign.set_sampler(RandomSampler(vary, seed=1))
+    campaign.execute(nsamples=3).collate()
+    sampler = QMCSampler(vary, 16)
+    campaign.set_sampler(sampler)
+    analysis = QMCAnalysis(sampler, qoi_cols=['f'])
+    for nsamples in [10, 0]:
+        for _ in campaign.execute(nsamples=nsamples).stream(subscribers=[analysis]):
+            pass
+    running = analysis.running_statistics()
+    assert (running['n_runs'] == 64)
+    assert (running['n_blocks'] == 16)
+    reference = analysis.analyse(campaign.get_collation_result())
+    for param in ['a', 'b']:
+        assert (np.allclose(running['sobols_first']['f'][param],
+                            reference.raw_data['sobols_first']['f'][param]))
+        assert (np.allclose(running['sobols_total']['f'][param],
+                            reference.raw_data['sobols_total']['f'][param]))
+
+
+def test_parallel_qois():
+    vary = {
+        "a": cp.Uniform(0.0, 1.0),
+        "b": cp.Uniform(0.0, 1.0)
+    }
+    sampler = QMCSampler(vary, 32)
+    samples = {('run_id', 0): [], ('f', 0): [], ('f', 1): [], ('g', 0): []}
+    for i, sample in enumerate(sampler):
+        samples[('run_id', 0)].append(i)
+        samples[('f', 0)].append(sample['a'] + 2 * sample['b'])
+        samples[('f', 1)].append(sample['a'] * sample['b'])
+        samples[('g', 0)].append(sample['a'] ** 2)
+    df = pd.DataFrame(samples)
+    reference = QMCAnalysis(sampler, qoi_cols=['f', 'g'], seed=1).analyse(df).raw_data
+    with ProcessPoolExecutor(2) as executor:
+        analysis = QMCAnalysis(sampler, qoi_cols=['f', 'g'], seed=1, executor=executor)
+        results = analysis.analyse(df).raw_data
+    for qoi in ['f', 'g']:
+        assert (np.allclose(results['statistical_moments'][qoi]['mean'],
+                            reference['statistical_moments'][qoi]['mean']))
+        for param in ['a', 'b']:
+            assert (np.allclose(results['sobols_first'][qoi][param],
+                                reference['sobols_first'][qoi][param]))
+            # the bootstrap samples only depend on the seed
+            assert (np.allclose(results['conf_sobols_first'][qoi][param]['low'],
+                                reference['conf_sobols_first'][qoi][param]['low']))
+
+
+def test_get_samples():
+    sampler = QMCSampler({"a": cp.Uniform(0.0, 1.0), "b": cp.Uniform(0.0, 1.0)}, 4)
+    analysis = QMCAnalysis(sampler, qoi_cols=['f', 'g'])
+    # runs in arbitrary order, two rows per run
+    run_ids = [3, 1, 3, 2, 1, 2]
+    df = pd.DataFrame({('run_id', 0): run_ids,
+                       ('f', 0): np.arange(6.0), ('f', 1): np.arange(6.0) + 10,
+                       ('g', 0): np.arange(6.0) * 2})
+    samples = analysis.extract_samples(df)
+    assert (np.array_equal(samples['f'], [[0, 10, 2, 12], [1, 11, 4, 14], [3, 13, 5, 15]]))
+    assert (np.array_equal(samples['g'], [[0, 4], [2, 8], [6, 10]]))
+    samples = analysis.get_samples(df.iloc[[1, 0, 3]])
+    assert (samples['f'].shape == (3, 1, 2))
+    assert (np.array_equal(samples['f'][:, 0], [[1, 11], [0, 10], [3, 13]]))
+    # the data frame is not modified through the samples
+    samples['f'][0] = 100.0
+    assert (df[('f', 0)].iloc[1] == 1.0)
+    with pytest.raises(RuntimeError):
+        analysis.extract_samples(df.iloc[:5])
+
+
 if __name__ == '__main__':
     test_analyse()
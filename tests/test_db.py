@@ -1,13 +1,17 @@
 import pytest
+import json
 import os.path
 import easyvvuq as uq
 from easyvvuq.constants import default_campaign_prefix, Status
-from easyvvuq.db.sql import CampaignDB
+from easyvvuq.db.sql import CampaignDB, DBInfoTable, SamplerTable, SamplerArrayTable
+from easyvvuq.utils.helpers import easyvvuq_serialize
+import chaospy as cp
 from easyvvuq.data_structs import CampaignInfo, RunInfo, AppInfo
 from easyvvuq.constants import Status
 from easyvvuq.actions import Actions, ExecutePython
 import pandas as pd
 import numpy as np
+from sqlalchemy import event
 
 
 @pytest.fixture
@@ -76,6 +80,18 @@ def test_get_num_runs(campaign):
     assert (campaign.get_num_runs() == 910)
 
 
+def test_add_runs_from_params(campaign):
+    campaign.add_runs_from_params([{'a': np.int64(2)}, {'a': 3.5}], app=1, sampler=1, campaign=1,
+                                  status=[Status.NEW, Status.INVALID], iteration=2)
+    assert (campaign.get_num_runs() == 912)
+    assert (campaign.run('run_911')['params'] == {'a': 2})
+    assert (campaign.run('run_912')['status'] == Status.INVALID)
+    assert (campaign.get_run_status(912) == Status.INVALID)
+    campaign.add_runs_from_params([{'a': 1}], app=1, sampler=1, campaign=1)
+    assert (campaign.run('run_913')['status'] == Status.NEW)
+    assert (campaign.session.query(DBInfoTable).first().next_run == 914)
+
+
 def test_app(campaign):
     with pytest.raises(RuntimeError):
         campaign.app('test_')
@@ -133,6 +149,103 @@ def test_collation(campaign):
     assert (result.count()[0] == 910)
 
 
+def test_collation_chunks(campaign, monkeypatch):
+    monkeypatch.setattr('easyvvuq.db.sql.COLLATION_CHUNK_SIZE', 100)
+    results = [(run[0], {'b': i if i < 450 else i + 0.5, 'c': [i, 'x'], 'd': 'out'})
+               for i, run in enumerate(campaign.runs())]
+    campaign.store_results('test', results)
+    result = campaign.get_results('test', 1)
+    assert (list(result.columns) == [('run_id', 0), ('iteration', 0), ('a', 0),
+                                     ('b', 0), ('c', 0), ('c', 1), ('d', 0)])
+    assert (result[('b', 0)].dtype == np.float64)
+    assert (result[('b', 0)].iloc[100] == 100)
+    assert (result[('b', 0)].iloc[500] == 500.5)
+    assert (list(result.iloc[909].values) == [910, 0, 1, 909.5, 909, 'x', 'out'])
+    assert (result[('run_id', 0)].is_monotonic_increasing)
+
+
+def test_binary_collation(campaign):
+    results = [(run[0], {'b': i, 'c': [i + 1, i + 2]}) for i, run in enumerate(campaign.runs())]
+    campaign.store_results('test', results[:400])
+    campaign.result_encoding = 'binary'
+    campaign.compress_results = True
+    campaign.store_results('test', results[400:])
+    result = campaign.get_results('test', 1)
+    assert (list(result.columns) == [('run_id', 0), ('iteration', 0),
+                                     ('a', 0), ('b', 0), ('c', 0), ('c', 1)])
+    assert (list(result.iloc[100].values) == [101, 0, 1, 100, 101, 102])
+    assert (list(result.iloc[800].values) == [801, 0, 1, 800, 801, 802])
+    assert (result.count()[0] == 910)
+    # the run information includes the result in either encoding, the binary
+    # results are selected together with the runs
+    statements = []
+
+    def count(*args):
+        statements.append(args)
+    event.listen(campaign.engine, 'before_cursor_execute', count)
+    runs = dict(campaign.runs())
+    event.remove(campaign.engine, 'before_cursor_execute', count)
+    assert (len(statements) == 1)
+    assert (json.loads(runs[101]['result']) == {'b': 100, 'c': [101, 102]})
+    assert (json.loads(runs[801]['result']) == {'b': 800, 'c': [801, 802]})
+    assert (json.loads(campaign.run('run_801')['result']) == {'b': 800, 'c': [801, 802]})
+    # a binary result replaces the one stored before
+    campaign.store_results('test', [(801, {'b': -2, 'c': [0, 0]})])
+    assert (list(campaign.get_results('test', 1).iloc[800].values) == [801, 0, 1, -2, 0, 0])
+    # storing a JSON result again takes precedence over the binary one
+    campaign.result_encoding = 'json'
+    campaign.store_results('test', [(801, {'b': -1, 'c': [0, 0]})])
+    assert (list(campaign.get_results('test', 1).iloc[800].values) == [801, 0, 1, -1, 0, 0])
+
+
+@pytest.mark.parametrize('encoding', ['json', 'binary'])
+def test_store_result_batch(campaign, encoding):
+    campaign.result_encoding = encoding
+    results = [(run[0], {'rundir': 'run_{}'.format(run[0]), 'result': {'b': i, 'c': [i, i]}},
+                i % 2 == 0) for i, run in enumerate(campaign.runs())]
+    campaign.store_result_batch(results)
+    assert (campaign.get_run_status(1) == Status.COLLATED)
+    assert (campaign.get_run_status(2) == Status.NEW)
+    assert (campaign.run('run_3')['run_dir'] == 'run_3')
+    result = campaign.get_results('test', 1)
+    assert (result.count()[0] == 455)
+    assert (list(result.iloc[1].values) == [3, 0, 1, 2, 2, 2])
+    campaign.store_result_batch([(3, {'rundir': '', 'result': {'b': -1, 'c': [0, 0]}}, True)])
+    assert (list(campaign.get_results('test', 1).iloc[1].values) == [3, 0, 1, -1, 0, 0])
+
+
+def test_sampler_state(campaign):
+    sampler = uq.sampling.MCSampler({'a': cp.Uniform(0, 1), 'b': cp.Uniform(0, 1)},
+                                    n_mc_samples=10000)
+    sampler_id = campaign.add_sampler(sampler)
+    # the samples are stored once, the state of the sampler itself is small
+    assert (campaign.session.query(SamplerArrayTable).count() == 1)
+    assert (len(campaign.session.get(SamplerTable, sampler_id).sampler) < 10000)
+    sampler.next_block(10)
+    campaign.update_sampler(sampler_id, sampler)
+    assert (campaign.session.query(SamplerArrayTable).count() == 1)
+    restored = campaign.resurrect_sampler(sampler_id)
+    assert (restored.count == 10)
+    assert (np.array_equal(restored.xi_mc, sampler.xi_mc))
+    assert (restored.next_block(5).equals(sampler.next_block(5)))
+    # arrays that are no longer used are removed
+    sampler.xi_mc = sampler.xi_mc + 1
+    campaign.update_sampler(sampler_id, sampler)
+    assert (campaign.session.query(SamplerArrayTable).count() == 1)
+    assert (np.array_equal(campaign.resurrect_sampler(sampler_id).xi_mc, sampler.xi_mc))
+    # samplers stored as a whole
+    campaign.session.get(SamplerTable, sampler_id).sampler = easyvvuq_serialize(sampler)
+    assert (np.array_equal(campaign.resurrect_sampler(sampler_id).xi_mc, sampler.xi_mc))
+    assert (campaign.resurrect_sampler(sampler_id + 1) is None)
+
+
+def test_collation_malformed(campaign):
+    results = [(run[0], {'c': [0] * (1 + (i > 500))}) for i, run in enumerate(campaign.runs())]
+    campaign.store_results('test', results)
+    with pytest.raises(RuntimeError):
+        campaign.get_results('test', 1)
+
+
 def test_mv_collation(tmp_path, app_info):
     mv_data = {
         'timestep': [
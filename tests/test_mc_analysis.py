@@ -113,6 +113,31 @@ def test_sobol_bootstrap(data):
     # assert (st_conf['x2']['high'][0] == pytest.approx(0.49214117, 0.01))
 
 
+def test_sobol_bootstrap_chunks(data_vectors):
+    mc_sampler, df = data_vectors
+    analysis = uq.analysis.QMCAnalysis(sampler=mc_sampler, qoi_cols=['g'])
+    samples = analysis.get_samples(df)['g']
+    reference = analysis.sobol_bootstrap(samples, n_bootstrap=50, seed=1)
+    # the results do not depend on how the computation is split
+    results = analysis.sobol_bootstrap(samples, n_bootstrap=50, seed=1, memory_budget=1000)
+    for ref, res in zip(reference, results):
+        for param in ['x1', 'x2']:
+            if isinstance(ref[param], dict):
+                assert (np.allclose(ref[param]['low'], res[param]['low']))
+                assert (np.allclose(ref[param]['high'], res[param]['high']))
+            else:
+                assert (np.allclose(ref[param], res[param]))
+    # same bootstrap samples as computing the estimates on the resampled evaluations
+    r = np.random.default_rng(1).integers(100, size=(100, 50))
+    f_M2, f_M1, f_Ni = analysis._separate_output_values(samples, 2, 100)
+    sobols_first = analysis._first_order(f_M2[r], f_M1[r], f_Ni[r, 0])
+    _, low, high = uq.analysis.ensemble_boot.confidence_interval(
+        sobols_first, reference[0]['x1'], 0.05, pivotal=True)
+    assert (reference[1]['x1']['low'].shape == (1, 3))
+    assert (np.allclose(reference[1]['x1']['low'], low))
+    assert (np.allclose(reference[1]['x1']['high'], high))
+
+
 def test_separate_output_values(data):
     mc_sampler, df = data
     analysis = uq.analysis.QMCAnalysis(sampler=mc_sampler, qoi_cols=['f'])
@@ -0,0 +1,44 @@
+import pytest
+import numpy as np
+from easyvvuq import ParamsSpecification
+
+
+@pytest.fixture
+def params():
+    return ParamsSpecification({
+        "x": {"type": "float", "min": 0.0, "max": 1.0, "default": 0.5},
+        "n": {"type": "integer", "default": 1},
+        "name": {"type": "string", "default": "out.csv"}
+    })
+
+
+def test_process_runs_defaults(params):
+    runs, errors = params.process_runs([{'x': 0.1}, {'x': 1, 'n': np.int64(2)}])
+    assert (runs == [{'x': 0.1, 'n': 1, 'name': 'out.csv'},
+                     {'x': 1, 'n': 2, 'name': 'out.csv'}])
+    assert (errors == [None, None])
+
+
+def test_process_runs_errors(params):
+    new_runs = [{'x': 0.1}, {'x': 1.5}, {'x': -0.1}, {'n': 1.5}, {'y': 1},
+                {'name': None}, {'x': 'a'}, {'x': 0.9}]
+    runs, errors = params.process_runs([dict(run) for run in new_runs])
+    # cerberus replaces None with the default value before validation
+    assert ([error is None for error in errors] ==
+            [True, False, False, False, False, True, False, True])
+    for run, error in zip(new_runs, errors):
+        if error is not None:
+            with pytest.raises(RuntimeError) as excinfo:
+                params.process_run(dict(run))
+            assert (str(excinfo.value) == error)
+    assert ('The allowed parameter names' in errors[4])
+    _, errors = params.process_runs(new_runs, verify=False)
+    assert (errors == [None] * len(new_runs))
+
+
+def test_process_runs_cerberus_rules():
+    params = ParamsSpecification({
+        "x": {"type": "string", "allowed": ["a", "b"], "default": "a"}
+    })
+    _, errors = params.process_runs([{'x': 'a'}, {'x': 'c'}, {}])
+    assert ([error is None for error in errors] == [True, False, True])
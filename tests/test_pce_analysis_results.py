@@ -3,11 +3,14 @@ import easyvvuq as uq
 import numpy as np
 import chaospy as cp
 import pytest
+from unittest.mock import patch
 import logging
 import pandas as pd
 import math
+import pickle
+import numpoly
 from tests.sc.sobol_model import sobol_g_func
-from easyvvuq.analysis.pce_analysis import PCEAnalysisResults
+from easyvvuq.analysis.pce_analysis import PCEAnalysisResults, PCESurrogate
 
 
 def exact_sobols_g_func(d=2, a=[0.0, 0.5, 3.0, 9.0, 99.0]):
@@ -117,7 +120,7 @@ def test_full_results(results):
 def test_distribution(results):
     with pytest.raises(RuntimeError):
         results.get_distribution('z')
-    assert (results.get_distribution('f').pdf([0, 0]) == pytest.approx([0.44296863, 0.44296863]))
+    assert (results.get_distribution('f').pdf([0, 0]) == pytest.approx([0.44341244, 0.44341244]))
 
 
 def test_describe(results_vectors):
@@ -128,13 +131,13 @@ def test_describe(results_vectors):
             'mean': pytest.approx(0.5000000000000001, 0.001),
             'var': pytest.approx(0.08333333333333348, 0.001),
             'std': pytest.approx(0.28867513459481314, 0.001),
-            '1%': pytest.approx(0.00918264783704714, 0.001),
-            '10%': pytest.approx(0.09946223131463872, 0.001),
-            'median': pytest.approx(0.49494477064098824, 0.001),
-            '90%': pytest.approx(0.9004983440179313, 0.001),
-            '99%': pytest.approx(0.9905999521854744, 0.001),
-            'min': pytest.approx(-0.775685017772766, 0.001),
-            'max': pytest.approx(1.775781592068878, 0.001)})
+            '1%': pytest.approx(0.01124157714076873, 0.001),
+            '10%': pytest.approx(0.10201213598271722, 0.001),
+            'median': pytest.approx(0.5027044399540099, 0.001),
+            '90%': pytest.approx(0.9029856214324105, 0.001),
+            '99%': pytest.approx(0.9915939417389364, 0.001),
+            'min': pytest.approx(-0.7698928369645258, 0.001),
+            'max': pytest.approx(1.7700080445494866, 0.001)})
     assert (
         results_vectors.describe('g').to_dict()[
             ('g',
@@ -142,11 +145,89 @@ def test_describe(results_vectors):
             'mean': pytest.approx(0.5000000000000001, 0.001),
             'var': pytest.approx(0.08333333333333348, 0.001),
             'std': pytest.approx(0.28867513459481314, 0.001),
-            '1%': pytest.approx(0.00918264783704714, 0.001),
-            '10%': pytest.approx(0.09946223131463872, 0.001),
-            'median': pytest.approx(0.49494477064098824, 0.001),
-            '90%': pytest.approx(0.9004983440179313, 0.001),
-            '99%': pytest.approx(0.9905999521854744, 0.001),
-            'min': pytest.approx(-0.7756850177727665, 0.001),
-            'max': pytest.approx(1.775781592068878, 0.001)})
+            '1%': pytest.approx(0.01124157714076873, 0.001),
+            '10%': pytest.approx(0.10201213598271722, 0.001),
+            'median': pytest.approx(0.5027044399540099, 0.001),
+            '90%': pytest.approx(0.9029856214324105, 0.001),
+            '99%': pytest.approx(0.9915939417389364, 0.001),
+            'min': pytest.approx(-0.7698928369645258, 0.001),
+            'max': pytest.approx(1.7700080445494866, 0.001)})
     assert (isinstance(results_vectors.describe('g', 'min'), np.ndarray))
+
+
+def test_parallel_qois(data_vectors):
+    sampler, df = data_vectors
+    reference = uq.analysis.PCEAnalysis(sampler=sampler, qoi_cols=['g', 'h']).analyse(df)
+    sampler._design_matrix = None
+    analysis = uq.analysis.PCEAnalysis(sampler=sampler, qoi_cols=['g', 'h'], n_jobs=2)
+    results = analysis.analyse(df)
+    # the design matrix is computed once, before the QoIs are sent to the workers
+    assert (sampler._design_matrix is not None)
+    for qoi in ['g', 'h']:
+        for stat in ['mean', 'var', 'std']:
+            assert (np.allclose(results.describe(qoi, stat), reference.describe(qoi, stat)))
+        for param in ['x1', 'x2']:
+            assert (np.allclose(results.sobols_first(qoi, param), reference.sobols_first(qoi, param)))
+            assert (np.allclose(results.sobols_total(qoi, param), reference.sobols_total(qoi, param)))
+        assert (np.allclose(results.raw_data['fit'][qoi](0.2, 0.3),
+                            reference.raw_data['fit'][qoi](0.2, 0.3)))
+    # a worker gets the sampler without its design matrix and does not recompute it
+    worker = pickle.loads(pickle.dumps(analysis))
+    assert (worker.sampler._design_matrix is None)
+    design_matrix = sampler.design_matrix[:, :sampler.n_samples]
+    worker._analyse_qoi('g', df['g'].values, None, design_matrix)
+    assert (worker.sampler._design_matrix is None)
+
+
+def test_surrogate(results_vectors):
+    surrogate = results_vectors.surrogate()
+    x1 = np.linspace(0, 1, 7)
+    x2 = np.linspace(1, 0, 7)
+    batch = surrogate({'x1': x1, 'x2': x2})
+    for qoi in ['g', 'h']:
+        fit = results_vectors.raw_data['fit'][qoi]
+        assert (batch[qoi].shape == (7, len(fit)))
+        assert (np.allclose(batch[qoi], fit(x1, x2).T))
+        assert (np.allclose(surrogate({'x1': x1[2], 'x2': x2[2]})[qoi], fit(x1[2], x2[2])))
+
+
+def test_surrogate_variables():
+    # parameters are passed to the variables in lexicographic order of their names
+    # (q0, q1, q10, q11, q2, ...), also if a fit does not depend on all of them
+    q = cp.variable(12)
+    fits = {'f': q[10] + 2 * q[2], 'g': cp.polynomial([q[0] * q[11] ** 2, 3.0])}
+    surrogate = PCESurrogate(fits, 12, batch_size=2)
+    X = np.random.rand(5, 12)
+    values = surrogate(X)
+    assert (np.allclose(values['f'], X[:, 2] + 2 * X[:, 4]))
+    assert (np.allclose(values['g'], np.column_stack([X[:, 0] * X[:, 3] ** 2, 3 * np.ones(5)])))
+    full = numpoly.sum(q * np.arange(1, 13))
+    assert (np.allclose(PCESurrogate({'f': full}, 12)(X)['f'], full(*X.T)))
+    with pytest.raises(RuntimeError):
+        surrogate(X[:, :11])
+
+
+def test_lazy_statistics(data_vectors):
+    sampler, df = data_vectors
+    with patch('chaospy.Perc', wraps=cp.Perc) as perc, \
+            patch('chaospy.QoI_Dist', wraps=cp.QoI_Dist) as qoi_dist:
+        np.random.seed(1)
+        results = uq.analysis.PCEAnalysis(sampler=sampler, qoi_cols=['g', 'h']).analyse(df)
+        # the global random state is not advanced
+        assert (np.random.randint(2**31) == np.random.RandomState(1).randint(2**31))
+        assert (not perc.called)
+        assert (not qoi_dist.called)
+        median = results.describe('g', 'median')
+        assert (perc.call_count == 1)
+        assert (np.array_equal(results.describe('g', 'median'), median))
+        assert (perc.call_count == 1)
+        assert (not qoi_dist.called)
+        results.get_distribution('h')
+        assert (qoi_dist.call_count == 1)
+    assert (list(results.raw_data['percentiles']) == ['g', 'h'])
+    # the derivatives of one QoI are computed without those of the others
+    results.derivatives_first('g', 'x1')
+    assert (list(results.raw_data['derivatives_first']._values) == ['g'])
+    restored = pickle.loads(pickle.dumps(results))
+    assert (np.allclose(restored.describe('h', '90%'), results.describe('h', '90%')))
+    assert (np.allclose(restored.derivatives_first('h', 'x1'), results.derivatives_first('h', 'x1')))
@@ -0,0 +1,42 @@
+import copy
+import pytest
+import chaospy as cp
+import numpy as np
+from easyvvuq.sampling import MCSampler, QMCSampler, SCSampler, PCESampler, RandomSampler
+
+
+VARY = {'a': cp.Uniform(-5, 0), 'b': cp.DiscreteUniform(2, 10)}
+
+
+@pytest.mark.parametrize('sampler', [
+    MCSampler(VARY, 10),
+    QMCSampler({'a': cp.Uniform(-5, 0), 'b': cp.Uniform(2, 10)}, 10),
+    SCSampler(VARY, polynomial_order=3),
+    PCESampler({'a': cp.Uniform(-5, 0), 'b': cp.Uniform(2, 10)}, polynomial_order=3),
+    PCESampler({'a': cp.Uniform(-1, 1), 'b': cp.Uniform(-1, 1)}, polynomial_order=2,
+               regression=True, relative_analysis=True, nominal_value={'a': 1.0, 'b': 3.0}),
+])
+def test_next_block(sampler):
+    runs = list(copy.deepcopy(sampler))
+    first = sampler.next_block(5)
+    assert (list(first.columns) == ['a', 'b'])
+    assert (sampler.count == 5)
+    rest = sampler.next_block(0)
+    assert (sampler.next_block(3).empty)
+    records = first.to_dict('records') + rest.to_dict('records')
+    assert (len(records) == len(runs))
+    for record, run in zip(records, runs):
+        assert (record.keys() == run.keys())
+        for key in run:
+            assert (record[key] == pytest.approx(run[key]))
+            assert (isinstance(record[key], int) == isinstance(run[key], int))
+
+
+def test_next_block_random():
+    sampler = RandomSampler(VARY, max_num=10)
+    block = sampler.next_block(0)
+    assert (len(block) == 10)
+    assert (np.all((block['a'] >= -5) & (block['a'] <= 0)))
+    with pytest.raises(RuntimeError):
+        RandomSampler(VARY).next_block(0)
+    assert (len(RandomSampler(VARY).next_block(7)) == 7)
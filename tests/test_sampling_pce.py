@@ -0,0 +1,82 @@
+import os
+import pickle
+import pytest
+import numpy as np
+import chaospy as cp
+from unittest.mock import patch
+from easyvvuq.sampling import PCESampler
+from easyvvuq.sampling.pce_cache import PCECache
+
+
+def test_design_matrix():
+    vary = {'a': cp.Uniform(-1, 1), 'b': cp.Normal(1, 0.5)}
+    sampler = PCESampler(vary, polynomial_order=3)
+    assert (sampler.design_matrix.shape == (len(sampler.P), sampler.n_samples))
+    assert (np.allclose(sampler.design_matrix, sampler.P(*sampler._nodes)))
+    # not part of the stored state
+    restored = pickle.loads(pickle.dumps(sampler))
+    assert (restored._design_matrix is None)
+    assert (np.array_equal(restored.design_matrix, sampler.design_matrix))
+
+
+def test_cache(tmp_path):
+    vary = {'a': cp.Uniform(-1, 1), 'b': cp.Normal(1, 0.5)}
+    reference = PCESampler(vary, polynomial_order=3, regression=True)
+    sampler = PCESampler(vary, polynomial_order=3, regression=True, cache_dir=str(tmp_path))
+    sampler.design_matrix
+    assert (len(os.listdir(tmp_path)) == 3)
+    with patch('chaospy.expansion.stieltjes') as stieltjes, \
+            patch('chaospy.generate_samples') as generate_samples:
+        cached = PCESampler(vary, polynomial_order=3, regression=True, cache_dir=str(tmp_path))
+        assert (np.array_equal(cached.design_matrix, reference.design_matrix))
+        assert (not stieltjes.called)
+        assert (not generate_samples.called)
+    assert (np.array_equal(cached._nodes, reference._nodes))
+    assert (cached.P == reference.P).all()
+    # a different distribution, order or rule is a different entry
+    PCESampler({'a': cp.Uniform(-1, 2), 'b': cp.Normal(1, 0.5)}, polynomial_order=3,
+               regression=True, cache_dir=str(tmp_path))
+    assert (len(os.listdir(tmp_path)) == 5)
+    PCESampler(vary, polynomial_order=2, cache_dir=str(tmp_path))
+    assert (len(os.listdir(tmp_path)) == 7)
+    # random samples are not cached, the expansion is the same as above
+    PCESampler(vary, polynomial_order=2, regression=True, rule='R', cache_dir=str(tmp_path))
+    assert (len(os.listdir(tmp_path)) == 7)
+
+
+def test_cache_key():
+    assert (PCECache.key('nodes', order=2, rule='G') == PCECache.key('nodes', rule='G', order=2))
+    assert (PCECache.key('nodes', order=2) != PCECache.key('weights', order=2))
+    assert (PCECache.key('nodes', dist=cp.Uniform(0, 1)) !=
+            PCECache.key('nodes', dist=cp.Uniform(0, 1.0000001)))
+    assert (PCECache.key('nodes', dist=cp.J(cp.Normal(1, 2), cp.Uniform(0, 1))) ==
+            PCECache.key('nodes', dist=cp.J(cp.Normal(1, 2), cp.Uniform(0, 1))))
+    # the repr of a kernel density estimate does not include the samples
+    samples = np.linspace(0, 1, 20)
+    assert (PCECache.key('nodes', dist=cp.GaussianKDE(samples)) ==
+            PCECache.key('nodes', dist=cp.GaussianKDE(samples.copy())))
+    assert (PCECache.key('nodes', dist=cp.GaussianKDE(samples)) !=
+            PCECache.key('nodes', dist=cp.GaussianKDE(10 * samples + 5)))
+    with pytest.raises(TypeError):
+        PCECache.key('nodes', dist=cp.UserDistribution(cdf=lambda x: x, lower=lambda: 0, upper=lambda: 1))
+
+
+def test_cache_kde(tmp_path):
+    np.random.seed(3)
+    vary_a = {'a': cp.GaussianKDE(np.random.uniform(0, 1, 50))}
+    vary_b = {'a': cp.GaussianKDE(np.random.uniform(5, 15, 50))}
+    reference = PCESampler(vary_b, polynomial_order=2)
+    PCESampler(vary_a, polynomial_order=2, cache_dir=str(tmp_path))
+    cached = PCESampler(vary_b, polynomial_order=2, cache_dir=str(tmp_path))
+    assert (np.allclose(cached._nodes, reference._nodes))
+    assert (np.allclose(cached._weights, reference._weights))
+    assert (np.allclose(cached.design_matrix, reference.design_matrix))
+    assert (len(os.listdir(tmp_path)) == 5)
+
+
+def test_cache_user_distribution(tmp_path):
+    # a distribution defined by Python functions cannot be hashed and is not cached
+    dist = cp.UserDistribution(cdf=lambda x: x, lower=lambda: 0, upper=lambda: 1)
+    assert (np.array_equal(PCECache(str(tmp_path)).get('nodes', lambda: np.arange(3), dist=dist),
+                           np.arange(3)))
+    assert (os.listdir(tmp_path) == [])
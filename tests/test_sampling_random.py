@@ -0,0 +1,46 @@
+import pickle
+import pytest
+import numpy as np
+import chaospy as cp
+from easyvvuq.sampling import RandomSampler
+
+
+VARY = {'a': cp.Uniform(-5, 0), 'b': cp.DiscreteUniform(2, 10), 'c': cp.Normal(1, 2)}
+
+
+def test_sampling():
+    sampler = RandomSampler(VARY, max_num=50)
+    runs = list(sampler)
+    assert (len(runs) == 50)
+    for run in runs:
+        assert (-5 <= run['a'] <= 0)
+        assert (isinstance(run['b'], int) and 2 <= run['b'] <= 10)
+    with pytest.raises(StopIteration):
+        next(sampler)
+
+
+def test_seed():
+    runs = list(RandomSampler(VARY, max_num=20, seed=42))
+    assert (runs == list(RandomSampler(VARY, max_num=20, seed=42)))
+    assert (runs != list(RandomSampler(VARY, max_num=20, seed=43)))
+    # the sequence does not depend on how the samples are drawn
+    sampler = RandomSampler(VARY, seed=42, chunk_size=3)
+    records = [next(sampler)] + sampler.next_block(7).to_dict('records')
+    records += [next(sampler) for _ in range(12)]
+    assert (records == pytest.approx(runs))
+    # without a seed the samples follow the global NumPy random state
+    np.random.seed(1)
+    runs = list(RandomSampler(VARY, max_num=20))
+    np.random.seed(1)
+    assert (runs == list(RandomSampler(VARY, max_num=20)))
+    assert (runs != list(RandomSampler(VARY, max_num=20)))
+
+
+def test_state():
+    sampler = RandomSampler(VARY, seed=7, chunk_size=10)
+    for _ in range(4):
+        next(sampler)
+    restored = pickle.loads(pickle.dumps(sampler))
+    assert (restored._chunk is None)
+    assert (restored.count == 4)
+    assert ([next(restored) for _ in range(15)] == [next(sampler) for _ in range(15)])
@@ -0,0 +1,59 @@
+import numpy as np
+import chaospy as cp
+from easyvvuq.sampling import SSCSampler
+from easyvvuq.sampling.stencil_solver import DAFSILAS, solve_stencils
+
+
+def vandermonde(xi, p):
+    sampler = SSCSampler({'x1': cp.Uniform(-1, 1), 'x2': cp.Uniform(-1, 1)}, p)
+    return sampler.compute_Psi_batch(xi, p)
+
+
+def test_well_conditioned():
+    np.random.seed(0)
+    A = np.random.rand(50, 6, 6) + 6 * np.eye(6)
+    b = np.random.rand(50, 6)
+    x = solve_stencils(A, b)
+    assert (x.shape == (50, 6, 1))
+    for k in range(50):
+        assert (np.allclose(x[k], DAFSILAS(A[k], b[k]), rtol=1e-12, atol=1e-12))
+
+
+def test_ill_conditioned():
+    # solved with DAFSILAS, as before
+    np.random.seed(1)
+    # clustered points
+    A = np.array([vandermonde(0.5 + 1e-2 * np.random.rand(10, 2), 3) for _ in range(5)])
+    b = np.random.rand(5, 10)
+    assert (np.linalg.cond(A) > 1e8).all()
+    x = solve_stencils(A, b)
+    for k in range(5):
+        assert (np.array_equal(x[k], DAFSILAS(A[k], b[k])))
+    # 6 points on a line do not define a quadratic polynomial in 2D
+    t = np.random.rand(5, 6)
+    A = np.array([vandermonde(np.column_stack([t_k, 1 - 2 * t_k]), 2) for t_k in t])
+    b = np.random.rand(5, 6)
+    assert (np.linalg.cond(A) > 1e14).all()
+    x = solve_stencils(A, b)
+    for k in range(5):
+        assert (np.array_equal(x[k], DAFSILAS(A[k], b[k])))
+    # the null space is zeroed
+    assert ((x == 0).any(axis=1)).all()
+
+
+def test_moderately_ill_conditioned():
+    # solved with LAPACK, the same solution as DAFSILAS up to round-off
+    np.random.seed(2)
+    A = np.array([vandermonde(0.5 + 0.2 * np.random.rand(10, 2), 3) for _ in range(20)])
+    b = np.random.rand(20, 10)
+    cond = np.linalg.cond(A)
+    assert ((cond > 1e4) & (cond < 1e8)).all()
+    x = solve_stencils(A, b)
+    for k in range(20):
+        expected = DAFSILAS(A[k], b[k])
+        assert (np.allclose(x[k], expected, rtol=0, atol=1e-14 * cond[k] * np.abs(expected).max()))
+        assert (np.allclose(A[k] @ x[k], b[k].reshape([-1, 1]), atol=1e-8))
+
+
+def test_empty():
+    assert (solve_stencils(np.zeros([0, 3, 3]), np.zeros([0, 3])).shape == (0, 3, 1))
@@ -4,6 +4,7 @@ import pytest
 import yaml
 import pickle
 import numpy as np
+import pandas as pd
 
 # No longer required
 # def test_l_n_exception():
@@ -21,3 +22,70 @@ def test_lagrange_poly():
     assert (uq.analysis.sc_analysis.lagrange_poly(2.0, [8, 4, 9], 2) == 2.4000000000000004)
     with pytest.raises(IndexError):
         uq.analysis.sc_analysis.lagrange_poly(2.0, [8, 4, 9], 3)
+
+
+def test_grid_indices():
+    vary = {'a': cp.Uniform(-1, 1), 'b': cp.Uniform(0, 2)}
+    sampler = uq.sampling.SCSampler(vary=vary, polynomial_order=3)
+    analysis = uq.analysis.SCAnalysis(sampler=sampler, qoi_cols=['f'])
+    analysis.xi_d = sampler.xi_d
+    order = np.random.permutation(sampler.xi_d.shape[0])
+    assert (np.array_equal(analysis.grid_indices(sampler.xi_d[order]), order))
+    # a different grid replaces the index
+    grid = sampler.xi_d[::-1]
+    assert (np.array_equal(analysis.grid_indices(grid[:3], grid), [0, 1, 2]))
+    with pytest.raises(KeyError):
+        analysis.grid_indices([[10.0, 10.0]])
+
+
+def test_lagrange_poly_matrix():
+    x = np.array([2.0, 4.0, -1.5])
+    x_i = [8, 4, 9]
+    matrix = uq.analysis.sc_analysis.lagrange_poly_matrix(x, x_i)
+    expected = [[uq.analysis.sc_analysis.lagrange_poly(x_, x_i, j) for j in range(3)] for x_ in x]
+    assert (matrix == pytest.approx(np.array(expected)))
+    assert (np.all(uq.analysis.sc_analysis.lagrange_poly_matrix(x, [3.0]) == 1.0))
+
+
+def test_sc_expansion_batch():
+    vary = {'a': cp.Uniform(-1, 1), 'b': cp.Uniform(0, 2)}
+    sampler = uq.sampling.SCSampler(vary=vary, polynomial_order=3, sparse=True,
+                                    quadrature_rule='C', growth=True)
+    analysis = uq.analysis.SCAnalysis(sampler=sampler, qoi_cols=['f'])
+    analysis.N = sampler.N
+    analysis.xi_d = sampler.xi_d
+    analysis.xi_1d = sampler.xi_1d
+    analysis.l_norm = sampler.compute_sparse_multi_idx(sampler.L, sampler.N)
+    analysis.comb_coef = analysis.compute_comb_coef()
+    analysis.init_interpolation = True
+    samples = [np.array([np.exp(x[0]) * x[1], x[1]]) for x in sampler.xi_d]
+    # the sparse grid interpolates the code samples exactly
+    assert (analysis.sc_expansion(samples, sampler.xi_d) == pytest.approx(np.array(samples)))
+    x = np.random.uniform(0, 1, (25, 2))
+    batch = analysis.sc_expansion(samples, x, batch_size=7)
+    assert (batch.shape == (25, 2))
+    for x_, value in zip(x, batch):
+        assert (analysis.sc_expansion(samples, x_) == pytest.approx(value))
+
+
+def test_sobol_indices_all():
+    vary = {'a': cp.Uniform(-1, 1), 'b': cp.Uniform(0, 2), 'c': cp.Uniform(0, 1)}
+    sampler = uq.sampling.SCSampler(vary=vary, polynomial_order=3)
+    xi_d = sampler.xi_d
+    values = np.array([np.exp(xi_d[:, 0]) * xi_d[:, 1] + xi_d[:, 2], xi_d[:, 0] * xi_d[:, 2]]).T
+    data = {('run_id', 0): np.arange(xi_d.shape[0]), ('f', 0): values[:, 0], ('f', 1): values[:, 1]}
+    analysis = uq.analysis.SCAnalysis(sampler=sampler, qoi_cols=['f'])
+    analysis.analyse(pd.DataFrame(data), compute_Sobols=False)
+    sobols = analysis.get_sobol_indices('f', typ='all')
+    assert (len(sobols) == 7)
+    # the Sobol indices of all subsets add up to one
+    assert (sum(sobols.values()) == pytest.approx(np.ones(2)))
+    assert (sobols[(0, 1, 2)] == pytest.approx(np.zeros(2), abs=1e-12))
+    assert (sobols[(1,)][1] == pytest.approx(0.0, abs=1e-12))
+    # compare with the marginals of the full tensor grid
+    first = analysis.get_sobol_indices('f')
+    level = analysis.l_norm[0]
+    h, wi_d_u = analysis.compute_marginal('f', (0,), np.array([1, 2]), level)
+    mean, var = analysis.get_moments('f')
+    D_0 = sum(h_**2 * w.prod() for h_, w in zip(h, wi_d_u)) - mean**2
+    assert (first[(0,)] == pytest.approx(D_0 / var))
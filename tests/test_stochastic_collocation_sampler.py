@@ -69,3 +69,49 @@ def test_generate_grid(sc_sampler):
 #                       [3, 1], [3, 2], [3, 3],
 #                       [4, 1], [4, 2],
 #                       [5, 1]])).all())
+
+
+def test_multi_index_set():
+    from easyvvuq.sampling.stochastic_collocation import MultiIndexSet
+    l_norm = np.array([[1, 1, 1], [1, 2, 1], [1, 3, 1], [2, 1, 1], [2, 2, 1]])
+    # the order in which the indices are given does not matter
+    multi_idx_set = MultiIndexSet(3, l_norm[::-1])
+    assert (multi_idx_set.comb_coef == {(1, 1, 1): 0, (1, 2, 1): -1,
+                                        (1, 3, 1): 1, (2, 1, 1): 0, (2, 2, 1): 1})
+    assert (set(multi_idx_set.admissible) == {(3, 1, 1), (1, 4, 1), (2, 3, 1),
+                                              (1, 1, 2)})
+    expected = dict(multi_idx_set.comb_coef)
+    expected.update({(1, 1, 1): -1, (1, 1, 2): 1})
+    assert (multi_idx_set.comb_coef_with((1, 1, 2)) == expected)
+    multi_idx_set.add((1, 1, 2))
+    assert (multi_idx_set.comb_coef[(1, 1, 1)] == -1)
+    assert ({(1, 2, 2), (2, 1, 2), (1, 1, 3)} <= set(multi_idx_set.admissible))
+    assert (multi_idx_set.issubset(np.concatenate((l_norm, [[1, 1, 2]]))))
+    assert (not multi_idx_set.issubset(l_norm))
+
+
+def test_grid_idx():
+    vary = {"a": cp.Uniform(-1, 1), "b": cp.Uniform(0, 1)}
+    sampler = uq.sampling.SCSampler(vary=vary, polynomial_order=3, quadrature_rule="C",
+                                    sparse=True, growth=True)
+    assert (sampler.grid_idx.dtype == np.int32)
+    assert (np.array_equal(sampler.grid_to_points(sampler.grid_idx), sampler.xi_d))
+    assert (np.array_equal(sampler.points_to_grid_idx(sampler.xi_d), sampler.grid_idx))
+    # nested rule: the points of a level keep their ids at higher levels
+    for n in range(2):
+        for level in [1, 2]:
+            ids = sampler.node_ids_1d[n][level]
+            assert (np.array_equal(sampler.nodes_1d[n][ids], sampler.xi_1d[n][level]))
+            assert (set(ids) <= set(sampler.node_ids_1d[n][level + 1]))
+    # the grid is stored as integer coordinates only
+    state = sampler.__getstate__()
+    assert (state['_xi_d'] is None)
+    restored = uq.sampling.SCSampler.__new__(uq.sampling.SCSampler)
+    restored.__setstate__(state)
+    assert (np.array_equal(restored.xi_d, sampler.xi_d))
+    # state stored by versions that only kept the collocation points
+    state = dict(state, xi_d=sampler.xi_d)
+    del state['_grid_idx']
+    restored = uq.sampling.SCSampler.__new__(uq.sampling.SCSampler)
+    restored.__setstate__(state)
+    assert (np.array_equal(restored.grid_idx, sampler.grid_idx))
@@ -1,6 +1,10 @@
 import pytest
 import os
+import numpy as np
 from easyvvuq.utils.helpers import multi_index_tuple_parser, remove_start_of_file
+from easyvvuq.utils.helpers import encode_result_blob, decode_result_blob
+from easyvvuq.utils.helpers import easyvvuq_serialize, easyvvuq_serialize_state
+from easyvvuq.utils.helpers import easyvvuq_deserialize_state, encode_array, decode_array
 
 
 def test_multi_index_tuple_parser_exceptions():
@@ -39,3 +43,50 @@ def test_remove_start_of_file(tmp_path):
     remove_start_of_file(os.path.join(tmp_path, 'test.txt'), 'START')
     with open(os.path.join(tmp_path, 'test.txt'), 'r') as fd:
         assert (fd.read() == trimmed)
+
+
+@pytest.mark.parametrize('compress', [False, True])
+def test_result_blob(compress):
+    result = {'a': 1.5, 'b': [1.0, 2.0, 3.0], 'c': 'text', 'd': np.arange(6).reshape(2, 3),
+              'e': [], 'f': np.int64(3), 'g': ['x', 'y']}
+    decoded = decode_result_blob(encode_result_blob(result, compress=compress))
+    assert (list(decoded.keys()) == list(result.keys()))
+    assert (decoded['a'] == 1.5)
+    assert (decoded['b'].dtype == np.float64)
+    assert (np.array_equal(decoded['b'], [1.0, 2.0, 3.0]))
+    assert (decoded['c'] == 'text')
+    assert (np.array_equal(decoded['d'], np.arange(6).reshape(2, 3)))
+    assert (len(decoded['e']) == 0)
+    assert (decoded['f'] == 3)
+    assert (decoded['g'] == ['x', 'y'])
+    with pytest.raises(RuntimeError):
+        decode_result_blob(b'{"a": 1}')
+
+
+def test_serialize_state():
+    large = np.arange(10000.0)
+    obj = {'count': 3, 'large': large, 'same': large, 'small': np.arange(5), 'names': ['a']}
+    state, arrays = easyvvuq_serialize_state(obj, min_array_size=1000)
+    assert (len(arrays) == 1)
+    assert (len(state) < 1000)
+    arrays = {key: decode_array(encode_array(array)) for key, array in arrays.items()}
+    restored = easyvvuq_deserialize_state(state, arrays)
+    assert (restored['count'] == 3)
+    assert (np.array_equal(restored['large'], large))
+    assert (restored['same'] is restored['large'])
+    assert (np.array_equal(restored['small'], np.arange(5)))
+    # distinct arrays with equal contents are stored once, but remain distinct
+    zeros = {'a': np.zeros(10000), 'b': np.zeros(10000)}
+    zeros_state, zeros_arrays = easyvvuq_serialize_state(zeros, min_array_size=1000)
+    assert (len(zeros_arrays) == 1)
+    restored_zeros = easyvvuq_deserialize_state(zeros_state, zeros_arrays)
+    assert (restored_zeros['a'] is not restored_zeros['b'])
+    restored_zeros['a'][0] = 1.0
+    assert (restored_zeros['b'][0] == 0.0)
+    assert (list(zeros_arrays.values())[0][0] == 0.0)
+    assert (zeros['a'][0] == 0.0)
+    # the arrays are identified by their contents
+    assert (easyvvuq_serialize_state(obj, 1000)[1].keys() == arrays.keys())
+    assert (easyvvuq_serialize_state({'large': large + 1}, 1000)[1].keys() != arrays.keys())
+    # objects serialized as a whole
+    assert (easyvvuq_deserialize_state(easyvvuq_serialize(obj), {})['count'] == 3)